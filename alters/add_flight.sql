@@ -1,4 +1,4 @@
-INSERT INTO flight(flight_number, 
+INSERT INTO main.flight(flight_number, 
 departure_id, 
 arrival_id, 
 pilot_id, 
@@ -0,0 +1 @@
+ATTACH DATABASE ? AS ?;
@@ -0,0 +1 @@
+DELETE FROM changelog WHERE seq <= ?;
@@ -1 +1 @@
-DELETE FROM flight WHERE flight_id = ?;
\ No newline at end of file
+DELETE FROM main.flight WHERE flight_id = ?;
\ No newline at end of file
@@ -0,0 +1 @@
+DELETE FROM flight_partition WHERE month = ?;
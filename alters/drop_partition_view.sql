@@ -0,0 +1 @@
+DROP VIEW IF EXISTS temp.flight;
@@ -0,0 +1 @@
+UPDATE flight_move SET active = ? WHERE id = 1;
@@ -0,0 +1 @@
+DELETE FROM export_state WHERE source = 'changes' AND consumer = ?;
@@ -0,0 +1,5 @@
+INSERT OR REPLACE INTO $schema.flight ($columns)
+SELECT $columns
+FROM main.flight
+WHERE departure_epoch >= :start
+AND departure_epoch < :end;
@@ -0,0 +1,3 @@
+DELETE FROM main.flight
+WHERE departure_epoch >= :start
+AND departure_epoch < :end;
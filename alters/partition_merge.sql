@@ -0,0 +1,3 @@
+INSERT INTO main.flight ($columns)
+SELECT $columns
+FROM $schema.flight;
@@ -0,0 +1,2 @@
+CREATE TEMP VIEW flight AS
+$arms;
@@ -0,0 +1 @@
+UPDATE changelog_trimmed SET seq = MAX(seq, ?) WHERE id = 1;
@@ -0,0 +1,4 @@
+INSERT INTO export_state (source, consumer, seq, exported_at)
+VALUES (?, ?, ?, ?)
+ON CONFLICT (source, consumer) DO UPDATE
+SET seq = excluded.seq, exported_at = excluded.exported_at;
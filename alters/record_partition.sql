@@ -0,0 +1,5 @@
+INSERT INTO flight_partition (month, flights, departure_min, departure_max, arrival_min, arrival_max, state)
+VALUES (:month, :flights, :departure_min, :departure_max, :arrival_min, :arrival_max, 'attached')
+ON CONFLICT (month) DO UPDATE
+SET flights = excluded.flights, departure_min = excluded.departure_min, departure_max = excluded.departure_max,
+arrival_min = excluded.arrival_min, arrival_max = excluded.arrival_max, state = excluded.state;
@@ -0,0 +1,4 @@
+INSERT INTO statement_check (id, fingerprint)
+VALUES (1, ?)
+ON CONFLICT (id) DO UPDATE
+SET fingerprint = excluded.fingerprint;
@@ -0,0 +1 @@
+UPDATE flight_partition SET state = ? WHERE month = ?;
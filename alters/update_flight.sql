@@ -1,3 +1,3 @@
-UPDATE flight
+UPDATE main.flight
 SET $set_clause
 $where_clause;
\ No newline at end of file
@@ -0,0 +1,776 @@
+import argparse
+import csv
+import json
+import os
+import random
+import sqlite3
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from contextlib import redirect_stdout
+from datetime import datetime, timedelta
+from itertools import islice
+from pathlib import Path
+
+import cli
+
+# Connection profile and group commit size combinations compared by the write benchmark
+WRITE_CASES = [
+    ("safe", 1),
+    ("tuned", 1),
+    ("tuned", 100),
+    ("tuned", 1000),
+]
+
+# Rows generated for each table at scale 1.0, on top of the seed data in database.sql. Scaled linearly, at least 1 each
+SCALE_ROWS = {
+    "destination":2000,
+    "pilot":20000,
+    "flight":2000000,
+}
+
+# Rows inserted per transaction while generating a dataset
+GENERATE_BATCH_SIZE = 10000
+
+# First departure time of a generated schedule, after the seeded flights so the seed pilots are not double-booked
+SCHEDULE_START = datetime(2026, 3, 1)
+
+# File the export cases write to
+EXPORT_PATH = Path(tempfile.gettempdir()) / "bench_export.csv"
+
+# Word lists the generated names are built from, so the partial and full-text searches have realistic words to match
+FIRST_NAMES = ["James", "Sarah", "Daniel", "Emily", "Michael", "Laura", "Thomas", "Hannah", "Oliver", "Rebecca",
+    "Lucas", "Chloe", "Mateo", "Sofia", "Noah", "Amelia", "Jakub", "Zofia", "Luca", "Giulia", "Hugo", "Léa",
+    "Finn", "Freya", "Aarav", "Priya", "Kenji", "Yuki", "Mohammed", "Fatima"]
+LAST_NAMES = ["Thornton", "Williams", "Foster", "Carter", "Hughes", "Bennett", "Reed", "Collins", "Grant", "Moore",
+    "Novak", "Kowalski", "Rossi", "Bianchi", "García", "Martínez", "Dubois", "Laurent", "Müller", "Schmidt",
+    "Jansen", "de Vries", "Silva", "Santos", "Nagy", "Horváth", "Svoboda", "Dvořák", "Andersson", "Nielsen"]
+COUNTRIES = ["United Kingdom", "Netherlands", "France", "Spain", "Italy", "Poland", "Hungary", "Czech Republic",
+    "Portugal", "Germany", "Austria", "Greece", "Croatia", "Norway", "Sweden", "Finland", "Ireland", "Romania",
+    "Bulgaria", "Turkey", "Morocco", "Egypt", "Japan", "Brazil", "Canada"]
+CITY_SYLLABLES = ["ka", "ro", "ma", "li", "ber", "sa", "to", "vi", "len", "mar", "no", "da", "gra", "bu", "pe",
+    "ster", "ha", "ven", "ri", "lo"]
+AIRPORT_SUFFIXES = ["International Airport", "Airport", "Regional Airport", "City Airport"]
+
+# Opens a fresh copy of the seeded database at path through cli.connect(), the same way cli.py does
+def open_database(path, profile):
+    cli.DB_PATH = str(path)
+    cli.connect(verbose=False, profile=profile)
+
+# Times adding flights one at a time through execute_alter_sql, as the add prompts and import commands do
+def bench_writes(rows, profile, group_commit, directory=None):
+    with tempfile.TemporaryDirectory(dir=directory) as tmp:
+        open_database(Path(tmp) / "bench.db", profile)
+        cli.GROUP_COMMIT["writes"] = group_commit
+        started = time.perf_counter()
+        for i in range(rows):
+            cli.execute_alter_sql("add_flight.sql", (f"BW{i}", 1, 2, 3, "2026-01-01 09:00:00", "2026-01-01 10:30:00"))
+        cli.flush_writes()
+        elapsed = time.perf_counter() - started
+        cli.conn.close()
+    return {
+        "profile":profile,
+        "group_commit":group_commit,
+        "rows":rows,
+        "seconds":round(elapsed, 4),
+        "rows_per_second":round(rows / elapsed),
+    }
+
+# Returns the number of rows to generate for each table at the given scale
+def scaled_rows(scale):
+    return {table: max(1, round(rows * scale)) for table, rows in SCALE_ROWS.items()}
+
+# Inserts rows through an add alter's sql in batches of GENERATE_BATCH_SIZE, one transaction per batch
+def insert_generated(filename, rows):
+    sql = cli.get_statement(filename)
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= GENERATE_BATCH_SIZE:
+            cli.c.executemany(sql, batch)
+            cli.conn.commit()
+            batch.clear()
+    if batch:
+        cli.c.executemany(sql, batch)
+        cli.conn.commit()
+
+# Yields generated destinations spread over the seeded timezones
+def generate_destinations(rng, count, timezones):
+    for _ in range(count):
+        city = "".join(rng.choice(CITY_SYLLABLES) for _ in range(rng.randint(2, 4))).capitalize()
+        yield (f"{city} {rng.choice(AIRPORT_SUFFIXES)}", city, rng.choice(COUNTRIES), rng.choice(timezones))
+
+# Yields generated pilots, each based at an existing destination with an existing rating and a medical in the last year
+def generate_pilots(rng, count, destination_ids, ratings, first_licence):
+    for i in range(count):
+        medical = SCHEDULE_START - timedelta(days=rng.randint(0, 365))
+        yield (f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}", first_licence + i, rng.choice(ratings),
+            rng.choice(destination_ids), medical.strftime("%Y-%m-%d"))
+
+# Yields a generated schedule. Each pilot flies a chain of sectors from their base, leaving from where the last one
+# landed after a turnaround, with a night's rest every few sectors, so the schedule has no double-bookings.
+# Pilots take turns, so flight IDs run roughly in departure order as they would in a real schedule
+def generate_flights(rng, count, pilots, destination_ids, schedule_start=SCHEDULE_START):
+    start = int((schedule_start - cli.EPOCH).total_seconds())
+    # location, next free time in epoch seconds and sectors flown since the last rest, for each pilot
+    state = {pilot_id: [base_id, start + rng.randrange(0, 86400, 300), 0] for pilot_id, base_id in pilots}
+    emitted = 0
+    while emitted < count:
+        for pilot_id, base_id in pilots:
+            if emitted >= count:
+                break
+            location, departure, sectors = state[pilot_id]
+            if location != base_id and rng.random() < 0.6:
+                arrival_id = base_id # most sectors away from base head home
+            else:
+                arrival_id = rng.choice(destination_ids)
+                while arrival_id == location and len(destination_ids) > 1:
+                    arrival_id = rng.choice(destination_ids)
+            arrival = departure + rng.randrange(45, 330, 5) * 60
+            yield (f"SY{rng.randint(1, 9999):04d}", location, arrival_id, pilot_id,
+                (cli.EPOCH + timedelta(seconds=departure)).strftime("%Y-%m-%dT%H:%M:%SZ"),
+                (cli.EPOCH + timedelta(seconds=arrival)).strftime("%Y-%m-%dT%H:%M:%SZ"))
+            sectors += 1
+            rest = rng.randrange(35, 180, 5) * 60
+            if sectors >= rng.randint(2, 5):
+                rest, sectors = rest + 12 * 3600, 0
+            state[pilot_id] = [arrival_id, arrival + rest, sectors]
+            emitted += 1
+
+# Builds a dataset at path from a seed and scale factor: the seed data, then generated destinations, pilots and flights
+# that reference them. The same seed and scale always give the same dataset
+def generate_dataset(path, seed, scale, profile=None):
+    rng = random.Random(seed)
+    rows = scaled_rows(scale)
+    open_database(path, profile)
+    timezones = [row["code"] for row in cli.c.execute("SELECT code FROM timezone ORDER BY code")]
+    ratings = [row["rating_code"] for row in cli.c.execute("SELECT rating_code FROM rating ORDER BY rating_code")]
+    insert_generated("add_destination.sql", generate_destinations(rng, rows["destination"], timezones))
+    destination_ids = [row[0] for row in cli.c.execute("SELECT destination_id FROM destination ORDER BY destination_id")]
+    first_licence = cli.c.execute("SELECT COALESCE(MAX(licence_number), 0) + 1 FROM pilot").fetchone()[0]
+    insert_generated("add_pilot.sql", generate_pilots(rng, rows["pilot"], destination_ids, ratings, first_licence))
+    pilots = [(row[0], row[1]) for row in cli.c.execute("SELECT pilot_id, base_id FROM pilot ORDER BY pilot_id")]
+    insert_generated("add_flight.sql", generate_flights(rng, rows["flight"], pilots, destination_ids))
+    cli.conn.execute("ANALYZE")
+    cli.conn.commit()
+    cli.invalidate_reference_data()
+
+# Returns the row count of each table in the open database
+def table_counts():
+    return {table: cli.c.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0] for table in ("timezone", "rating", "destination", "pilot", "flight")}
+
+# Picks the IDs and values the query cases search for from rows of the open database
+def sample_values(rng):
+    pilot = rng.choice(cli.c.execute("SELECT pilot_id, name, base_id, aircraft_rating FROM pilot").fetchall())
+    flight = rng.choice(cli.c.execute("SELECT flight_id, flight_number, pilot_id, departure_id, departure_time_utc FROM flight").fetchall())
+    destinations = cli.c.execute("SELECT destination_id, city, country FROM destination").fetchall()
+    destination = rng.choice(destinations)
+    day = str(flight["departure_time_utc"])[:10]
+    return {
+        "pilot_id":pilot["pilot_id"],
+        "pilot_name":pilot["name"],
+        "pilot_prefix":pilot["name"].split()[0][:3],
+        "base_id":pilot["base_id"],
+        "rating":pilot["aircraft_rating"],
+        "flight_id":flight["flight_id"],
+        "flight_number":flight["flight_number"],
+        "flight_pilot_id":flight["pilot_id"],
+        "departure_id":flight["departure_id"],
+        "day":day,
+        "destination_id":destination["destination_id"],
+        "city_prefix":destination["city"][:3],
+        "country":destination["country"],
+        "route_to_id":rng.choice([row["destination_id"] for row in destinations if row["destination_id"] != flight["departure_id"]]),
+    }
+
+# Reloads the reference cache from destinations.sql, timezone.sql and ratings.sql
+def reload_reference_data():
+    cli.invalidate_reference_data()
+    cli.reference_data()
+
+# Rebuilds the route network from route_network.sql
+def reload_route_network():
+    cli.invalidate_route_network()
+    cli.route_network()
+
+# Moves a "bench" consumer to the latest change, compacts the changelog and stops tracking the consumer again, so
+# only changes every other consumer has read are deleted
+def compact_bench_changes():
+    cli.acknowledge_changes("bench", cli.run_statement("changelog_position.sql")[0]["latest"])
+    cli.compact_changes(older_than_days=36500) # nothing is that old, but the cutoff lookup still runs
+    cli.forget_change_consumer("bench")
+
+# Moves the oldest month of flights into a partition, archives it, restores it and merges it back, so the dataset is
+# left as it was
+def cycle_oldest_partition():
+    oldest = cli.run_statement("flight_months.sql", params=(2 ** 62,))[0]["month"]
+    following = time.strftime("%Y-%m", time.gmtime(cli.month_bounds(oldest)[1]))
+    cli.split_partitions(following)
+    cli.archive_partitions(following)
+    cli.restore_partition(oldest)
+    cli.merge_partition(oldest)
+
+# Query cases: a name, the files it runs, whether it reads a whole table (and so runs once), and a function of the
+# sampled values that makes the call through the same cli.py function the menus and commands use
+QUERY_CASES = [
+    ("flight listing", ["all_flight.sql"], True, lambda v: cli.execute_sql("all_flight.sql")),
+    ("pilot roster", ["pilot_roster.sql"], True, lambda v: cli.execute_sql("pilot_roster.sql")),
+    ("destination listing", ["destinations.sql"], True, lambda v: cli.execute_sql("destinations.sql")),
+    ("timezone listing", ["timezone.sql"], False, lambda v: cli.execute_sql("timezone.sql")),
+    ("reference cache reload", ["destinations.sql", "timezone.sql", "ratings.sql"], False, lambda v: reload_reference_data()),
+    ("pilot by id", ["pilot_id.sql"], False, lambda v: cli.execute_param_sql("pilot_id.sql", (v["pilot_id"],))),
+    ("flight by id", ["flight_id.sql"], False, lambda v: cli.execute_param_sql("flight_id.sql", (v["flight_id"],))),
+    ("destination by id", ["destination_id.sql"], False, lambda v: cli.execute_param_sql("destination_id.sql", (v["destination_id"],))),
+    ("pilot page", ["pilot_page.sql"], False, lambda v: cli.fetch_page("pilot_page.sql", 0)),
+    ("pilot page by base", ["pilot_page.sql"], False, lambda v: cli.fetch_page("pilot_page.sql", 0, "Base Airport ID", v["base_id"])),
+    ("flight page", ["flight_page.sql"], False, lambda v: cli.fetch_page("flight_page.sql", 0)),
+    ("flight page by pilot", ["flight_page.sql"], False, lambda v: cli.fetch_page("flight_page.sql", 0, "Pilot ID", v["flight_pilot_id"])),
+    ("destination page", ["destination_page.sql"], False, lambda v: cli.fetch_page("destination_page.sql", 0)),
+    ("destination page by partial country", ["destination_page.sql"], False, lambda v: cli.fetch_page("destination_page.sql", 0, "Country", v["country"][:4], partial=True)),
+    ("pilot search by base", ["pilot_search.sql"], False, lambda v: cli.search_pilot("Base Airport ID", v["base_id"])),
+    ("pilot search by partial name", ["pilot_fts_search.sql"], False, lambda v: cli.search_pilot("Name", v["pilot_prefix"], partial=True)),
+    ("compound pilot search", ["pilot_search.sql", "index_stats.sql", "index_columns.sql"], False, lambda v: cli.compound_search("pilot", [
+        ("Aircraft Rating", "=", v["rating"]), ("Base Airport ID", "=", v["base_id"]), ("Last Medical Date", "<", "2025-10-01")])),
+    ("compound flight search", ["flight_search.sql"], False, lambda v: cli.compound_search("flight", [
+        ("Pilot ID", "=", v["flight_pilot_id"]), ("Departure Date/Time", "between", (v["day"], v["day"]))])),
+    ("compound flight search any", ["flight_search.sql"], False, lambda v: cli.compound_search("flight", [
+        ("Flight Number", "=", v["flight_number"]), ("Departure ID", "in", [v["departure_id"], v["route_to_id"]])], match="any")),
+    ("flight search by number", ["flight_search.sql"], False, lambda v: cli.search_flight("Flight Number", v["flight_number"])),
+    ("flight search by partial number", ["flight_search.sql"], False, lambda v: cli.search_flight("Flight Number", v["flight_number"][2:], partial=True)),
+    ("destination search by country", ["destination_search.sql"], False, lambda v: cli.search_destination("Country", v["country"])),
+    ("destination search by partial city", ["destination_fts_search.sql"], False, lambda v: cli.search_destination("City", v["city_prefix"], partial=True)),
+    ("flight range one day", ["flight_range.sql"], False, lambda v: cli.search_flight_range(v["day"], v["day"])),
+    ("flight range one day from airport", ["flight_range.sql"], False, lambda v: cli.search_flight_range(v["day"], v["day"], departure_id=v["departure_id"])),
+    ("pilot conflict check", ["pilot_neighbour_flights.sql"], False, lambda v: cli.find_pilot_conflicts(v["flight_pilot_id"], f"{v['day']} 12:00:00", f"{v['day']} 13:00:00")),
+    ("schedule audit", ["pilot_schedule_sweep.sql"], True, lambda v: cli.audit_schedule()),
+    ("assignment pilots", ["assignment_pilots.sql"], True, lambda v: cli.run_statement("assignment_pilots.sql")),
+    ("assignment schedule one day", ["assignment_flights.sql"], False, lambda v: cli.run_statement("assignment_flights.sql",
+        params={"start":cli.time_to_epoch(v["day"]), "end":cli.time_to_epoch(v["day"]) + 86400})),
+    ("pilot recent flights", ["pilot_recent_flights.sql"], False, lambda v: cli.run_statement("pilot_recent_flights.sql",
+        params={"pilot_id":v["flight_pilot_id"], "before":cli.time_to_epoch(v["day"]), "limit":cli.MAX_DUTY_SECTORS})),
+    ("pilot hours one pilot", ["pilot_duty_totals.sql"], False, lambda v: cli.pilot_duty_totals(v["flight_pilot_id"], v["day"])),
+    ("pilot hours all pilots", ["pilot_duty_totals.sql"], True, lambda v: cli.pilot_duty_totals(None, v["day"])),
+    ("route network load", ["route_network.sql"], True, lambda v: reload_route_network()),
+    ("itinerary earliest arrival", ["route_flight.sql", "flight_id.sql"], False, lambda v: cli.find_itinerary(v["departure_id"], v["route_to_id"], v["day"])),
+    ("itinerary fewest legs", ["route_flight.sql", "flight_id.sql"], False, lambda v: cli.find_itinerary(v["departure_id"], v["route_to_id"], v["day"], fewest_legs=True)),
+    ("changelog batch", ["changes.sql", "changelog_position.sql"], False, lambda v: cli.read_changes(cli.run_statement("changelog_position.sql")[0]["trimmed"])),
+    ("change consumers", ["change_consumers.sql"], False, lambda v: cli.run_statement("change_consumers.sql")),
+    ("startup statement check", ["schema_version.sql", "statement_check.sql"], False, lambda v: (cli.statement_fingerprint(), cli.run_statement("statement_check.sql"))),
+    ("export flights csv", ["all_flight.sql", "change_seq.sql", "record_export.sql"], True, lambda v: cli.export_rows("flights", "csv", EXPORT_PATH, consumer="bench")),
+    ("export changed flights csv", ["all_flight.sql", "export_state.sql"], False, lambda v: cli.export_rows("flights", "csv", EXPORT_PATH, incremental=True, consumer="bench")),
+]
+
+# Write cases, run in this order so each one works on the rows the adds created: a name, the files it runs, and a
+# function of the row index and the added IDs. Updates and deletes go through the same functions as the menus
+ALTER_CASES = [
+    ("add destination", ["add_destination.sql"], lambda i, added, v: added["destination"].append(
+        add_row("add_destination.sql", (f"Bench Airport {i}", f"Bench City {i}", "Benchland", "Z")))),
+    ("add pilot", ["add_pilot.sql"], lambda i, added, v: added["pilot"].append(
+        add_row("add_pilot.sql", (f"Bench Pilot {i}", 900000000 + i, "A320", added["destination"][i], "2026-01-01")))),
+    ("add flight", ["add_flight.sql", "route_flight.sql"], lambda i, added, v: added["flight"].append(
+        add_row("add_flight.sql", (f"BN{i}", v["departure_id"], added["destination"][i], added["pilot"][i], "2030-01-01T09:00:00Z", "2030-01-01T10:30:00Z")))),
+    ("update destination", ["update_destination.sql"], lambda i, added, v: cli.update_destination(added["destination"][i], "City", f"Bench Town {i}")),
+    ("update pilot", ["update_pilot.sql"], lambda i, added, v: cli.update_pilot(added["pilot"][i], "Name", f"Bench Flyer {i}")),
+    ("update flight times", ["update_flight.sql", "flight_schedule.sql", "pilot_neighbour_flights.sql", "route_flight.sql"], lambda i, added, v: cli.update_flight(
+        added["flight"][i], "Departure Date/Time", "2030-01-01 08:45:00")),
+    ("delete flight", ["delete_flight.sql", "route_flight.sql"], lambda i, added, v: cli.execute_alter_sql("delete_flight.sql", (added["flight"][i],))),
+    ("delete pilot", ["delete_pilot.sql"], lambda i, added, v: cli.execute_alter_sql("delete_pilot.sql", (added["pilot"][i],))),
+    ("delete destination", ["delete_destination.sql"], lambda i, added, v: cli.execute_alter_sql("delete_destination.sql", (added["destination"][i],))),
+    ("compact changes", ["compact_changes.sql", "record_changes_trimmed.sql", "changes_after_time.sql", "forget_change_consumer.sql"],
+        lambda i, added, v: compact_bench_changes()),
+    ("partition oldest month", ["flight_months.sql", "flight_partitions.sql", "flight_columns.sql", "attached_databases.sql", "attach_partition.sql",
+        "detach_partition.sql", "partition_view.sql", "drop_partition_view.sql", "partition_copy.sql", "partition_delete.sql", "partition_bounds.sql",
+        "flight_move.sql", "record_partition.sql", "set_partition_state.sql", "partition_merge.sql", "delete_partition.sql"],
+        lambda i, added, v: cycle_oldest_partition()),
+    ("record statement check", ["record_statement_check.sql"], lambda i, added, v: cli.execute_alter_sql("record_statement_check.sql", (cli.statement_fingerprint(),))),
+]
+
+# Adds a row through execute_alter_sql and returns its ID
+def add_row(filename, params):
+    cli.execute_alter_sql(filename, params)
+    return cli.c.lastrowid
+
+# Returns the timing summary for a list of call durations in seconds
+def summarise(durations):
+    ordered = sorted(durations)
+    return {
+        "runs":len(ordered),
+        "min_ms":round(ordered[0] * 1000, 3),
+        "median_ms":round(statistics.median(ordered) * 1000, 3),
+        "p95_ms":round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))] * 1000, 3),
+        "max_ms":round(ordered[-1] * 1000, 3),
+    }
+
+# Times each query case. Whole-table cases run once, the rest repeat times after one untimed warm-up call
+def bench_queries(values, repeat):
+    results = []
+    for name, files, full_scan, call in QUERY_CASES:
+        runs = 1 if full_scan else repeat
+        if not full_scan:
+            call(values)
+        durations = []
+        for _ in range(runs):
+            started = time.perf_counter()
+            call(values)
+            durations.append(time.perf_counter() - started)
+        results.append({"case":name, "files":files, **summarise(durations)})
+    return results
+
+# Times each alter case over writes rows. The deletes remove what the adds created, so the dataset is left as it was
+def bench_alters(values, writes):
+    added = {"destination":[], "pilot":[], "flight":[]}
+    results = []
+    for name, files, call in ALTER_CASES:
+        durations = []
+        for i in range(writes):
+            started = time.perf_counter()
+            call(i, added, values)
+            durations.append(time.perf_counter() - started)
+        cli.flush_writes()
+        results.append({"case":name, "files":files, **summarise(durations)})
+    return results
+
+# Returns the sql files in QUERIES_DIR and ALTERS_DIR that no case runs, so a new file cannot go unmeasured
+def uncovered_files():
+    covered = {filename for case in QUERY_CASES + ALTER_CASES for filename in case[1]}
+    return sorted(path.name for sql_dir in (cli.QUERIES_DIR, cli.ALTERS_DIR) for path in sql_dir.glob("*.sql") if path.name not in covered)
+
+# Returns the current git commit of the project, or None outside a git checkout
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=cli.BASE_DIR, capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+# Generates (or reuses) the dataset for a seed and scale and times every query and alter against it
+def bench_statements(seed, scale, repeat, writes, profile=None, db=None, directory=None):
+    cli.RESULT_CACHE["entries"] = 0 # every repeat runs in sqlite, so the timings compare with earlier runs
+    with tempfile.TemporaryDirectory(dir=directory) as tmp:
+        path = Path(db) if db else Path(tmp) / "bench.db"
+        started = time.perf_counter()
+        if path.exists():
+            open_database(path, profile) # a dataset kept from an earlier run with --db
+            generated = None
+        else:
+            generate_dataset(path, seed, scale, profile)
+            generated = round(time.perf_counter() - started, 3)
+        values = sample_values(random.Random(seed))
+        with open(os.devnull, "w") as devnull, redirect_stdout(devnull): # the printing cli functions still format every row
+            queries = bench_queries(values, repeat)
+            alters = bench_alters(values, writes)
+        counts = table_counts()
+        cli.conn.close()
+    return {
+        "commit":git_commit(),
+        "sqlite_version":sqlite3.sqlite_version,
+        "python_version":sys.version.split()[0],
+        "profile":profile or cli.DEFAULT_PROFILE,
+        "seed":seed,
+        "scale":scale,
+        "rows":counts,
+        "generate_seconds":generated,
+        "sample":values,
+        "queries":queries,
+        "alters":alters,
+        "uncovered":uncovered_files(),
+        "statements":cli.statement_report(), # totals from the query instrumentation, per registered statement variant
+    }
+
+# Run in a fresh interpreter by the startup benchmark: imports cli.py, connects and runs one query, then prints how
+# long each step took in ms
+STARTUP_CHILD = """
+import json, sys, time
+started = time.perf_counter()
+sys.path.insert(0, sys.argv[1])
+import cli
+imported = time.perf_counter()
+cli.connect(verbose=False)
+connected = time.perf_counter()
+cli.run_statement("flight_id.sql", params=(1,))
+queried = time.perf_counter()
+print(json.dumps({"import":imported - started, "connect":connected - imported, "first_query":queried - connected}))
+"""
+
+# Returns how long a command takes from starting the process to it exiting, in seconds
+def time_process(command, env):
+    started = time.perf_counter()
+    subprocess.run(command, cwd=cli.BASE_DIR, env=env, stdout=subprocess.DEVNULL, check=True)
+    return time.perf_counter() - started
+
+# Times cold starts against a database: the interpreter on its own, a cli.py command run as a script and as a module,
+# and the import, connect and first query steps inside the process. Each command runs once untimed first, which
+# records the statement check and leaves the operating system's file cache warm
+def bench_startup(db, runs):
+    env = {**os.environ, "FLIGHTDB_PATH":str(db)}
+    show = ["flights", "show", "--id", "1", "--format", "json"]
+    commands = {
+        "interpreter":[sys.executable, "-c", "pass"],
+        "cli.py script":[sys.executable, "cli.py", *show], # compiled on every run, as python never caches a script's bytecode
+        "cli module":[sys.executable, "-m", "cli", *show],
+    }
+    results = []
+    for name, command in commands.items():
+        time_process(command, env)
+        results.append({"case":name, **summarise([time_process(command, env) for _ in range(runs)])})
+    steps = {"import":[], "connect":[], "first_query":[]}
+    for run in range(runs + 1):
+        child = subprocess.run([sys.executable, "-c", STARTUP_CHILD, str(cli.BASE_DIR)], env=env, capture_output=True, text=True, check=True)
+        if run:
+            for step, seconds in json.loads(child.stdout).items():
+                steps[step].append(seconds)
+    results.extend({"case":step, **summarise(durations)} for step, durations in steps.items())
+    return results
+
+# Times printing the first rows of the flight listing to /dev/null: the old way, each row made a dict and drawn by
+# tabulate, against print_results() in each table format. Fetching the rows is timed too, for scale. Each case has its
+# speedup over tabulate, when tabulate is installed
+def bench_render(rows, runs):
+    records = list(islice(cli.stream_statement("all_flight.sql"), rows))
+    cases = {"fetch rows":lambda out: list(islice(cli.stream_statement("all_flight.sql"), rows))}
+    try:
+        from tabulate import tabulate
+        cases["tabulate grid"] = lambda out: out.write(tabulate([dict(row) for row in records], headers="keys", tablefmt="grid") + "\n")
+    except ImportError:
+        pass # cli.py no longer needs tabulate, so the old way is only timed where it is installed
+    for fmt in cli.TABLE_FORMATS:
+        cases[fmt] = lambda out, fmt=fmt: cli.print_results(records, fmt, out=out)
+    results = []
+    with open(os.devnull, "w") as out:
+        for name, case in cases.items():
+            durations = []
+            for _ in range(runs):
+                started = time.perf_counter()
+                case(out)
+                durations.append(time.perf_counter() - started)
+            results.append({"case":name, "rows":len(records), **summarise(durations)})
+    baseline = next((result["median_ms"] for result in results if result["case"] == "tabulate grid"), None)
+    for result in results:
+        result["speedup"] = round(baseline / result["median_ms"], 1) if baseline and result["case"] != "fetch rows" else None
+    return results
+
+# Inputs the soak test cycles through, as one list per trip from the main menu and back. Each step is a menu option and
+# the answers to the prompts it asks. Every trip leaves the data as it was: reports, searches, a failed update, an
+# update that writes back the name already there and bad input
+SOAK_TRIPS = [
+    [("2", []), ("6", ["{pilot_id}", "{day}"]), ("0", [])], # one pilot's flight hours
+    [("1", []), ("6", ["1", "{day}", "{day}", "{departure_id}"]), ("0", [])], # a day's flights from one airport
+    [("1", []), ("3", ["1", "{flight_id}", "N", "N"]), ("0", [])], # a flight by ID
+    [("3", []), ("2", ["3", "{city_prefix}", "N", "Y"]), ("0", [])], # destinations by partial city
+    [("2", []), ("5", ["{pilot_id}", "2", "not a number"])], # an update that fails and returns to the main menu
+    [("2", []), ("5", ["{pilot_id}", "1", "{pilot_name}"]), ("0", [])], # an update that succeeds, to the name it had
+    [("2", []), ("2", ["x"]), ("0", [])], # a prompt error, reported without leaving the menu
+    [("x", []), ("9", [])], # options that do not exist
+    [("5", []), ("3", []), ("0", [])], # the snapshot list
+]
+
+# Growth in traced memory over a soak, after its warm-up, above which the memory is not counted as flat
+SOAK_GROWTH_LIMIT_KIB = 256
+
+# Runs the interactive menus through run_menus() on scripted input until actions menu options have been chosen,
+# then exits. Traces memory with tracemalloc and the depth of the stack at every menu. Memory is read at 20
+# checkpoints, and the growth is measured from the first one, after a tenth of the actions has warmed the caches up
+def bench_soak(actions, seed):
+    values = sample_values(random.Random(seed))
+    state = {"actions":0, "max_depth":0, "checkpoints":[]}
+    every = max(1, actions // 20)
+    def answers():
+        while state["actions"] < actions:
+            for trip in SOAK_TRIPS:
+                for option, prompts in trip:
+                    depth, frame = 0, sys._getframe()
+                    while frame:
+                        depth, frame = depth + 1, frame.f_back
+                    state["max_depth"] = max(state["max_depth"], depth)
+                    state["actions"] += 1
+                    if state["actions"] % every == 0 and state["actions"] >= actions // 10:
+                        state["checkpoints"].append((state["actions"], tracemalloc.get_traced_memory()[0]))
+                    yield option
+                    for answer in prompts:
+                        yield answer.format(**values)
+        yield "0" # every trip ends at the main menu, where 0 is Exit
+    class ScriptedInput:
+        readline = lambda self, feed=answers(): next(feed) + "\n"
+    stdin = sys.stdin
+    sys.stdin = ScriptedInput()
+    tracemalloc.start()
+    started = time.perf_counter()
+    try:
+        with open(os.devnull, "w") as out, redirect_stdout(out):
+            cli.run_menus()
+    finally:
+        elapsed = time.perf_counter() - started
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        sys.stdin = stdin
+    checkpoints = state["checkpoints"]
+    growth = (checkpoints[-1][1] - checkpoints[0][1]) / 1024 if checkpoints else 0
+    return {
+        "actions":state["actions"],
+        "seconds":round(elapsed, 2),
+        "actions_per_second":round(state["actions"] / elapsed),
+        "max_stack_depth":state["max_depth"],
+        "memory_kib":[{"actions":count, "traced_kib":round(size / 1024, 1)} for count, size in checkpoints],
+        "growth_kib":round(growth, 1),
+        "peak_kib":round(peak / 1024, 1),
+        "flat":growth <= SOAK_GROWTH_LIMIT_KIB,
+    }
+
+# Builds the read-heavy mix the result cache benchmark replays: flight searches by pilot and destination searches by
+# country over a few hot values, pilot lookups, and updates that show the pilot, change its medical date, show it again
+# and change it back. Each operation is a name and its arguments
+def cache_operations(count, seed):
+    rng = random.Random(seed)
+    pilots = [row["pilot_id"] for row in cli.c.execute("SELECT pilot_id FROM pilot ORDER BY pilot_id LIMIT 50")]
+    countries = [row["country"] for row in cli.c.execute("SELECT DISTINCT country FROM destination ORDER BY country LIMIT 20")]
+    kinds = ["flights by pilot"] * 4 + ["destinations by country"] * 3 + ["show pilot"] * 2 + ["update pilot"]
+    return [(kind, rng.choice(countries) if kind == "destinations by country" else rng.choice(pilots)) for kind in rng.choices(kinds, k=count)]
+
+# Runs one cache benchmark operation through the same functions the menus and commands use. Returns the rows read
+def run_cache_operation(kind, value):
+    if kind == "flights by pilot":
+        return [cli.search_flight("Pilot ID", str(value))]
+    if kind == "destinations by country":
+        return [cli.search_destination("Country", value)]
+    shown = [cli.run_statement("pilot_id.sql", params=(value,))]
+    if kind == "update pilot":
+        medical = shown[0][0]["Last Medical"]
+        cli.update_pilot(value, "Last Medical Date", "2026-06-30")
+        shown.append(cli.run_statement("pilot_id.sql", params=(value,)))
+        cli.update_pilot(value, "Last Medical Date", medical)
+    return shown
+
+# Replays the same operations with the result cache off and then on. Returns the time, throughput and cache totals of
+# each run, and whether every operation read the same rows in both
+def bench_cache(count, seed, entries):
+    operations = cache_operations(count, seed)
+    results, digests = [], []
+    for size in (0, entries):
+        cli.RESULT_CACHE["entries"] = size
+        cli.invalidate_results()
+        for name in cli.RESULT_CACHE_STATS:
+            cli.RESULT_CACHE_STATS[name] = 0
+        digest = []
+        with open(os.devnull, "w") as devnull, redirect_stdout(devnull):
+            started = time.perf_counter()
+            for kind, value in operations:
+                digest.append(hash(tuple(tuple(map(tuple, rows)) for rows in run_cache_operation(kind, value))))
+            elapsed = time.perf_counter() - started
+        digests.append(digest)
+        results.append({"cache_entries":size, "operations":count, "seconds":round(elapsed, 3),
+            "operations_per_second":round(count / elapsed), "result_cache":cli.result_cache_report()})
+    return {"runs":results, "speedup":round(results[0]["seconds"] / results[1]["seconds"], 2), "results_match":digests[0] == digests[1]}
+
+# Writes days of flights without pilots to path as CSV, from the day after the open database's schedule ends. They are
+# generated as chains for the database's own pilots, so each flight has a pilot who could fly it, and carry that
+# pilot's rating. Returns how many were written
+def write_unassigned_flights(path, rng, days):
+    pilots = [(row["pilot_id"], row["base_id"]) for row in cli.c.execute("SELECT pilot_id, base_id FROM pilot WHERE aircraft_rating IS NOT NULL ORDER BY pilot_id")]
+    ratings = {row["pilot_id"]: row["aircraft_rating"] for row in cli.c.execute("SELECT pilot_id, aircraft_rating FROM pilot")}
+    destination_ids = [row[0] for row in cli.c.execute("SELECT destination_id FROM destination ORDER BY destination_id")]
+    last_arrival = cli.c.execute("SELECT MAX(arrival_epoch) FROM flight").fetchone()[0] or 0
+    start = (cli.EPOCH + timedelta(seconds=last_arrival, days=1)).replace(hour=0, minute=0, second=0)
+    end = (start + timedelta(days=days)).strftime("%Y-%m-%dT%H:%M:%SZ")
+    written = 0
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow([column for column, _field_label in cli.ASSIGN_COLUMNS])
+        # six sectors a day each is more than any generated pilot flies, so every chain runs past the end
+        for number, departure_id, arrival_id, pilot_id, departure, arrival in generate_flights(rng, len(pilots) * days * 6, pilots, destination_ids, start):
+            if departure < end:
+                writer.writerow([number, departure_id, arrival_id, departure[:19].replace("T", " "), arrival[:19].replace("T", " "), ratings[pilot_id]])
+                written += 1
+    return written
+
+# Stands in for min_cost_assignment in the comparison run: each flight of a wave in turn takes its cheapest pilot left
+def greedy_assignment(costs):
+    taken, chosen = set(), []
+    for row in costs:
+        column = min((column for column in range(len(row)) if column not in taken), key=row.__getitem__)
+        taken.add(column)
+        chosen.append(column)
+    return chosen
+
+# Counts the rules the saved schedule breaks that audit_schedule() does not check: assigned flights whose pilot lacks
+# the rating or whose medical has lapsed, and duties of more than MAX_DUTY_SECTORS sectors between rests
+def assignment_breaches(plan):
+    pilots = {row["pilot_id"]: row for row in cli.run_statement("assignment_pilots.sql")}
+    breaches = 0
+    for row in plan:
+        pilot = pilots.get(row["Pilot ID"])
+        if pilot and (pilot["aircraft_rating"] != row["Aircraft Rating"] or
+                cli.time_to_epoch(row["Arrival Date/Time"]) > cli.time_to_epoch(pilot["last_medical_date"]) + cli.MEDICAL_VALID_DAYS * 86400):
+            breaches += 1
+    current_pilot = arrival = None
+    for row in cli.stream_statement("pilot_schedule_sweep.sql", *(("partitioned",) if cli.PARTITIONS["attached"] else ())):
+        if row["pilot_id"] != current_pilot or row["departure_epoch"] - arrival >= cli.MIN_REST_HOURS * 3600:
+            current_pilot, sectors = row["pilot_id"], 0
+        sectors += 1
+        arrival = row["arrival_epoch"]
+        if sectors == cli.MAX_DUTY_SECTORS + 1: # each overlong duty counted once
+            breaches += 1
+    return breaches
+
+# Plans pilots for days of generated flights with the greedy stand-in and with the min-cost matching, then saves the
+# matching's plan and checks the schedule it leaves. Returns the time, assignments and repositionings of each
+def bench_assign(days, seed):
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "flights.csv"
+        flights = write_unassigned_flights(path, random.Random(seed), days)
+        runs = {}
+        for method, solve in (("greedy", greedy_assignment), ("matching", cli.min_cost_assignment)):
+            original, cli.min_cost_assignment = cli.min_cost_assignment, solve
+            try:
+                started = time.perf_counter()
+                plan = cli.plan_assignments(path)
+                elapsed = time.perf_counter() - started
+            finally:
+                cli.min_cost_assignment = original
+            assigned = [row for row in plan if row["Pilot ID"] is not None]
+            runs[method] = {"seconds":round(elapsed, 3), "assigned":len(assigned), "unassigned":len(plan) - len(assigned),
+                "repositionings":sum(row["Repositioning"] for row in assigned)}
+    conflicts = len(cli.audit_schedule())
+    started = time.perf_counter()
+    added = cli.save_assignments(plan)
+    saved = time.perf_counter() - started
+    return {
+        "flights":flights,
+        "pilots":cli.c.execute("SELECT COUNT(*) FROM pilot").fetchone()[0],
+        "days":days,
+        "runs":runs,
+        "added":added,
+        "save_seconds":round(saved, 3),
+        "new_conflicts":len(cli.audit_schedule()) - conflicts,
+        "rule_breaches":assignment_breaches(plan),
+    }
+
+# Compares two statement benchmark results case by case on median time. A ratio above 1 means the new run is slower
+def compare_results(old, new):
+    old_cases = {(section, case["case"]): case for section in ("queries", "alters") for case in old[section]}
+    rows = []
+    for section in ("queries", "alters"):
+        for case in new[section]:
+            before = old_cases.get((section, case["case"]))
+            rows.append({
+                "case":case["case"],
+                "old_median_ms":before["median_ms"] if before else None,
+                "new_median_ms":case["median_ms"],
+                "ratio":round(case["median_ms"] / before["median_ms"], 2) if before and before["median_ms"] else None,
+            })
+    return rows
+
+# Entry point. Prints the results as JSON so runs can be compared between commits
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="bench.py", description="Benchmarks for the flight management database")
+    commands = parser.add_subparsers(dest="command", required=True)
+    writes_parser = commands.add_parser("writes", help="write throughput for each connection profile and group commit size")
+    writes_parser.add_argument("--rows", type=int, default=2000)
+    writes_parser.add_argument("--dir", help="directory for the scratch database, on the disk being measured")
+    generate_parser = commands.add_parser("generate", help="build a synthetic dataset from a seed and scale factor")
+    generate_parser.add_argument("path", help="database file to create")
+    generate_parser.add_argument("--seed", type=int, default=1)
+    generate_parser.add_argument("--scale", type=float, default=0.01, help="1.0 is 2,000 destinations, 20,000 pilots and 2,000,000 flights")
+    statements_parser = commands.add_parser("statements", help="time every query and alter on a synthetic dataset")
+    statements_parser.add_argument("--seed", type=int, default=1)
+    statements_parser.add_argument("--scale", type=float, default=0.01, help="1.0 is 2,000 destinations, 20,000 pilots and 2,000,000 flights")
+    statements_parser.add_argument("--repeat", type=int, default=20, help="timed runs of each query case")
+    statements_parser.add_argument("--writes", type=int, default=200, help="rows added, updated and deleted by the alter cases")
+    statements_parser.add_argument("--profile", choices=sorted(cli.CONNECTION_PROFILES))
+    statements_parser.add_argument("--db", help="dataset to reuse, or to keep, instead of generating a scratch one")
+    statements_parser.add_argument("--dir", help="directory for the scratch database")
+    statements_parser.add_argument("--out", help="also write the results to this file")
+    startup_parser = commands.add_parser("startup", help="time cold starts of cli.py: import, connect and first query")
+    startup_parser.add_argument("--db", help="database to start against (default a small generated one)")
+    startup_parser.add_argument("--runs", type=int, default=20)
+    render_parser = commands.add_parser("render", help="time printing a large flight listing in each table format against tabulate")
+    render_parser.add_argument("--db", help="database to read the flights from (default one generated with enough flights)")
+    render_parser.add_argument("--rows", type=int, default=100000)
+    render_parser.add_argument("--runs", type=int, default=5)
+    soak_parser = commands.add_parser("soak", help="drive the interactive menus through many actions and check memory and stack depth stay flat")
+    soak_parser.add_argument("--db", help="database to run against (default a small generated one)")
+    soak_parser.add_argument("--actions", type=int, default=100000, help="menu options chosen")
+    soak_parser.add_argument("--seed", type=int, default=1)
+    cache_parser = commands.add_parser("cache", help="replay a read-heavy mix of searches and updates with the result cache off and on")
+    cache_parser.add_argument("--db", help="database to run against (default one generated at --scale)")
+    cache_parser.add_argument("--scale", type=float, default=0.01)
+    cache_parser.add_argument("--operations", type=int, default=20000)
+    cache_parser.add_argument("--entries", type=int, default=cli.RESULT_CACHE["entries"], help="result cache size for the cached run")
+    cache_parser.add_argument("--seed", type=int, default=1)
+    assign_parser = commands.add_parser("assign", help="plan and save pilots for a month of generated flights, against a greedy pick")
+    assign_parser.add_argument("--db", help="database to run against (default one generated at --scale)")
+    assign_parser.add_argument("--scale", type=float, default=0.01)
+    assign_parser.add_argument("--days", type=int, default=30, help="days of flights to assign")
+    assign_parser.add_argument("--seed", type=int, default=1)
+    compare_parser = commands.add_parser("compare", help="compare two statements results by median time")
+    compare_parser.add_argument("old")
+    compare_parser.add_argument("new")
+    args = parser.parse_args(argv)
+
+    if args.command == "writes":
+        results = [bench_writes(args.rows, profile, group_commit, args.dir) for profile, group_commit in WRITE_CASES]
+    elif args.command == "generate":
+        if Path(args.path).exists():
+            parser.error(f"{args.path} already exists")
+        started = time.perf_counter()
+        generate_dataset(Path(args.path), args.seed, args.scale)
+        results = {"path":args.path, "seed":args.seed, "scale":args.scale, "rows":table_counts(), "seconds":round(time.perf_counter() - started, 3)}
+        cli.conn.close()
+    elif args.command == "statements":
+        results = bench_statements(args.seed, args.scale, args.repeat, args.writes, args.profile, args.db, args.dir)
+        if args.out:
+            Path(args.out).write_text(json.dumps(results, indent=2))
+        if results["uncovered"]:
+            print(f"No benchmark case runs: {', '.join(results['uncovered'])}", file=sys.stderr)
+    elif args.command == "startup":
+        with tempfile.TemporaryDirectory() as tmp:
+            db = args.db
+            if db is None:
+                db = Path(tmp) / "startup.db"
+                generate_dataset(db, 1, 0.001)
+                cli.conn.close()
+            results = bench_startup(db, args.runs)
+    elif args.command == "render":
+        with tempfile.TemporaryDirectory() as tmp:
+            if args.db:
+                open_database(args.db, None)
+            else:
+                generate_dataset(Path(tmp) / "render.db", 1, args.rows / SCALE_ROWS["flight"])
+            results = bench_render(args.rows, args.runs)
+            cli.conn.close()
+    elif args.command == "soak":
+        with tempfile.TemporaryDirectory() as tmp:
+            if args.db:
+                open_database(args.db, None)
+            else:
+                generate_dataset(Path(tmp) / "soak.db", args.seed, 0.001)
+            results = bench_soak(args.actions, args.seed)
+        if not results["flat"]:
+            print(f"Memory grew {results['growth_kib']} KiB over the soak", file=sys.stderr)
+    elif args.command == "cache":
+        with tempfile.TemporaryDirectory() as tmp:
+            if args.db:
+                open_database(args.db, None)
+            else:
+                generate_dataset(Path(tmp) / "cache.db", args.seed, args.scale)
+            results = bench_cache(args.operations, args.seed, args.entries)
+            cli.conn.close()
+        if not results["results_match"]:
+            print("The cached run read different rows from the uncached run", file=sys.stderr)
+    elif args.command == "assign":
+        with tempfile.TemporaryDirectory() as tmp:
+            if args.db:
+                open_database(args.db, None)
+            else:
+                generate_dataset(Path(tmp) / "assign.db", args.seed, args.scale)
+            results = bench_assign(args.days, args.seed)
+            cli.conn.close()
+        if results["new_conflicts"] or results["rule_breaches"]:
+            print("The saved assignments break the schedule rules", file=sys.stderr)
+    elif args.command == "compare":
+        results = compare_results(json.loads(Path(args.old).read_text()), json.loads(Path(args.new).read_text()))
+    print(json.dumps(results, indent=2))
+
+if __name__ == "__main__":
+    main()
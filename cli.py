@@ -1,6 +1,20 @@
+import argparse
+import csv
+import heapq
+import json
+import os
+import re
+import shlex
 import sqlite3
-from tabulate import tabulate 
-from datetime import datetime
+import sys
+import threading
+import time
+import zlib
+from array import array
+from collections import OrderedDict, deque
+from bisect import bisect_left, insort
+from datetime import datetime, timedelta
+from itertools import chain, islice
 from pathlib import Path
 from string import Template
 
@@ -8,6 +22,9 @@ from string import Template
 BASE_DIR = Path(__file__).resolve().parent
 QUERIES_DIR = BASE_DIR / "queries"
 ALTERS_DIR = BASE_DIR / "alters"
+MIGRATIONS_DIR = BASE_DIR / "migrations"
+# The database file: FLIGHTDB_PATH, or database.db next to this file, wherever cli.py is run from
+DB_PATH = os.environ.get("FLIGHTDB_PATH") or str(BASE_DIR / "database.db")
 
 # Dictionary for use in pilot_search()
 PILOT_SEARCH_FIELDS = {
@@ -16,7 +33,12 @@ PILOT_SEARCH_FIELDS = {
     "Licence Number":"pilot.licence_number",
     "Aircraft Rating":"pilot.aircraft_rating",
     "Base Airport ID":"pilot.base_id",
-    "Last Medical Date":"pilot.last_medical_date,"
+    "Last Medical Date":"pilot.last_medical_date",
+}
+
+# Partial-match pilot search fields served by the full-text index, mapped to their pilot_fts column
+PILOT_FTS_FIELDS = {
+    "Name":"name",
 }
 
 # Dictionary for use in pilot_update()
@@ -25,11 +47,13 @@ PILOT_UPDATE_FIELDS = {
     "Licence Number":("licence_number", "TEXT"),
     "Aircraft Rating":("aircraft_rating", "TEXT"),
     "Base Airport ID":("base_id", "INTEGER"),
-    "Last Medical Date":("last_medical_date," "TEXT"),
+    "Last Medical Date":("last_medical_date", "TEXT"),
 }
 
-# Defines cases for use in validate_fields
+# Defines cases for use in check_field
 INT_FIELDS = {
+    "Licence Number",
+    "Pilot ID",
     "Base Airport ID",
     "Departure Airport ID",
     "Arrival Airport ID",
@@ -53,6 +77,18 @@ FLIGHT_SEARCH_FIELDS = {
     "Arrival Date/Time":"arrival_time_utc",
 }
 
+# Dictionary for use in search_flight_range(): the indexed epoch column behind each time field
+FLIGHT_RANGE_FIELDS = {
+    "Departure Date/Time":"flight.departure_epoch",
+    "Arrival Date/Time":"flight.arrival_epoch",
+}
+
+# The flight_partition columns a partition's bounds for each time field are kept in
+FLIGHT_RANGE_BOUNDS = {
+    "Departure Date/Time":("departure_min", "departure_max"),
+    "Arrival Date/Time":("arrival_min", "arrival_max"),
+}
+
 # Dictionary for use in flight_update()
 FLIGHT_UPDATE_FIELDS = {
     "Flight Number":("flight_number", "TEXT"),
@@ -72,6 +108,13 @@ DESTINATION_SEARCH_FIELDS = {
     "Timezone":"destination.timezone",
 }
 
+# Partial-match destination search fields served by the full-text index, mapped to their destination_fts column
+DESTINATION_FTS_FIELDS = {
+    "Airport Name":"name",
+    "City":"city",
+    "Country":"country",
+}
+
 # Dictionary for use in destination_update()
 DESTINATION_UPDATE_FIELDS = {
     "Name":("name", "TEXT"),
@@ -80,137 +123,1180 @@ DESTINATION_UPDATE_FIELDS = {
     "Timezone":("timezone", "TEXT"),
 }
 
-# Validates the fields used by the update() functions 
-def validate_fields(field_label, new_value):
+# Tables that can be bulk imported: the add file used for the insert, and each column with the field label it is validated as
+IMPORT_TABLES = {
+    "pilot":("add_pilot.sql", [
+        ("name", "Name"),
+        ("licence_number", "Licence Number"),
+        ("aircraft_rating", "Aircraft Rating"),
+        ("base_id", "Base Airport ID"),
+        ("last_medical_date", "Last Medical Date"),
+    ]),
+    "flight":("add_flight.sql", [
+        ("flight_number", "Flight Number"),
+        ("departure_id", "Departure Airport ID"),
+        ("arrival_id", "Arrival Airport ID"),
+        ("pilot_id", "Pilot ID"),
+        ("departure_time_utc", "Departure Date/Time"),
+        ("arrival_time_utc", "Arrival Date/Time"),
+    ]),
+    "destination":("add_destination.sql", [
+        ("name", "Name"),
+        ("city", "City"),
+        ("country", "Country"),
+        ("timezone", "Timezone"),
+    ]),
+}
+
+# Connection settings applied as PRAGMAs when the database is opened. Chosen with --profile or FLIGHTDB_PROFILE
+CONNECTION_PROFILES = {
+    "safe":{ # sqlite's own durability defaults, with foreign key checks on
+        "journal_mode":"DELETE",
+        "synchronous":"FULL",
+        "foreign_keys":"ON",
+    },
+    "tuned":{
+        "journal_mode":"WAL", # readers no longer block the writer, and a commit is one append to the log
+        "synchronous":"NORMAL", # fsync at checkpoints rather than every commit. Safe against corruption in WAL mode
+        "cache_size":-65536, # 64 MiB page cache (negative values are KiB)
+        "mmap_size":268435456, # reads of the first 256 MiB go through memory mapping instead of read() calls
+        "temp_store":"MEMORY", # sorts and temporary indexes stay off disk
+        "foreign_keys":"ON",
+    },
+}
+DEFAULT_PROFILE = os.environ.get("FLIGHTDB_PROFILE", "tuned")
+
+# Group commit: commit once this many writes are pending, or once the oldest pending write is this many ms old.
+# The age is checked on each write and pending writes are flushed on exit. 1 write commits every row as before
+GROUP_COMMIT = {
+    "writes":int(os.environ.get("FLIGHTDB_GROUP_COMMIT_WRITES", 1)),
+    "ms":int(os.environ.get("FLIGHTDB_GROUP_COMMIT_MS", 0)),
+}
+
+# Set while a script is run so every write joins its single transaction instead of committing on its own.
+# Also counts the writes waiting for a group commit
+WRITE_STATE = {"batch":False, "pending":0, "since":0.0}
+
+# Number of rows validated and inserted per transaction by import_file()
+IMPORT_BATCH_SIZE = 1000
+
+# Fields whose value must exist in a reference table, checked against the reference cache before the database is hit
+REFERENCE_FIELDS = {
+    "Base Airport ID":"destination",
+    "Departure Airport ID":"destination",
+    "Arrival Airport ID":"destination",
+    "Timezone":"timezone",
+    "Aircraft Rating":"rating",
+}
+
+# Writes that change a reference table and so clear the reference cache
+REFERENCE_ALTERS = {"add_destination.sql", "update_destination.sql", "delete_destination.sql"}
+
+# In-process copy of the timezone, destination and rating tables, loaded on first use by reference_data(). "data" is
+# the loaded tables, or None until they are loaded. "generation" counts invalidations, so a load that was still
+# reading when the tables changed is not kept
+REFERENCE_CACHE = {"data":None, "generation":0}
+REFERENCE_LOCK = threading.Lock() # the HTTP service's readers load it while its writer invalidates it
+
+# Tables whose writes clear the reference cache when they commit
+REFERENCE_TABLES = {"destination", "timezone", "rating"}
+
+# Search files whose $where_clause is pre-expanded for every field in the dictionary
+SEARCH_TEMPLATES = {
+    "pilot_search.sql":PILOT_SEARCH_FIELDS,
+    "flight_search.sql":FLIGHT_SEARCH_FIELDS,
+    "destination_search.sql":DESTINATION_SEARCH_FIELDS,
+}
+
+# Raw text of the files expanded after startup, kept by load_statements(): the SEARCH_TEMPLATES files for the where
+# clauses compound_search() builds, and the flight files expanded for the attached partitions
+TEMPLATE_TEXT = {}
+
+# Operators a compound search criterion can use, with the number of values each takes (None for a list of any length)
+SEARCH_OPERATORS = {"=":1, "<":1, "<=":1, ">":1, ">=":1, "between":2, "in":None, "prefix":1}
+
+# Tables compound_search() runs on: the search file its where clause goes into, and the fields it can filter by
+COMPOUND_SEARCHES = {
+    "pilot":("pilot_search.sql", PILOT_SEARCH_FIELDS),
+    "flight":("flight_search.sql", FLIGHT_SEARCH_FIELDS),
+    "destination":("destination_search.sql", DESTINATION_SEARCH_FIELDS),
+}
+
+# Each table's indexed columns and row estimates, read once per table by index_stats(). With no sqlite_stat1 rows
+# the estimates fall back to the ones sqlite itself assumes: about a million rows and 10 rows per indexed value
+INDEX_STATS = {}
+DEFAULT_TABLE_ROWS = 1000000
+DEFAULT_ROWS_PER_VALUE = 10
+
+# Update files whose $set_clause is pre-expanded for every field in the dictionary, with the fixed where clause
+UPDATE_TEMPLATES = {
+    "update_pilot.sql":(PILOT_UPDATE_FIELDS, "WHERE pilot.pilot_id = :pilot_id"),
+    "update_flight.sql":(FLIGHT_UPDATE_FIELDS, "WHERE flight.flight_id = :flight_id"),
+    "update_destination.sql":(DESTINATION_UPDATE_FIELDS, "WHERE destination.destination_id = :destination_id"),
+}
+
+# Paged listing files: the key column the pages are cut on, and the search fields they can be filtered by.
+# flight_page.sql returns airport IDs, which fetch_page() names from the reference cache instead of joining destination twice
+PAGE_TEMPLATES = {
+    "pilot_page.sql":("pilot.pilot_id", PILOT_SEARCH_FIELDS),
+    "flight_page.sql":("flight.flight_id", FLIGHT_SEARCH_FIELDS),
+    "destination_page.sql":("destination.destination_id", DESTINATION_SEARCH_FIELDS),
+}
+
+# Number of rows shown per page by browse_pages()
+PAGE_SIZE = 20
+
+# Text table styles print_results() can draw. grid is the boxed style the menus use, plain pads columns under a rule
+# and tsv separates cells with tabs for other tools to read
+TABLE_FORMATS = ("grid", "plain", "tsv")
+
+# Rows write_table() reads ahead to size the columns. A longer cell further down is printed in full, out of line
+TABLE_SAMPLE_ROWS = 1000
+
+# Rows write_table() formats before each write
+TABLE_CHUNK_ROWS = 2000
+
+# Export sources: the listing file that is exported, and the change_seq column that marks a row as changed
+EXPORT_SOURCES = {
+    "flights":("all_flight.sql", "flight.change_seq"),
+    "pilots":("pilot_roster.sql", "pilot.change_seq"),
+}
+
+# Rows fetched from the cursor at a time by export_rows(), and rows per Parquet row group
+EXPORT_CHUNK_SIZE = 10000
+
+# Changes read from the changelog at a time by read_changes() and consume_changes(). Each consumer's position is kept
+# in export_state under this source name
+CHANGES_BATCH_SIZE = 1000
+CHANGES_SOURCE = "changes"
+
+# Backups: the folder snapshots are kept in and how many are kept, and the pages copied per backup step with the
+# pause after each. Other connections can read and write between steps
+BACKUP_DIR = Path(os.environ.get("FLIGHTDB_BACKUP_DIR", BASE_DIR / "backups"))
+SNAPSHOT_KEEP = int(os.environ.get("FLIGHTDB_SNAPSHOT_KEEP", 7))
+BACKUP_PAGES = int(os.environ.get("FLIGHTDB_BACKUP_PAGES", 1024))
+BACKUP_PAUSE_MS = int(os.environ.get("FLIGHTDB_BACKUP_PAUSE_MS", 5))
+
+# Times a stepped backup may start again because another connection wrote to the database, before it copies the rest
+# in a single step
+BACKUP_RESTARTS = 3
+
+# The backup started from the menu, which runs on its own thread, and how far it has got
+BACKUP_STATE = {"thread":None, "target":None, "copied":0, "total":0, "restarts":0, "error":None}
+
+# Monthly flight partitions. Each month moved out of flight is kept in its own file next to the database, named
+# <database>.YYYY-MM.db (.db.xz once archived), and attached as flight_YYYY_MM
+PARTITION_SCHEMA = re.compile(r"flight_\d{4}_\d{2}")
+
+# lzma preset partitions are archived with. 1 makes archives about 15% larger than the default 6 in a seventh of the time
+ARCHIVE_PRESET = int(os.environ.get("FLIGHTDB_ARCHIVE_PRESET", 1))
+
+# Partition files expanded for a partition schema, or the list of them for the view, by partition_statement()
+PARTITION_TEMPLATES = {"partition_bounds.sql", "partition_copy.sql", "partition_merge.sql", "partition_view.sql"}
+
+# The attached partitions by month, as flight_partitions.sql returns them, and flight's columns: every column for the
+# view and the stored ones for the copies. Filled by attach_partitions()
+PARTITIONS = {"attached":{}, "columns":[], "stored":[]}
+
+# Pilot double-booking rules: the minimum gap between one arrival and the pilot's next departure, and whether a
+# change that breaks the rules is refused ("reject") or saved with a warning ("flag")
+MIN_TURNAROUND_MINUTES = int(os.environ.get("FLIGHTDB_MIN_TURNAROUND", 30))
+CONFLICT_MODE = os.environ.get("FLIGHTDB_CONFLICT_MODE", "reject")
+
+# Flight fields that move a flight in a pilot's schedule
+SCHEDULE_FIELDS = {"Pilot ID", "Departure Date/Time", "Arrival Date/Time"}
+
+# Pilot assignment rules on top of the turnaround: the most sectors flown between rests, the least gap between
+# flights that counts as a rest, and how long a medical stays valid
+MAX_DUTY_SECTORS = int(os.environ.get("FLIGHTDB_MAX_DUTY_SECTORS", 6))
+MIN_REST_HOURS = int(os.environ.get("FLIGHTDB_MIN_REST_HOURS", 12))
+MEDICAL_VALID_DAYS = int(os.environ.get("FLIGHTDB_MEDICAL_VALID_DAYS", 365))
+
+# Columns of a file of flights for plan_assignments(): a flight's import columns without the pilot, and the rating
+# its aircraft needs
+ASSIGN_COLUMNS = [column for column in IMPORT_TABLES["flight"][1] if column[0] != "pilot_id"] + [("aircraft_rating", "Aircraft Rating")]
+
+# Itinerary search: the least time between landing and the next departure when changing flights, and the most
+# flights one itinerary may chain
+MIN_CONNECTION_MINUTES = int(os.environ.get("FLIGHTDB_MIN_CONNECTION", 45))
+MAX_ITINERARY_LEGS = 6
+
+# In-memory route network for itinerary search, built by route_network() on first use. "edges" maps each departure
+# airport to its arrival airports, each with that route's flights as arrays sorted by departure (see finish_route_edge).
+# Alters to single flights patch it in place. Bulk imports and rolled-back scripts clear it
+ROUTE_INDEX = {}
+ROUTE_LOCK = threading.Lock() # one thread builds the index while the others wait for it
+
+# Start of the epoch used by the departure_epoch and arrival_epoch columns
+EPOCH = datetime(1970, 1, 1)
+
+# Statement registry, keyed on (filename, *variant). Filled once at startup by load_statements()
+STATEMENTS = {}
+STATEMENT_STATS = {"hits":0, "misses":0}
+
+# Query instrumentation for run_statement(). A statement taking slow_ms or longer is written, with its query plan, to
+# the slow-query log (an empty log path turns the log off). trace prints every statement sqlite runs to stderr, and
+# progress_steps above 0 counts the virtual machine steps each statement takes, in units of that many steps
+INSTRUMENTATION = {
+    "slow_ms":float(os.environ.get("FLIGHTDB_SLOW_MS", 100)),
+    "log":os.environ.get("FLIGHTDB_SLOW_LOG", str(BASE_DIR / "slow_queries.jsonl")),
+    "trace":os.environ.get("FLIGHTDB_TRACE", "") not in ("", "0"),
+    "progress_steps":int(os.environ.get("FLIGHTDB_PROGRESS_STEPS", 0)),
+}
+
+# Totals for each statement run through run_statement() or stream_statement(), keyed on statement_label()
+STATEMENT_METRICS = {}
+
+# Progress handler calls since the current statement started
+PROGRESS_STATE = {"ticks":0}
+
+# Cursor run_statement() uses in the current thread instead of the global one. Set by server.py, whose reader
+# threads each borrow a connection from its pool
+THREAD_STATE = threading.local()
+
+# Guards STATEMENT_METRICS and the slow-query log, which server.py's threads all record into
+METRICS_LOCK = threading.Lock()
+
+# Result cache for run_statement() reads: how many results it holds, how many seconds one is used for, and the most rows
+# a result may have to be kept. 0 entries turns it off. The TTL bounds how stale a result can be after another process
+# writes to the database, as only this process's writes invalidate results
+RESULT_CACHE = {
+    "entries":int(os.environ.get("FLIGHTDB_CACHE_ENTRIES", 512)),
+    "ttl":float(os.environ.get("FLIGHTDB_CACHE_TTL", 60)),
+    "max_rows":int(os.environ.get("FLIGHTDB_CACHE_MAX_ROWS", 1000)),
+}
+
+# Cached reads keyed on (statement key, params), least recently used first. Each holds the versions of the tables it
+# read, when it was stored and its rows
+RESULT_ENTRIES = OrderedDict()
+
+# Version of each table, bumped by every write to it and again when the write commits. A cached result is only used
+# while every table it read is still at the version it was read at
+TABLE_VERSIONS = {}
+
+# Tables written since the last commit or rollback, bumped again when it ends
+UNCOMMITTED_TABLES = set()
+
+# Tables each statement reads and writes, keyed on the statement key. Worked out once by statement_tables()
+STATEMENT_TABLES = {}
+
+# Result cache totals for result_cache_report(). stale counts results dropped because a table they read was written
+RESULT_CACHE_STATS = {"hits":0, "misses":0, "stale":0, "expired":0, "evictions":0, "uncacheable":0}
+
+# Guards the result cache and the table versions, which server.py's reader threads and writer thread share
+RESULT_CACHE_LOCK = threading.Lock()
+
+# Reads that decide whether a write is allowed or how flights are assigned, so are never served from the result cache.
+# Another process's booking would otherwise go unseen until the TTL ran out, and a double-booking be accepted
+UNCACHED_STATEMENTS = {"pilot_neighbour_flights.sql", "flight_schedule.sql", "assignment_pilots.sql", "pilot_recent_flights.sql"}
+
+# Sql functions that can return something different on every call, so results that use them are not cached
+VOLATILE_FUNCTIONS = {"random", "randomblob", "changes", "total_changes", "last_insert_rowid", "current_date", "current_time", "current_timestamp"}
+
+# Checks a value against the rules for its field. Returns the cleaned value or raises ValueError with the reason
+def check_field(field_label, value):
+    value = str(value).strip()
     # Entry validaton for ints
     if field_label in INT_FIELDS:
         try:
-            return int(new_value)
+            value = int(value)
         except ValueError:
-            print(f"\n{field_label} must be a number.")
-            print("Returning to main menu...")
-            main_menu()
+            raise ValueError(f"{field_label} must be a number.") from None
+        return check_reference(field_label, value)
     # Entry validation for dates        
     if field_label in DATE_FIELDS:
         try:
-            datetime.strptime(new_value.strip(), "%Y-%m-%d")
-            return new_value.strip()
+            datetime.strptime(value, "%Y-%m-%d")
+            return value
         except ValueError:
-            print(f"\n{field_label} must be in the format YYYY-MM-DD.")
-            print("Returning to main menu...")
-            main_menu()
+            raise ValueError(f"{field_label} must be in the format YYYY-MM-DD.") from None
     # Entry validation for datetime fields
     if field_label in DATE_TIME_FIELDS:
         try:
-            datetime.strptime(new_value.strip(), "%Y-%m-%d %HH:%MM:%SS")
-            return new_value.strip()
+            datetime.strptime(value, "%Y-%m-%d %H:%M:%S")
+            return value
         except ValueError:
-            print(f"\n{field_label} must be in the format YYYY-MM-DD HH:MM:SS")
-            print("Returning to main menu...")
-            main_menu()
-    return new_value.strip()
-    
-# Helper function to print results
-def print_results(rows):
-    if not rows:
-        print("No results.")
+            raise ValueError(f"{field_label} must be in the format YYYY-MM-DD HH:MM:SS") from None
+    return check_reference(field_label, value)
+
+# Helper function to print results. Takes a list or a stream of rows, either sqlite3.Row or dicts, and prints them as
+# a grid, plain or tsv table. Rows from a cursor are printed as they are read
+def print_results(rows, fmt="grid", out=None):
+    rows = iter(rows or ()) # None, as from a write, has no rows
+    first = next(rows, None)
+    if first is None:
+        print("No results.", file=out)
         return
-    if isinstance(rows[0], sqlite3.Row):
-        rows = [dict(r) for r in rows]
-    print(tabulate(rows, headers="keys", tablefmt="grid"))
+    if isinstance(first, dict):
+        headers = list(first)
+        rows = ([row.get(header) for header in headers] for row in chain([first], rows))
+    else:
+        headers = first.keys() # the cursor's column names
+        rows = chain([first], rows)
+    write_table(headers, rows, fmt, out or sys.stdout)
+
+# Returns a row's cells ready for one line of a table: blank for NULL, and tabs and line breaks in text as spaces
+def table_cells(row):
+    return [re.sub(r"[\t\r\n]", " ", value) if isinstance(value, str) else "" if value is None else value for value in row]
+
+# Writes rows of values under headers as a table. The column widths and alignment come from the first
+# TABLE_SAMPLE_ROWS rows, with numbers right-aligned. The rest are formatted and written TABLE_CHUNK_ROWS at a time
+def write_table(headers, rows, fmt, out):
+    rows = iter(rows)
+    sample = list(islice(rows, TABLE_SAMPLE_ROWS))
+    widths, aligns = [], []
+    for i, header in enumerate(headers):
+        values = [row[i] for row in sample if row[i] is not None]
+        widths.append(max([len(header), *(len(str(value)) for value in values)]))
+        aligns.append(">" if values and all(isinstance(value, (int, float)) for value in values) else "<")
+    cell_formats = [f"{{!s:{align}{width}}}" for align, width in zip(aligns, widths)]
+    if fmt == "grid":
+        rule = "+" + "+".join("-" * (width + 2) for width in widths) + "+"
+        row_format = "| " + " | ".join(cell_formats) + " |"
+        lines = [rule, row_format.format(*headers), rule.replace("-", "=")]
+        separator, end = f"\n{rule}\n", f"\n{rule}\n"
+    elif fmt == "plain":
+        if aligns[-1] == "<":
+            cell_formats[-1] = "{!s}" # no padding after the last column
+        row_format = "  ".join(cell_formats)
+        lines = [row_format.format(*headers), "  ".join("-" * width for width in widths)]
+        separator, end = "\n", "\n"
+    else:
+        row_format = "\t".join(["{!s}"] * len(headers))
+        lines = [row_format.format(*headers)]
+        separator, end = "\n", "\n"
+    out.write("\n".join(lines) + "\n")
+    format_row = row_format.format
+    breaks = separator.count("\n")
+    tabs = len(headers) - 1 if fmt == "tsv" else 0
+    chunk = sample
+    while chunk:
+        lines = [format_row(*(["" if value is None else value for value in row] if None in row else row)) for row in chunk]
+        text = separator.join(lines)
+        if text.count("\n") != breaks * (len(lines) - 1) or "\r" in text or (tabs and text.count("\t") != tabs * len(lines)):
+            text = separator.join(format_row(*table_cells(row)) for row in chunk) # a cell holds a tab or line break
+        out.write(text + end)
+        chunk = list(islice(rows, TABLE_CHUNK_ROWS))
 
 # Reads a sql script
 def load_sql(sql_dir: Path, filename: str) -> str:
     path = sql_dir / filename # uses path to allow definition of script by filename alone.
     return path.read_text().strip()
 
-# Executes sql queries by opening files. Used for fixed queries. Prints out the results. 
+# Loads the reference tables into REFERENCE_CACHE the first time they are needed after startup or a change. The
+# tables are read outside the lock, and only kept if nothing invalidated the cache meanwhile: a reader's snapshot from
+# before a commit would otherwise put the old rows back after the writer had cleared them
+def reference_data():
+    with REFERENCE_LOCK:
+        data, generation = REFERENCE_CACHE["data"], REFERENCE_CACHE["generation"]
+    if data is not None:
+        return data
+    destinations = run_statement("destinations.sql")
+    timezones = run_statement("timezone.sql")
+    ratings = run_statement("ratings.sql")
+    data = {
+        "destinations":destinations, # display rows, as destinations.sql returns them
+        "destination":{row["Destination ID"]: row["Airport Name"] for row in destinations},
+        "timezones":timezones,
+        "timezone":{row["code"]: row["acronym"] for row in timezones},
+        "ratings":ratings,
+        "rating":{row["Rating Code"]: row["Rating"] for row in ratings},
+    }
+    with REFERENCE_LOCK:
+        if REFERENCE_CACHE["generation"] == generation:
+            REFERENCE_CACHE["data"] = data
+    return data
+
+# Clears the reference cache after a write to a reference table. The next lookup reloads it
+def invalidate_reference_data():
+    with REFERENCE_LOCK:
+        REFERENCE_CACHE["data"] = None
+        REFERENCE_CACHE["generation"] += 1
+
+# Checks an ID or code exists in its reference table. Returns the value or raises ValueError
+def check_reference(field_label, value):
+    table = REFERENCE_FIELDS.get(field_label)
+    if table and value not in reference_data()[table]:
+        raise ValueError(f"{field_label} {value} does not match a {table}.")
+    return value
+
+# Builds the where clause used by the search() functions
+def search_where_clause(column, partial):
+    if partial:
+        return f"WHERE {column} LIKE ?" # allows for partial matches when searching
+    return f"WHERE {column} = ?" # exact value
+
+# Builds the where clause used by the time range search. Bounds are epoch seconds, start inclusive and end exclusive
+def range_where_clause(column, by_departure_airport):
+    where_clause = f"WHERE {column} >= :start AND {column} < :end"
+    if by_departure_airport:
+        where_clause += " AND flight.departure_id = :departure_id"
+    return where_clause
+
+# Builds the where clause used by the paged listings. Pages are cut on the key column rather than OFFSET
+def page_where_clause(key_column, column=None, partial=False):
+    where_clause = f"WHERE {key_column} > :after"
+    if column:
+        where_clause += f" AND {column} LIKE :value" if partial else f" AND {column} = :value"
+    return where_clause
+
+# Turns free text into an FTS5 prefix query on one column, e.g. "Krak pol" -> city : ("Krak"* "pol"*)
+# Returns None if the text has no words, in which case the caller falls back to LIKE
+def fts_prefix_query(column, value):
+    words = re.findall(r"\w+", value)
+    if not words:
+        return None
+    return f"{column} : (" + " ".join(f'"{word}"*' for word in words) + ")"
+
+# Returns a table's indexed columns, each with the rows one value of it is expected to match, and the table's row count.
+# Only the first column of an index can drive a single column search, so later columns are left out
+def index_stats(table):
+    if table not in INDEX_STATS:
+        stats = {row["idx"]: [int(n) for n in row["stat"].split()[:2]] for row in run_statement("index_stats.sql", params=(table,))}
+        table_rows = max([counts[0] for counts in stats.values()], default=DEFAULT_TABLE_ROWS)
+        columns = {}
+        for row in run_statement("index_columns.sql", params={"table":table}):
+            if row["is_unique"]:
+                rows_per_value = 1
+            elif len(stats.get(row["index_name"], [])) == 2:
+                rows_per_value = stats[row["index_name"]][1]
+            else:
+                rows_per_value = DEFAULT_ROWS_PER_VALUE
+            columns[row["column_name"]] = min(rows_per_value, columns.get(row["column_name"], rows_per_value))
+        INDEX_STATS[table] = (columns, table_rows)
+    return INDEX_STATS[table]
+
+# Returns the rows one compound search criterion is expected to match, from the planner statistics, or None when its
+# column has no index and so cannot drive the search. Ranges use sqlite's own guesses of a quarter of the table for
+# one bound and a sixty-fourth for two
+def criterion_estimate(table, column, operator, count):
+    columns, table_rows = index_stats(table)
+    rows_per_value = columns.get(column.split(".")[-1])
+    if rows_per_value is None:
+        return None
+    if operator == "=":
+        return rows_per_value
+    if operator == "in":
+        return rows_per_value * count
+    if operator in ("between", "prefix"):
+        return max(rows_per_value, table_rows // 64)
+    return max(rows_per_value, table_rows // 4)
+
+# Builds one criterion's condition with its values as named parameters p<number>. A plus sign in front of the column
+# stops sqlite from using the column's index for it, so another criterion drives the search
+def criterion_condition(column, operator, number, plus):
+    column = f"+{column}" if plus else column
+    if operator == "between":
+        return f"{column} BETWEEN :p{number}_low AND :p{number}_high"
+    if operator == "prefix":
+        return f"{column} >= :p{number}_low AND {column} < :p{number}_high" # a range, unlike LIKE, can use the index
+    if operator == "in":
+        return f"{column} IN (SELECT value FROM json_each(:p{number}))" # one parameter, however many values
+    return f"{column} {operator} :p{number}"
+
+# Adds a statement to the registry, rejecting empty or unexpanded sql
+def register_statement(key, sql):
+    if not sql or "$" in sql:
+        raise ValueError(f"Invalid statement in {key[0]}: {sql!r}")
+    STATEMENTS[key] = sql
+
+# Loads every file in QUERIES_DIR and ALTERS_DIR once and pre-expands the search and update variants
+def load_statements():
+    STATEMENTS.clear()
+    for sql_dir in (QUERIES_DIR, ALTERS_DIR):
+        for path in sorted(sql_dir.glob("*.sql")):
+            sql_text = load_sql(sql_dir, path.name)
+            if path.name in SEARCH_TEMPLATES:
+                TEMPLATE_TEXT[path.name] = sql_text
+                for field_label, column in SEARCH_TEMPLATES[path.name].items():
+                    for partial in (False, True):
+                        sql = Template(sql_text).substitute(where_clause=search_where_clause(column, partial))
+                        register_statement((path.name, field_label, partial), sql)
+            elif path.name in PAGE_TEMPLATES:
+                key_column, fields = PAGE_TEMPLATES[path.name]
+                sql = Template(sql_text).substitute(where_clause=page_where_clause(key_column))
+                register_statement((path.name, None, False), sql) # unfiltered listing
+                for field_label, column in fields.items():
+                    for partial in (False, True):
+                        sql = Template(sql_text).substitute(where_clause=page_where_clause(key_column, column, partial))
+                        register_statement((path.name, field_label, partial), sql)
+            elif path.name == "flight_range.sql":
+                TEMPLATE_TEXT[path.name] = sql_text # also expanded for the partitions a range can match
+                for field_label, column in FLIGHT_RANGE_FIELDS.items():
+                    for by_departure_airport in (False, True):
+                        sql = Template(sql_text).substitute(where_clause=range_where_clause(column, by_departure_airport), order_by=f"{column}, flight.flight_id", flight_source="flight")
+                        register_statement((path.name, field_label, by_departure_airport), sql)
+            elif path.name == "pilot_schedule_sweep.sql":
+                register_statement((path.name,), Template(sql_text).substitute(flight_source="main.flight INDEXED BY idx_flight_pilot_epoch"))
+                # INDEXED BY cannot name the partition view, but sqlite merges each partition's idx_flight_pilot_epoch scan in order
+                register_statement((path.name, "partitioned"), Template(sql_text).substitute(flight_source="flight"))
+            elif path.name in PARTITION_TEMPLATES:
+                TEMPLATE_TEXT[path.name] = sql_text # expanded once the partitions are known
+            elif path.name in {filename for filename, _column in EXPORT_SOURCES.values()}:
+                column = next(column for filename, column in EXPORT_SOURCES.values() if filename == path.name)
+                register_statement((path.name,), Template(sql_text).substitute(where_clause="")) # every row
+                register_statement((path.name, True), Template(sql_text).substitute(where_clause=f"WHERE {column} > :since AND {column} <= :until"))
+            elif path.name == "pilot_duty_totals.sql":
+                register_statement((path.name, False), Template(sql_text).substitute(where_clause="")) # every pilot
+                register_statement((path.name, True), Template(sql_text).substitute(where_clause="WHERE pilot.pilot_id = :pilot_id"))
+            elif path.name in UPDATE_TEMPLATES:
+                fields, where_clause = UPDATE_TEMPLATES[path.name]
+                for field_label, (column, _kind) in fields.items():
+                    sql = Template(sql_text).substitute(set_clause=f"{column} = :value", where_clause=where_clause)
+                    register_statement((path.name, field_label), sql)
+            else:
+                register_statement((path.name,), sql_text)
+
+# Checks every registered statement against the schema by preparing it with EXPLAIN (nothing is executed)
+def validate_statements(conn):
+    for key, sql in STATEMENTS.items():
+        if key[0] in PARTITION_TEMPLATES:
+            continue # already run on the partitions they were built for
+        names = re.findall(r":([A-Za-z_]\w*)", sql)
+        params = {name: None for name in names} if names else (None,) * sql.count("?")
+        try:
+            conn.execute(f"EXPLAIN {sql}", params)
+        except sqlite3.Error as e:
+            print(f"Statement error in {key[0]}: ", e)
+            raise
+
+# Returns a fingerprint of everything validate_statements() depends on: the registered statements, the schema version,
+# the attached partitions and the sqlite version
+def statement_fingerprint():
+    text = "\n".join(sql for key, sql in STATEMENTS.items() if key[0] not in PARTITION_TEMPLATES)
+    schema_version = run_statement("schema_version.sql")[0][0]
+    return f"{zlib.crc32(text.encode('utf-8')):08x}-{schema_version}-{','.join(sorted(PARTITIONS['attached']))}-{sqlite3.sqlite_version}"
+
+# Returns the registered sql for a file and variant. Files added after startup are loaded on first use
+def get_statement(filename, *variant):
+    key = (filename, *variant)
+    sql = STATEMENTS.get(key)
+    if sql is not None:
+        STATEMENT_STATS["hits"] += 1
+        return sql
+    STATEMENT_STATS["misses"] += 1
+    if variant:
+        raise ValueError(f"Unsupported statement variant {key}")
+    sql_dir = QUERIES_DIR if (QUERIES_DIR / filename).exists() else ALTERS_DIR
+    register_statement(key, load_sql(sql_dir, filename))
+    return STATEMENTS[key]
+
+# Returns the name a statement is reported under: its file, followed by the variant if it has one
+def statement_label(key):
+    return key[0] if len(key) == 1 else f"{key[0]} {list(key[1:])}"
+
+# Counts progress handler calls for the statement running. Returning 0 lets it carry on
+def count_progress():
+    PROGRESS_STATE["ticks"] += 1
+    return 0
+
+# Prints each statement sqlite runs, with its bound values filled in, to stderr
+def trace_statement(sql):
+    print(f"[trace {time.strftime('%H:%M:%S')}] {sql}", file=sys.stderr)
+
+# Turns on the trace and progress callbacks chosen in INSTRUMENTATION for a connection
+def instrument_connection(connection):
+    if INSTRUMENTATION["trace"]:
+        connection.set_trace_callback(trace_statement)
+    if INSTRUMENTATION["progress_steps"] > 0:
+        connection.set_progress_handler(count_progress, INSTRUMENTATION["progress_steps"])
+
+# Returns the cursor statements run on in this thread: the one server.py has bound, or the global cursor
+def statement_cursor():
+    return getattr(THREAD_STATE, "cursor", None) or c
+
+# Runs a registered statement and records it. Returns every row, or None when fetch is off, in which case the cursor's
+# rowcount and lastrowid are left for the caller. With many the statement runs once for each params in a list
+def run_statement(filename, *variant, params=(), fetch=True, many=False):
+    key = (filename, *variant)
+    sql = get_statement(filename, *variant)
+    plan_params = (params[0] if params else ()) if many else params # the plan is the same for every row
+    cursor = statement_cursor()
+    reads, writes = statement_tables(key, sql, plan_params, cursor.connection)
+    cacheable = fetch and not many and reads and not writes and filename not in UNCACHED_STATEMENTS
+    entry_key = result_key(key, params) if cacheable and RESULT_CACHE["entries"] else None
+    if entry_key is not None:
+        rows = cached_result(entry_key, key)
+        if rows is not None:
+            return rows
+        versions = table_versions(reads)
+    PROGRESS_STATE["ticks"] = 0
+    started = time.perf_counter()
+    try:
+        if many:
+            cursor.executemany(sql, params)
+        else:
+            cursor.execute(sql, params)
+        rows = cursor.fetchall() if fetch else None
+    except sqlite3.Error:
+        record_statement(key, sql, plan_params, time.perf_counter() - started, 0, 0, failed=True)
+        if writes is None or writes:
+            invalidate_results(writes) # part of a failed executemany may have been written
+        raise
+    record_statement(key, sql, plan_params, time.perf_counter() - started, len(rows) if fetch else 0, max(cursor.rowcount, 0))
+    if writes is None or writes:
+        invalidate_results(writes)
+        UNCOMMITTED_TABLES.update(writes or ())
+    elif entry_key is not None:
+        store_result(entry_key, versions, rows)
+    return rows
+
+# Returns the tables a statement reads and writes. They are found once, by preparing it with EXPLAIN under an
+# authorizer, which sqlite calls for every table the statement and the triggers it fires touch. reads is None when its
+# results cannot be cached: it writes, calls a volatile function or reads the schema or a pragma. writes is None when
+# it changes more than rows, such as the schema, a pragma or the attached databases
+def statement_tables(key, sql, params, connection):
+    tables = STATEMENT_TABLES.get(key)
+    if tables is not None:
+        return tables
+    reads, writes = set(), set()
+    found = {"cacheable":True, "schema":False}
+    def authorize(action, name, detail, _schema, _source):
+        if action == sqlite3.SQLITE_READ:
+            if name.startswith(("sqlite_", "pragma_")):
+                found["cacheable"] = False
+            else:
+                reads.add(name)
+        elif action in (sqlite3.SQLITE_INSERT, sqlite3.SQLITE_UPDATE, sqlite3.SQLITE_DELETE):
+            if not name.startswith("sqlite_"): # sqlite's own bookkeeping, as for full-text and pragma tables
+                writes.add(name)
+        elif action == sqlite3.SQLITE_FUNCTION:
+            found["cacheable"] = found["cacheable"] and detail not in VOLATILE_FUNCTIONS
+        elif action == sqlite3.SQLITE_PRAGMA:
+            found["cacheable"] = False
+            found["schema"] = found["schema"] or detail is not None # a pragma given a value sets it
+        elif action not in (sqlite3.SQLITE_SELECT, sqlite3.SQLITE_RECURSIVE, sqlite3.SQLITE_TRANSACTION, sqlite3.SQLITE_SAVEPOINT):
+            found["schema"] = True # creates, drops, alters, attaches or detaches
+        return sqlite3.SQLITE_OK
+    connection.set_authorizer(authorize)
+    try:
+        connection.execute(f"EXPLAIN {sql}", params)
+    except sqlite3.Error:
+        found.update(cacheable=False, schema=True) # it fails again when it runs, if it runs at all
+    finally:
+        connection.set_authorizer(None)
+    if found["schema"]:
+        tables = (None, None)
+    elif writes:
+        tables = (None, writes)
+    else:
+        tables = (reads if found["cacheable"] and reads else None, set())
+    if reads or writes or found["schema"] or not found["cacheable"]:
+        STATEMENT_TABLES[key] = tables # one that touched nothing, as DROP VIEW IF EXISTS with no view, is checked each run
+    return tables
+
+# Returns the result cache key for a statement and its params, or None if the params cannot be hashed
+def result_key(key, params):
+    try:
+        entry_key = (key, tuple(sorted(params.items())) if isinstance(params, dict) else tuple(params))
+        hash(entry_key)
+        return entry_key
+    except TypeError:
+        RESULT_CACHE_STATS["uncacheable"] += 1
+        return None
+
+# Returns the current version of each table, to store with a result read from them
+def table_versions(tables):
+    with RESULT_CACHE_LOCK:
+        return tuple((table, TABLE_VERSIONS.get(table, 0)) for table in sorted(tables))
+
+# Returns a copy of a cached result's rows, or None when there is none or it has expired or gone stale
+def cached_result(entry_key, key):
+    with RESULT_CACHE_LOCK:
+        entry = RESULT_ENTRIES.get(entry_key)
+        if entry is not None:
+            versions, stored, rows = entry
+            if time.monotonic() - stored > RESULT_CACHE["ttl"]:
+                del RESULT_ENTRIES[entry_key]
+                RESULT_CACHE_STATS["expired"] += 1
+            elif any(TABLE_VERSIONS.get(table, 0) != version for table, version in versions):
+                del RESULT_ENTRIES[entry_key]
+                RESULT_CACHE_STATS["stale"] += 1
+            else:
+                RESULT_ENTRIES.move_to_end(entry_key)
+                RESULT_CACHE_STATS["hits"] += 1
+                with METRICS_LOCK:
+                    metrics = STATEMENT_METRICS.get(statement_label(key))
+                    if metrics is not None:
+                        metrics["cache_hits"] = metrics.get("cache_hits", 0) + 1
+                return list(rows) # callers may change the list they are given
+        RESULT_CACHE_STATS["misses"] += 1
+        return None
+
+# Stores a result with the table versions read before it ran, so a write made while it ran leaves it stale. Results
+# over max_rows are not kept, and the least recently used results are dropped to keep within the entry limit
+def store_result(entry_key, versions, rows):
+    if len(rows) > RESULT_CACHE["max_rows"]:
+        return
+    with RESULT_CACHE_LOCK:
+        RESULT_ENTRIES[entry_key] = (versions, time.monotonic(), list(rows))
+        RESULT_ENTRIES.move_to_end(entry_key)
+        while len(RESULT_ENTRIES) > RESULT_CACHE["entries"]:
+            RESULT_ENTRIES.popitem(last=False)
+            RESULT_CACHE_STATS["evictions"] += 1
+
+# Bumps the version of each table given, so cached results that read them are not used again. With None, for a change
+# to the schema, the attached partitions or the whole database, drops every result and the tables of every statement
+def invalidate_results(tables=None):
+    with RESULT_CACHE_LOCK:
+        if tables is None:
+            RESULT_ENTRIES.clear()
+            STATEMENT_TABLES.clear()
+            return
+        for table in tables:
+            TABLE_VERSIONS[table] = TABLE_VERSIONS.get(table, 0) + 1
+
+# Bumps the tables written since the last commit or rollback when it ends. Other connections only see the writes
+# once they commit, so a result they read in between holds the old rows. After a rollback results read on this
+# connection hold rows that were undone
+def end_write_transaction():
+    invalidate_results(UNCOMMITTED_TABLES)
+    if UNCOMMITTED_TABLES & REFERENCE_TABLES:
+        invalidate_reference_data() # a group commit can land after the write's own invalidation, and readers load in between
+    UNCOMMITTED_TABLES.clear()
+
+# Returns the result cache totals and hit ratio, for --stats, /stats and the end of a menu session
+def result_cache_report():
+    with RESULT_CACHE_LOCK:
+        lookups = RESULT_CACHE_STATS["hits"] + RESULT_CACHE_STATS["misses"]
+        return {"entries":len(RESULT_ENTRIES), **RESULT_CACHE_STATS, "hit_ratio":round(RESULT_CACHE_STATS["hits"] / lookups, 3) if lookups else None}
+
+# Runs a registered read on its own cursor and yields the rows, fetched size at a time, for results too large to hold.
+# Only the time spent in sqlite is recorded, not the caller's work between batches
+def stream_statement(filename, *variant, params=(), size=1000):
+    key = (filename, *variant)
+    sql = get_statement(filename, *variant)
+    cursor = statement_cursor().connection.cursor()
+    PROGRESS_STATE["ticks"] = 0
+    elapsed, count = 0.0, 0
+    try:
+        started = time.perf_counter()
+        cursor.execute(sql, params)
+        elapsed += time.perf_counter() - started
+        while True:
+            started = time.perf_counter()
+            rows = cursor.fetchmany(size)
+            elapsed += time.perf_counter() - started
+            if not rows:
+                break
+            count += len(rows)
+            yield from rows
+    except sqlite3.Error:
+        record_statement(key, sql, params, elapsed, count, 0, failed=True)
+        raise
+    finally:
+        cursor.close()
+    record_statement(key, sql, params, elapsed, count, 0)
+
+# Adds a statement run to STATEMENT_METRICS, and to the slow-query log if it took slow_ms or longer
+def record_statement(key, sql, params, elapsed, rows, changes, failed=False):
+    label = statement_label(key)
+    elapsed_ms = elapsed * 1000
+    steps = PROGRESS_STATE["ticks"] * INSTRUMENTATION["progress_steps"]
+    with METRICS_LOCK:
+        metrics = STATEMENT_METRICS.setdefault(label, {"calls":0, "errors":0, "total_ms":0.0, "max_ms":0.0, "rows":0, "changes":0, "vm_steps":0, "slow":0})
+        metrics["calls"] += 1
+        metrics["errors"] += failed
+        metrics["total_ms"] += elapsed_ms
+        metrics["max_ms"] = max(metrics["max_ms"], elapsed_ms)
+        metrics["rows"] += rows
+        metrics["changes"] += changes
+        metrics["vm_steps"] += steps
+        if elapsed_ms >= INSTRUMENTATION["slow_ms"]:
+            metrics["slow"] += 1
+    if elapsed_ms >= INSTRUMENTATION["slow_ms"] and INSTRUMENTATION["log"]:
+        log_slow_statement(label, sql, params, elapsed_ms, rows, changes, steps, failed)
+
+# Returns the EXPLAIN QUERY PLAN of a statement as lines indented to show the plan's tree
+def query_plan(sql, params):
+    try:
+        plan = statement_cursor().connection.execute(f"EXPLAIN QUERY PLAN {sql}", params).fetchall()
+    except sqlite3.Error as e:
+        return [f"no plan: {e}"]
+    depth = {0: -1} # plan rows give their parent's id, 0 being the root
+    lines = []
+    for node_id, parent, _unused, detail in plan:
+        depth[node_id] = depth.get(parent, -1) + 1
+        lines.append("  " * depth[node_id] + detail)
+    return lines
+
+# Appends a slow statement to the slow-query log as one JSON line, with the parameters it ran with and its plan
+def log_slow_statement(label, sql, params, elapsed_ms, rows, changes, steps, failed):
+    entry = {
+        "time":(EPOCH + timedelta(seconds=time.time())).strftime("%Y-%m-%dT%H:%M:%SZ"),
+        "statement":label,
+        "ms":round(elapsed_ms, 3),
+        "rows":rows,
+        "changes":changes,
+        "vm_steps":steps if INSTRUMENTATION["progress_steps"] else None,
+        "failed":failed,
+        "params":params,
+        "sql":sql,
+        "plan":query_plan(sql, params),
+    }
+    try:
+        with METRICS_LOCK, open(INSTRUMENTATION["log"], "a", encoding="utf-8") as f: # one line at a time from server.py's threads
+            f.write(json.dumps(entry, default=str) + "\n")
+    except OSError as e:
+        print("Slow-query log error: ", e, file=sys.stderr)
+
+# Returns STATEMENT_METRICS as rows for print_results(), the statements with the most total time first
+def statement_report():
+    with METRICS_LOCK: # a copy, as server.py's threads add statements and runs while /stats reads them
+        items = [(label, dict(metrics)) for label, metrics in STATEMENT_METRICS.items()]
+    rows = []
+    for label, metrics in sorted(items, key=lambda item: item[1]["total_ms"], reverse=True):
+        row = {
+            "Statement":label,
+            "Calls":metrics["calls"],
+            "Errors":metrics["errors"],
+            "Total ms":round(metrics["total_ms"], 2),
+            "Mean ms":round(metrics["total_ms"] / metrics["calls"], 3),
+            "Max ms":round(metrics["max_ms"], 3),
+            "Rows":metrics["rows"],
+            "Changes":metrics["changes"],
+            "Slow":metrics["slow"],
+            "Cache Hits":metrics.get("cache_hits", 0),
+        }
+        if INSTRUMENTATION["progress_steps"]:
+            row["VM Steps"] = metrics["vm_steps"]
+        rows.append(row)
+    return rows
+
+# Executes sql queries from the statement registry. Used for fixed queries. Prints out the results. 
 def execute_sql(filename):    
-    sql = load_sql(QUERIES_DIR, filename)   
     try: 
-        c.execute(sql)        
-        rows = c.fetchall()
-        print_results(rows)
+        print_results(stream_statement(filename)) # printed as the rows are read
     except sqlite3.Error as e:
         print("Query error: ", e)
 
+# Fetches the page of rows whose key is after the given one. Returns the rows and whether another page follows
+def fetch_page(filename, after, field_label=None, value=None, *, partial=False):
+    params = {"after": after, "limit": PAGE_SIZE + 1} # one extra row shows whether there is a next page
+    if field_label:
+        params["value"] = f"%{value}%" if partial else value
+    rows = run_statement(filename, field_label, partial, params=params)
+    more = len(rows) > PAGE_SIZE
+    rows = rows[:PAGE_SIZE]
+    if filename == "flight_page.sql":
+        rows = [name_flight_airports(row) for row in rows]
+    return rows, more
+
+# Swaps the airport IDs in a flight listing row for names from the reference cache
+def name_flight_airports(row):
+    names = reference_data()["destination"]
+    return {key: names.get(value, value) if key in ("Departure Airport", "Arrival Airport") else value for key, value in zip(row.keys(), row)}
+
+# Returns the key a paged listing row was cut on: the first column of every paged query
+def page_key(row):
+    return next(iter(row.values())) if isinstance(row, dict) else row[0]
+
+# Prints a listing one page at a time with next/previous navigation. Only the current page is held in memory
+def browse_pages(filename, field_label=None, value=None, *, partial=False):
+    starts = [0] # the key each visited page starts after, used to step back
+    while True:
+        try:
+            rows, more = fetch_page(filename, starts[-1], field_label, value, partial=partial)
+        except sqlite3.Error as e:
+            print("Query error: ", e)
+            return
+        print_results(rows)
+        if not more and len(starts) == 1: # everything fitted on one page
+            return
+        print(f"Page {len(starts)}")
+        while True:
+            choice = input("N for next page, P for previous page, Q to quit: ").strip().lower()
+            if choice == "n" and more:
+                starts.append(page_key(rows[-1]))
+                break
+            elif choice == "p" and len(starts) > 1:
+                starts.pop()
+                break
+            elif choice == "q":
+                return
+            else:
+                print("Invalid Input")
+
 # Executes sql queries that search by an individual parameter e.g. pilot_id
 def execute_param_sql(filename, param):
-    sql = load_sql(QUERIES_DIR, filename)   
     try: 
-        c.execute(sql, param)        
-        rows = c.fetchall()
+        rows = run_statement(filename, params=param)
         print_results(rows)
     except sqlite3.Error as e:
         print("Query error: ", e)
 
+# Returns the start and the last second of a time bound. They are the same for a full date and time, and span the
+# day for a date on its own
+def time_bound_span(value):
+    start = parse_time_bound(value)
+    end = parse_time_bound(value, end=True)
+    return start, end - 1 if end != start else end
+
+# Converts a compound search criterion's values for its field. IDs and licence numbers become integers and flight
+# times epoch seconds, with a date on its own covering the whole day. Returns the operator, which "=" on a date
+# turns into "between", and the values. Raises ValueError if a value does not fit the field or operator
+def criterion_values(field_label, operator, values):
+    if field_label in FLIGHT_RANGE_FIELDS:
+        if operator == "prefix":
+            raise ValueError(f"{field_label} cannot be searched by prefix.")
+        spans = [time_bound_span(value) for value in values]
+        if operator == "=" and spans[0][0] != spans[0][1]:
+            return "between", list(spans[0])
+        if operator == "between":
+            return operator, [spans[0][0], spans[1][1]]
+        return operator, [span[1] if operator in ("<=", ">") else span[0] for span in spans]
+    if field_label == "ID" or field_label.endswith(" ID") or field_label in INT_FIELDS:
+        if operator == "prefix":
+            raise ValueError(f"{field_label} cannot be searched by prefix.")
+        try:
+            return operator, [int(value) for value in values]
+        except (TypeError, ValueError):
+            raise ValueError(f"{field_label} must be a number.") from None
+    values = [str(value).strip() for value in values]
+    if operator == "prefix":
+        if not values[0]:
+            raise ValueError("A prefix search needs at least one character.")
+        return operator, [values[0], values[0][:-1] + chr(ord(values[0][-1]) + 1)] # every value that starts with the prefix sorts below this
+    return operator, values
+
+# Searches one table ("pilot", "flight" or "destination") on several criteria at once, each a (field label, operator,
+# value) tuple. The operators are SEARCH_OPERATORS. between takes a (low, high) pair, in a list of values and prefix the
+# start of a text value. match "all" needs every criterion to hold and "any" at least one.
+# With "all", the indexed criterion expected to match the fewest rows goes first and drives the search. The others are
+# checked against the rows it finds rather than through their own indexes. Returns the rows of the table's search
+# file. Raises ValueError for an unknown field or operator, or a value that does not fit
+def compound_search(table, criteria, *, match="all"):
+    filename, fields = COMPOUND_SEARCHES[table]
+    if match not in ("all", "any"):
+        raise ValueError('match must be "all" or "any".')
+    if not criteria:
+        raise ValueError("A search needs at least one criterion.")
+    terms = []
+    params = {}
+    for number, (field_label, operator, value) in enumerate(criteria):
+        if field_label not in fields:
+            raise ValueError(f"Unsupported search field {field_label}")
+        if operator not in SEARCH_OPERATORS:
+            raise ValueError(f"Unsupported operator {operator}. Use one of {', '.join(SEARCH_OPERATORS)}.")
+        values = list(value) if isinstance(value, (list, tuple)) else [value]
+        expected = SEARCH_OPERATORS[operator]
+        if (expected is None and not values) or (expected is not None and len(values) != expected):
+            raise ValueError(f"{operator} takes {'at least one value' if expected is None else f'{expected} value(s)'}.")
+        operator, values = criterion_values(field_label, operator, values)
+        column = FLIGHT_RANGE_FIELDS.get(field_label, fields[field_label]) # flight times are compared on their indexed epoch columns
+        if operator in ("between", "prefix"):
+            params[f"p{number}_low"], params[f"p{number}_high"] = values
+        elif operator == "in":
+            params[f"p{number}"] = json.dumps(values)
+        else:
+            params[f"p{number}"] = values[0]
+        estimate = criterion_estimate(table, column, operator, len(values))
+        terms.append((estimate is None, estimate or 0, number, column, operator))
+    terms.sort() # indexed criteria first, fewest expected rows first
+    if match == "all":
+        where_clause = "WHERE " + " AND ".join(criterion_condition(column, operator, number, plus=i > 0)
+            for i, (_unindexed, _estimate, number, column, operator) in enumerate(terms))
+    else:
+        where_clause = "WHERE " + " OR ".join(f"({criterion_condition(column, operator, number, plus=False)})"
+            for _unindexed, _estimate, number, column, operator in terms) # each side keeps its index, for sqlite's OR optimisation
+    key = (filename, "compound", where_clause)
+    if key not in STATEMENTS: # built on first use, then reused like the pre-expanded variants
+        register_statement(key, Template(TEMPLATE_TEXT[filename]).substitute(where_clause=where_clause))
+    return run_statement(*key, params=params)
+
+# Splits a criterion value typed at a prompt or on the command line: "low,high" for between and "a,b,c" for in
+def split_criterion_value(operator, text):
+    if operator in ("between", "in"):
+        return [part.strip() for part in text.split(",")]
+    return text
+
+# Asks for the criteria of a compound search on a table's fields and whether all or any must match, then prints the
+# results. first is the criterion the search prompt has already taken
+def compound_search_prompt(table, fields, first):
+    criteria = [first]
+    while True:
+        labels = list(fields.keys())
+        for i, label in enumerate(labels, start=1):
+            print(f"{i}. {label}")
+        try:
+            field_label = labels[int(input("Choose search field: ")) - 1]
+        except (ValueError, IndexError):
+            print("Invalid Input")
+            continue
+        operator = input(f"Operator ({', '.join(SEARCH_OPERATORS)}): ").strip().lower()
+        hint = " (low,high)" if operator == "between" else " (comma separated)" if operator == "in" else ""
+        criteria.append((field_label, operator, split_criterion_value(operator, input(f"Enter value for {field_label}{hint}: ").strip())))
+        if input("Add another criterion? (Y/N): ").strip().lower() != "y":
+            break
+    match = "any" if input("Match all criteria or any of them? (A for all, N for any): ").strip().lower() == "n" else "all"
+    try:
+        print_results(compound_search(table, criteria, match=match))
+    except ValueError as e:
+        print(e)
+
+# Commits a write, or leaves it for the group commit. While a script is running the script commits once at the end
+def commit_write():
+    if WRITE_STATE["batch"]:
+        return
+    if WRITE_STATE["pending"] == 0:
+        WRITE_STATE["since"] = time.monotonic()
+    WRITE_STATE["pending"] += 1
+    age_ms = (time.monotonic() - WRITE_STATE["since"]) * 1000
+    if WRITE_STATE["pending"] >= GROUP_COMMIT["writes"] or (GROUP_COMMIT["ms"] and age_ms >= GROUP_COMMIT["ms"]):
+        flush_writes()
+
+# Commits any writes held back by the group commit
+def flush_writes():
+    if WRITE_STATE["pending"]:
+        conn.commit()
+        WRITE_STATE["pending"] = 0
+        end_write_transaction()
+
 # Executes sql queries that add or delete from a table
 def execute_alter_sql(filename, params):
-    sql = load_sql(ALTERS_DIR, filename)
+    old_route = route_flight(params[0]) if ROUTE_INDEX and filename == "delete_flight.sql" else None
     try:
-        c.execute(sql, params)
-        c.connection.commit()
+        run_statement(filename, params=params, fetch=False)
+        commit_write()
     except sqlite3.Error as e:
         print("Input error: ", e)
         raise
+    if filename in REFERENCE_ALTERS:
+        invalidate_reference_data()
+    if ROUTE_INDEX and filename == "add_flight.sql":
+        update_route_network(None, route_flight(statement_cursor().lastrowid))
+    elif ROUTE_INDEX and filename == "delete_flight.sql":
+        update_route_network(old_route, None)
 
-# Pilot menu code
-def pilot_menu():
-    print("\n Pilot Menu")
-    print(" 1. View Pilot Roster")
-    print(" 2. Search for a Pilot")
-    print(" 3. Add a pilot")
-    print(" 4. Remove a pilot")
-    print(" 5. Amend a pilot")
-    print(" 0. Return to Main Menu")
-    
-    # Input validation of menu_option
+# Streams the rows of a CSV file (with a header line of column names) or a JSONL file, one dict per row
+def read_import_rows(path):
+    path = Path(path)
+    with path.open(newline="", encoding="utf-8") as f:
+        if path.suffix.lower() == ".csv":
+            # header line is line 1, so data rows start at line 2
+            yield from enumerate(csv.DictReader(f), start=2)
+        else:
+            for line_number, line in enumerate(f, start=1):
+                if line.strip():
+                    try:
+                        yield line_number, json.loads(line)
+                    except json.JSONDecodeError as e:
+                        yield line_number, e # passed on so the line is rejected rather than aborting the import
+
+# Validates one imported row with the same rules as the add prompts. Returns the insert parameters
+def validate_import_row(columns, row):
+    if not isinstance(row, dict):
+        raise ValueError(f"Unreadable row: {row}")
+    params = []
+    for column, field_label in columns:
+        value = row.get(column)
+        if value is None or str(value).strip() == "":
+            raise ValueError(f"{column} is required.")
+        params.append(check_field(field_label, value))
+    return tuple(params)
+
+# Inserts one batch in a single transaction. Falls back to row by row to find the rows the database rejects
+def insert_import_batch(filename, batch, reject):
+    flush_writes() # so the batch commits on its own
+    if not conn.in_transaction:
+        c.execute("BEGIN") # otherwise releasing the savepoint would commit, even inside a script
+    c.execute("SAVEPOINT import_batch") # a savepoint, so a failed batch inside a script only undoes itself
+    try:
+        run_statement(filename, params=[params for _line, _row, params in batch], fetch=False, many=True)
+        c.execute("RELEASE import_batch")
+        commit_write()
+        return len(batch)
+    except sqlite3.Error:
+        c.execute("ROLLBACK TO import_batch")
+        invalidate_results(set(UNCOMMITTED_TABLES)) # results read since hold the undone rows
+    inserted = 0
+    for line_number, row, params in batch:
+        try:
+            run_statement(filename, params=params, fetch=False)
+            inserted += 1
+        except sqlite3.Error as e:
+            reject(line_number, row, str(e))
+    c.execute("RELEASE import_batch")
+    commit_write()
+    return inserted
+
+# Bulk imports a CSV or JSONL file into a table. Bad rows go to a reject file next to the source instead of aborting
+def import_file(table, path, batch_size=IMPORT_BATCH_SIZE):
+    filename, columns = IMPORT_TABLES[table]
+    reject_path = Path(path).with_suffix(".rejects.jsonl")
+    counts = {"read":0, "inserted":0, "rejected":0}
+    reject_file = None
+
+    def reject(line_number, row, error):
+        nonlocal reject_file
+        if reject_file is None: # only creates the reject file if there is something to put in it
+            reject_file = reject_path.open("w", encoding="utf-8")
+        reject_file.write(json.dumps({"line":line_number, "error":error, "row":row if isinstance(row, dict) else None}) + "\n")
+        counts["rejected"] += 1
+
+    started = time.perf_counter()
+    batch = []
+    try:
+        for line_number, row in read_import_rows(path):
+            counts["read"] += 1
+            try:
+                batch.append((line_number, row, validate_import_row(columns, row)))
+            except ValueError as e:
+                reject(line_number, row, str(e))
+            if len(batch) >= batch_size:
+                counts["inserted"] += insert_import_batch(filename, batch, reject)
+                batch = []
+        if batch:
+            counts["inserted"] += insert_import_batch(filename, batch, reject)
+    finally:
+        if reject_file is not None:
+            reject_file.close()
+    if filename in REFERENCE_ALTERS and counts["inserted"]:
+        invalidate_reference_data()
+    if filename == "add_flight.sql" and counts["inserted"]:
+        invalidate_route_network() # rebuilt on the next itinerary search rather than patched row by row
+    elapsed = time.perf_counter() - started
+    rate = counts["read"] / elapsed if elapsed else 0
+    print(f"Imported {counts['inserted']} of {counts['read']} {table} rows in {elapsed:.2f}s ({rate:,.0f} rows/s)")
+    if counts["rejected"]:
+        print(f"{counts['rejected']} rows rejected, see {reject_path}")
+    return counts
+
+# Prompt selected from the main menu to import a file
+def import_prompt():
+    tables = list(IMPORT_TABLES.keys())
+    print("Import into: ")
+    for i, table in enumerate(tables, start=1):
+        print(f"{i}. {table}")
     while True:
         try:
-            menu_option = int(input("\nEnter menu option: "))
-            break # breaks out of the while loop
-        except ValueError:
-            print("Invalid Input")
-    while True: # while loop for the menu options
-        if menu_option == 1:
-            execute_sql("pilot_roster.sql")
-            pilot_menu()
-            break
-        elif menu_option == 2:
-            search_pilot_prompt()
-            break
-        elif menu_option == 3:
-            add_pilot()
-            break
-        elif menu_option == 4:
-            delete_pilot()
-            break  
-        elif menu_option == 5:
-            update_pilot_prompt()
+            table = tables[int(input("Choose table: "))-1]
             break
-        elif menu_option == 0:
-            main_menu()
-            break
-        else:
-            print("\n Invalid Input")
+        except (ValueError, IndexError):
+            print("Invalid choice.")
+    path = input("Enter path of the CSV or JSONL file: ").strip()
+    try:
+        import_file(table, path)
+    except OSError as e:
+        print("Import error: ", e)
 
 # Searches for a pilot depending on the field selected and value entered            
 def search_pilot(field_label: str, value: str, *, partial: bool = False):
     column = PILOT_SEARCH_FIELDS.get(field_label) # gets the value from the dictionary for use in the query
     if not column:
         raise ValueError(f"Unsupported search field {field_label}") # raises an error if the field is not in the dictionary
-    if partial:
-        where_clause = f"WHERE {column} LIKE ?" # passed into the sql query and allows for partial matches when searching
-        params = (f"%{value}%",) 
+    match = fts_prefix_query(PILOT_FTS_FIELDS[field_label], value) if partial and field_label in PILOT_FTS_FIELDS else None
+    if match:
+        statement = ("pilot_fts_search.sql",) # full-text prefix search, best matches first
+        params = (match,)
     else:
-        where_clause = f"WHERE {column} = ?" # passed into the sql query for an exact value
-        params = (value,)
-    
-    sql_text = load_sql(QUERIES_DIR, "pilot_search.sql") # loads the sql query
-    sql = Template(sql_text).substitute(where_clause=where_clause) # passes the where clause into the sql query
+        if partial:
+            params = (f"%{value}%",) # allows for partial matches when searching
+        else:
+            params = (value,) # exact value
+        statement = ("pilot_search.sql", field_label, partial) # pre-expanded where clause for the field
     try:
-        c.execute(sql, params)
-        return c.fetchall()
+        return run_statement(*statement, params=params)
     except sqlite3.Error as e:
         print("Query error: ", e)
         return[] # returns an empty list if there is a query error. Used by print_results() to detect negative results
@@ -224,31 +1310,55 @@ def search_pilot_prompt():
     field_label = list(PILOT_SEARCH_FIELDS.keys())[choice-1] # uses input number to define field_label. Choice-1 to account for options starting at 1 where index starts at 0.
     
     value = input(f"Enter value for {field_label}: ").strip() # takes the value to be searched for. Strips any whitespace
+    if input("Add another criterion? (Y/N): ").strip().lower() == "y": # searches on several fields at once
+        compound_search_prompt("pilot", PILOT_SEARCH_FIELDS, (field_label, "=", value))
+        return
     
     partial = False
     if field_label not in {"Pilot ID"}: # prevents use of partial search on ID field
         use_partial = input("Partial match? (Y/N): ").lower() # allows decision of use of partial matches
         partial = (use_partial == "y")
-        rows = search_pilot(field_label, value, partial=partial) # triggers the search_pilot function
-        print_results(rows) # prints the results
-        pilot_menu() # returns to the pilot menu
+        if partial and field_label in PILOT_FTS_FIELDS:
+            print_results(search_pilot(field_label, value, partial=True)) # ranked full-text matches
+        else:
+            browse_pages("pilot_page.sql", field_label, value, partial=partial) # pages through the matching pilots
         
+# Returns rolling 7, 28 and 365 day block minutes and sector counts up to and including as_of (YYYY-MM-DD, default today).
+# Read from the pilot_duty_day summary, which triggers keep current, so the flight table is not touched
+def pilot_duty_totals(pilot_id=None, as_of=None):
+    if as_of is None:
+        as_of = (EPOCH + timedelta(seconds=time.time())).strftime("%Y-%m-%d")
+    else:
+        try:
+            datetime.strptime(as_of, "%Y-%m-%d")
+        except ValueError:
+            raise ValueError("Report date must be in the format YYYY-MM-DD.") from None
+    return run_statement("pilot_duty_totals.sql", pilot_id is not None, params={"as_of":as_of, "pilot_id":pilot_id})
+
+# Prompt selected from the pilot menu for the flight hours report
+def pilot_duty_prompt():
+    pilot_id = input("Enter Pilot ID (leave blank for all pilots): ").strip()
+    as_of = input("Report up to date YYYY-MM-DD (leave blank for today): ").strip()
+    try:
+        rows = pilot_duty_totals(int(pilot_id) if pilot_id else None, as_of or None)
+        print_results(rows)
+    except ValueError as e:
+        print(e)
+
 # Updates the pilot record based on the input from pilot_update_prompt
 def update_pilot(pilot_id, field_label, new_value):
     mapping = PILOT_UPDATE_FIELDS.get(field_label)
     if not mapping:
         raise ValueError(f"Unsupported field: {field_label}")
-    column, _kind = mapping # unpacks the column name from the tuple contained in the dictionary
-    validated = validate_fields(field_label, new_value) # passes the data in for validation
-    
-    sql_text = load_sql(ALTERS_DIR, "update_pilot.sql") # loads the sql
-    set_clause = f"{column} = :value" # uses column to select the table column for update
-    where_clause = "WHERE pilot.pilot_id = :pilot_id" # uses pilot id to select the record for update
-    sql = Template(sql_text).substitute(set_clause=set_clause, where_clause=where_clause) # passes the clauses in to the sql query
+    try:
+        validated = check_field(field_label, new_value) # passes the data in for validation
+    except ValueError as e:
+        print(e)
+        return False
     
     try:
-        c.execute(sql, {"value": validated, "pilot_id": pilot_id}) # carries out the update
-        c.connection.commit() # save the database after update
+        run_statement("update_pilot.sql", field_label, params={"value": validated, "pilot_id": pilot_id}, fetch=False) # pre-expanded set and where clauses for the field
+        commit_write() # save the database after update
         if c.rowcount == 0: # if no rows are found then prints error message
             print("No pilot updated, pilot ID not found")
             return False
@@ -291,9 +1401,10 @@ def update_pilot_prompt():
     ok = update_pilot(pilot_id, field_label, new_value) # runs the update_pilot()
     
     if ok: # prints the results
-        rows = execute_param_sql("pilot_id.sql", (pilot_id,))
-        print_results(rows)
-        pilot_menu()
+        execute_param_sql("pilot_id.sql", (pilot_id,))
+    else:
+        print("Returning to main menu...")
+        return "main"
 
 # Adds a pilot to the database
 def add_pilot():
@@ -305,14 +1416,20 @@ def add_pilot():
             break
         except ValueError:
             print("Licence Number must be a number.")            
-    aircraft_rating = input("Enter aircraft rating: ")
-    while True: # validates number input
+    while True: # checks the rating exists
+        aircraft_rating = input("Enter aircraft rating: ").strip()
+        try:
+            aircraft_rating = check_field("Aircraft Rating", aircraft_rating)
+            break
+        except ValueError as e:
+            print(e)
+    while True: # validates number input and that the airport exists
         base_id = input("Enter base ID: ")
         try:
-            base_id = int(base_id)
+            base_id = check_field("Base Airport ID", base_id)
             break
-        except:
-            print("Base ID must be a number.")
+        except ValueError as e:
+            print(e)
     while True: # validates date input
         last_medical_date = input("Enter date of last medical in the format YYYY-MM-DD: ")
         format = "%Y-%m-%d"
@@ -332,11 +1449,13 @@ def add_pilot():
         try: # menu options to add the new pilot
             menu_option = int(input("Enter choice: "))
             if menu_option == 1:
-                execute_alter_sql("add_pilot.sql", params)
+                try:
+                    execute_alter_sql("add_pilot.sql", params)
+                except sqlite3.IntegrityError: # e.g. a base ID or rating that does not exist
+                    print("Pilot not added.")
                 break
             elif menu_option == 2:
                 print("\n Transaction Cancelled.")
-                pilot_menu()
                 break
             else:
                 print("Invalid input, try again")
@@ -358,74 +1477,46 @@ def delete_pilot():
         try:
             menu_option = int(input("Enter choice: "))
             if menu_option == 1:
-                execute_alter_sql("delete_pilot.sql", (delete_id,))
-                print("Pilot deleted")
-                pilot_menu()
+                try:
+                    execute_alter_sql("delete_pilot.sql", (delete_id,))
+                    print("Pilot deleted")
+                except sqlite3.IntegrityError: # foreign keys stop a pilot with flights being deleted
+                    print("Pilot not deleted, they are still assigned to flights.")
                 break
             elif menu_option == 2:
                 print("\n Transaction Cancelled.")
-                pilot_menu()
                 break
             else:
                 print("Invalid input, try again")
         except ValueError:
             print("Invalid input, try again.")
 
-# Flight menu code
-def flight_menu():
-    print("\n Flight Menu")
-    print("\n 1. View Upcoming Flights")
-    print(" 2. Add a New Flight")
-    print(" 3. Search for Flights")
-    print(" 4. Remove a Flight")
-    print(" 5. Update a Flight")
-    print(" 0. Return to Main Menu")
-    
-    while True: # Input validation
-        try:
-            menu_option = int(input("\nEnter menu option: "))
-            break
-        except ValueError:
-            print("Invalid Input")
-    while True:
-        if menu_option == 1:
-            execute_sql("all_flight.sql")
-            flight_menu()
-            break
-        elif menu_option == 2:
-            add_flight()
-            break
-        elif menu_option == 3:
-            search_flight_prompt()
-            break
-        elif menu_option == 4:
-            delete_flight()
-            break
-        elif menu_option == 5:
-            update_flight_prompt()
-            break
-        elif menu_option == 0:
-            main_menu()
-            break
-        else:
-            print("\n Invalid Input")
-
 # Updates the flight record based on the input from flight_update_prompt
 def update_flight(flight_id, field_label, new_value):
     mapping = FLIGHT_UPDATE_FIELDS.get(field_label)
     if not mapping:
         raise ValueError(f"Unsupported field: {field_label}")
-    column, _kind = mapping # unpacks the column name from the tuple contained in the dictionary
-    validated = validate_fields(field_label, new_value) # passes the data in for validation
-    
-    sql_text = load_sql(ALTERS_DIR, "update_flight.sql") # loads the sql
-    set_clause = f"{column} = :value" # uses column to select the table column for update
-    where_clause = "WHERE flight.flight_id = :flight_id" # uses pilot id to select the record for update
-    sql = Template(sql_text).substitute(set_clause=set_clause, where_clause=where_clause) # passes the clauses in to the sql query
+    try:
+        validated = check_field(field_label, new_value) # passes the data in for validation
+    except ValueError as e:
+        print(e)
+        return False
+    if field_label in SCHEDULE_FIELDS: # checks the moved flight against the pilot's other flights
+        rows = run_statement("flight_schedule.sql", params=(flight_id,))
+        current = rows[0] if rows else None
+        if current:
+            schedule = {"Pilot ID":current["pilot_id"], "Departure Date/Time":current["departure_time_utc"], "Arrival Date/Time":current["arrival_time_utc"]}
+            schedule[field_label] = validated
+            if not schedule_allows(schedule["Pilot ID"], schedule["Departure Date/Time"], schedule["Arrival Date/Time"], flight_id):
+                print("No flight updated.")
+                return False
     
+    old_route = route_flight(flight_id) if ROUTE_INDEX else None
     try:
-        c.execute(sql, {"value": validated, "flight_id": flight_id}) # carries out the update
-        c.connection.commit() # save the database after update
+        run_statement("update_flight.sql", field_label, params={"value": validated, "flight_id": flight_id}, fetch=False) # pre-expanded set and where clauses for the field
+        commit_write() # save the database after update
+        if ROUTE_INDEX:
+            update_route_network(old_route, route_flight(flight_id))
         if c.rowcount == 0: # if no rows are found then prints error message
             print("No flight updated, flight ID not found")
             return False
@@ -470,27 +1561,23 @@ def update_flight_prompt():
     ok = update_flight(flight_id, field_label, new_value) # runs update_flight()
     
     if ok: # prints the results
-        rows = execute_param_sql("flight_id.sql", (flight_id,))
-        print_results(rows)
-        flight_menu()
+        execute_param_sql("flight_id.sql", (flight_id,))
+    else:
+        print("Returning to main menu...")
+        return "main"
 
 # Searches for pilot depending on the parameter selected
 def search_flight(field_label: str, value: str, *, partial: bool = False):
     column = FLIGHT_SEARCH_FIELDS.get(field_label) # gets the value from the dictionary for use in the query
     if not column: # Error handling
         raise ValueError(f"Unsupported search field {field_label}")
-    if partial: # Determines whether partial matches are accepted
-        where_clause = f"WHERE {column} LIKE ?"
-        params = (f"%{value}%",)
+    if partial:
+        params = (f"%{value}%",) # allows for partial matches when searching
     else:
-        where_clause = f"WHERE {column} = ?"
-        params = (value,)
+        params = (value,) # exact value
     
-    sql_text = load_sql(QUERIES_DIR, "flight_search.sql") # loads the sql file
-    sql = Template(sql_text).substitute(where_clause=where_clause) # passes in the where clause
     try:
-        c.execute(sql, params) # executes the search
-        return c.fetchall()
+        return run_statement("flight_search.sql", field_label, partial, params=params) # pre-expanded where clause for the field
     except sqlite3.Error as e:
         print("Query error: ", e)
         return[] # returns an empty list if there is a query error
@@ -503,29 +1590,583 @@ def search_flight_prompt():
     choice = int(input("Choose seach field: ")) # takes user selection
     field_label = list(FLIGHT_SEARCH_FIELDS.keys())[choice-1] # uses selection to define field
     value = input(f"Enter value for {field_label}: ").strip() # takes value input
+    if input("Add another criterion? (Y/N): ").strip().lower() == "y": # searches on several fields at once
+        compound_search_prompt("flight", FLIGHT_SEARCH_FIELDS, (field_label, "=", value))
+        return
     partial = False
     if field_label not in {"Flight ID"}: # determines if partial matches are allowed
         use_partial = input("Partial match? (Y/N): ").lower()
         partial = (use_partial == "y")
-        rows = search_flight(field_label, value, partial=partial) # calls the search function
-        print_results(rows) # prints results
-        flight_menu()
+        browse_pages("flight_page.sql", field_label, value, partial=partial) # pages through the matching flights
             
+# Converts a time bound to epoch seconds. Takes YYYY-MM-DD HH:MM:SS, YYYY-MM-DD, "today" or "tomorrow" (UTC)
+# A date on its own is the start of that day, or the end of it when end is True, so --to 2026-02-18 includes the 18th
+def parse_time_bound(value, *, end=False):
+    value = value.strip().lower()
+    if value in ("today", "tomorrow"):
+        moment = (EPOCH + timedelta(seconds=time.time())).replace(hour=0, minute=0, second=0, microsecond=0)
+        moment += timedelta(days=1 if value == "tomorrow" else 0)
+        whole_day = True
+    else:
+        try:
+            moment = datetime.strptime(value, "%Y-%m-%d %H:%M:%S")
+            whole_day = False
+        except ValueError:
+            try:
+                moment = datetime.strptime(value, "%Y-%m-%d")
+            except ValueError:
+                raise ValueError("Times must be YYYY-MM-DD HH:MM:SS, YYYY-MM-DD, today or tomorrow.") from None
+            whole_day = True
+    if whole_day and end:
+        moment += timedelta(days=1)
+    return int((moment - EPOCH).total_seconds())
+
+# Searches for flights departing (or arriving) in a time window, optionally only those leaving one airport
+def search_flight_range(start, end, *, field_label="Departure Date/Time", departure_id=None):
+    if field_label not in FLIGHT_RANGE_FIELDS:
+        raise ValueError(f"Unsupported range field {field_label}")
+    params = {"start":parse_time_bound(start), "end":parse_time_bound(end, end=True), "departure_id":departure_id}
+    key = ("flight_range.sql", field_label, departure_id is not None)
+    if PARTITIONS["attached"]:
+        key = partition_range_statement(field_label, departure_id is not None, params["start"], params["end"])
+    try:
+        return run_statement(*key, params=params) # index range scan on the epoch column
+    except sqlite3.Error as e:
+        print("Query error: ", e)
+        return[]
+
+# Converts a stored or entered UTC time (YYYY-MM-DD HH:MM:SS or YYYY-MM-DDTHH:MM:SSZ) to epoch seconds
+def time_to_epoch(value):
+    return int((datetime.fromisoformat(str(value).strip().removesuffix("Z")) - EPOCH).total_seconds())
+
+# Describes the conflict between an earlier and a later flight for the same pilot, or returns None if there is none
+def describe_conflict(earlier_arrival, later_departure, turnaround_minutes):
+    gap = (later_departure - earlier_arrival) // 60
+    if gap < 0:
+        return gap, "overlap"
+    if gap < turnaround_minutes:
+        return gap, "turnaround"
+    return None
+
+# Finds the pilot's flights either side of a proposed departure and arrival that it overlaps, or leaves too little
+# turnaround with. Before it, the earlier flight that lands last, which may not be the last to leave when the schedule
+# already holds an overlap. It is looked for among the flights leaving within the longest sector (migration 0012) and
+# the turnaround before, an index range on idx_flight_pilot_epoch. After it, the next to leave, one index seek.
+# flight_id is the flight being changed, so it is not compared with itself (0 for a new flight)
+def find_pilot_conflicts(pilot_id, departure, arrival, flight_id=0, turnaround_minutes=MIN_TURNAROUND_MINUTES):
+    departure_epoch, arrival_epoch = time_to_epoch(departure), time_to_epoch(arrival)
+    conflicts = []
+    params = {"pilot_id":pilot_id, "flight_id":flight_id, "departure":departure_epoch, "turnaround":turnaround_minutes * 60}
+    for row in run_statement("pilot_neighbour_flights.sql", params=params):
+        if row["departure_epoch"] <= departure_epoch: # the flight before
+            found = describe_conflict(row["arrival_epoch"], departure_epoch, turnaround_minutes)
+        else: # the flight after
+            found = describe_conflict(arrival_epoch, row["departure_epoch"], turnaround_minutes)
+        if found:
+            gap, problem = found
+            conflicts.append({"Flight ID":row["flight_id"], "Flight Number":row["flight_number"], "Gap (min)":gap, "Problem":problem})
+    return conflicts
+
+# Checks a schedule change against the pilot's other flights. Prints any conflicts and returns whether to go ahead
+def schedule_allows(pilot_id, departure, arrival, flight_id=0):
+    try:
+        conflicts = find_pilot_conflicts(int(pilot_id), departure, arrival, flight_id)
+    except ValueError: # times that cannot be read are left to the other validation
+        return True
+    if not conflicts:
+        return True
+    print(f"Pilot {pilot_id} is double-booked (minimum turnaround {MIN_TURNAROUND_MINUTES} min):")
+    print_results(conflicts)
+    if CONFLICT_MODE == "flag":
+        print("Saving anyway, the conflict is flagged.")
+        return True
+    return False
+
+# Finds every double-booking in the schedule in one sweep over idx_flight_pilot_epoch. For each pilot the flights are
+# read in departure order, each one compared with the earlier flight that arrives latest
+def audit_schedule(turnaround_minutes=MIN_TURNAROUND_MINUTES):
+    conflicts = []
+    current_pilot = latest = None # latest is the earlier flight with the latest arrival for the current pilot
+    for row in stream_statement("pilot_schedule_sweep.sql", *(("partitioned",) if PARTITIONS["attached"] else ())):
+        if row["departure_epoch"] is None or row["arrival_epoch"] is None:
+            continue # times that cannot be read have no place in the schedule
+        if row["pilot_id"] != current_pilot:
+            current_pilot, latest = row["pilot_id"], row
+            continue
+        found = describe_conflict(latest["arrival_epoch"], row["departure_epoch"], turnaround_minutes)
+        if found:
+            gap, problem = found
+            conflicts.append({"Pilot ID":current_pilot, "Flight ID":row["flight_id"], "Conflicts With":latest["flight_id"], "Gap (min)":gap, "Problem":problem})
+        if row["arrival_epoch"] > latest["arrival_epoch"]:
+            latest = row
+    return conflicts
+
+# Prompt selected from flight menu to audit the whole schedule
+def audit_schedule_prompt():
+    conflicts = audit_schedule()
+    print(f"{len(conflicts)} conflicts found.")
+    print_results(conflicts)
+
+# Finds the cheapest way to give each row its own column with the Hungarian method: shortest augmenting paths kept
+# cheap by row and column potentials, O(rows² × columns). costs is a list of rows, each with at least as many column
+# costs as there are rows. Returns the column chosen for each row
+def min_cost_assignment(costs):
+    rows, columns = len(costs), len(costs[0])
+    row_potential, column_potential = [0] * (rows + 1), [0] * (columns + 1)
+    matched = [0] * (columns + 1) # the row (counted from 1) given each column, 0 for none. Column 0 is the row being added
+    for row in range(1, rows + 1):
+        matched[0] = row
+        column = 0
+        slack = [float("inf")] * (columns + 1) # least reduced cost found so far to each column
+        previous = [0] * (columns + 1) # the column before each one on the augmenting path
+        unvisited = list(range(1, columns + 1))
+        visited = [0]
+        while matched[column]:
+            current = matched[column]
+            row_costs, potential = costs[current - 1], row_potential[current]
+            delta, closest = float("inf"), 0
+            for other in unvisited:
+                reduced = row_costs[other - 1] - potential - column_potential[other]
+                if reduced < slack[other]:
+                    slack[other], previous[other] = reduced, column
+                if slack[other] < delta:
+                    delta, closest = slack[other], other
+            for other in visited:
+                row_potential[matched[other]] += delta
+                column_potential[other] -= delta
+            for other in unvisited:
+                slack[other] -= delta
+            column = closest
+            unvisited.remove(column)
+            visited.append(column)
+        while column: # flips the path, giving each row on it the next column along
+            matched[column] = matched[previous[column]]
+            column = previous[column]
+    chosen = [0] * rows
+    for column in range(1, columns + 1):
+        if matched[column]:
+            chosen[matched[column] - 1] = column - 1
+    return chosen
+
+# Moves a pilot's assignment state on past a flight they fly. A gap of MIN_REST_HOURS or more starts a new duty
+def fly_sector(state, departure, arrival, arrival_id):
+    rested = state["arrival"] is None or departure - state["arrival"] >= MIN_REST_HOURS * 3600
+    state["sectors"] = 1 if rested else state["sectors"] + 1
+    state["location"], state["arrival"] = arrival_id, arrival
+
+# Returns what giving a flight to a pilot costs in repositioning, or None if the pilot cannot fly it: their medical
+# runs out, it comes too soon after their last flight or too close to their next one already in the schedule, or
+# they have flown MAX_DUTY_SECTORS without a rest. A flight leaving somewhere the pilot is not costs 1, and so does
+# one landing somewhere other than where their next scheduled flight leaves
+def assignment_cost(flight, state):
+    if flight["arrival"] > state["medical_until"]:
+        return None
+    sectors = 1
+    if state["arrival"] is not None:
+        gap = flight["departure"] - state["arrival"]
+        if gap < MIN_TURNAROUND_MINUTES * 60:
+            return None
+        if gap < MIN_REST_HOURS * 3600:
+            sectors = state["sectors"] + 1
+    if sectors > MAX_DUTY_SECTORS:
+        return None
+    cost = 0 if state["location"] == flight["departure_id"] else 1
+    if state["upcoming"]:
+        next_departure, next_departure_id = state["upcoming"][0]["departure_epoch"], state["upcoming"][0]["departure_id"]
+        gap = next_departure - flight["arrival"]
+        if gap < MIN_TURNAROUND_MINUTES * 60 or (gap < MIN_REST_HOURS * 3600 and sectors >= MAX_DUTY_SECTORS):
+            return None
+        cost += 0 if next_departure_id == flight["arrival_id"] else 1
+    return cost
+
+# Splits one rating's flights, in departure order, into waves. Each flight in a wave leaves before every earlier one
+# in it has landed and turned round, so no pilot can fly two flights of the same wave
+def assignment_waves(flights):
+    wave, closes = [], None
+    for flight in flights:
+        if wave and flight["departure"] >= closes:
+            yield wave
+            wave = []
+        ready = flight["arrival"] + MIN_TURNAROUND_MINUTES * 60
+        closes = ready if not wave else min(closes, ready)
+        wave.append(flight)
+    if wave:
+        yield wave
+
+# Gives one wave's flights to pilots at the least total repositioning, as a min-cost matching of flights to the pilots
+# able to fly at least one of them. Returns the pilot ID and cost for each flight, or None and None for a flight no
+# pilot is left for
+def assign_wave(wave, pilots):
+    # pilots still in the air or turning round when the wave's last flight leaves cannot fly any of it
+    ready_by = wave[-1]["departure"] - MIN_TURNAROUND_MINUTES * 60
+    free = [(pilot_id, state) for pilot_id, state in pilots.items() if state["arrival"] is None or state["arrival"] <= ready_by]
+    options = []
+    for flight in wave:
+        found = [(cost, pilot_id) for pilot_id, state in free if (cost := assignment_cost(flight, state)) is not None]
+        # a flight's len(wave) cheapest pilots are enough: the others in the wave take at most len(wave) - 1 of them,
+        # so one is always left that costs no more than any pilot further down its list
+        options.append({pilot_id: cost for cost, pilot_id in heapq.nsmallest(len(wave), found)})
+    rows = [i for i, found in enumerate(options) if found] # flights no pilot can fly are left out of the matching
+    candidates = sorted({pilot_id for found in options for pilot_id in found})
+    assigned = [(None, None)] * len(wave)
+    if not rows:
+        return assigned
+    unable = 2 * len(rows) + 1 # more than any set of real choices, so the fewest flights are left without a pilot
+    # stand-in columns when there are fewer pilots than flights, taken by a flight only when it has to be
+    costs = [[options[i].get(pilot_id, unable) for pilot_id in candidates] + [unable] * (len(rows) - len(candidates)) for i in rows]
+    for i, cost, column in zip(rows, costs, min_cost_assignment(costs)):
+        if cost[column] < unable:
+            assigned[i] = (candidates[column], cost[column])
+    return assigned
+
+# Reads a CSV or JSONL file of flights without pilots and picks a pilot for each. A pilot must hold the flight's rating
+# and have a medical that is still valid when it lands. They fly it from where their last flight landed, or from their
+# base if they have not flown. Their other flights, already scheduled or assigned here, keep the turnaround, and
+# MAX_DUTY_SECTORS sectors need a MIN_REST_HOURS rest after them. Each rating's flights are taken a wave at a time in
+# departure order, each wave matched to the free pilots at the least repositioning. Returns a row per flight in file
+# order, with the pilot chosen, or no pilot and the problem. Nothing is saved, see save_assignments()
+def plan_assignments(path):
+    plan, flights = [], {}
+    for line_number, row in read_import_rows(path):
+        result = {"Line":line_number, **{field_label: None for _column, field_label in ASSIGN_COLUMNS}, "Pilot ID":None, "Repositioning":None, "Problem":None}
+        plan.append(result)
+        if isinstance(row, dict):
+            result["Flight Number"] = row.get("flight_number") # shown with the problem if the row is refused
+        try:
+            values = validate_import_row(ASSIGN_COLUMNS, row)
+            result.update(zip([field_label for _column, field_label in ASSIGN_COLUMNS], values))
+            departure, arrival = time_to_epoch(result["Departure Date/Time"]), time_to_epoch(result["Arrival Date/Time"])
+            if arrival <= departure:
+                raise ValueError("Arrival Date/Time must be after Departure Date/Time.")
+        except ValueError as e:
+            result["Problem"] = str(e)
+            continue
+        flights.setdefault(result["Aircraft Rating"], []).append({"departure":departure, "arrival":arrival,
+            "departure_id":result["Departure Airport ID"], "arrival_id":result["Arrival Airport ID"], "result":result})
+    if not flights:
+        return plan
+    for rated in flights.values():
+        rated.sort(key=lambda flight: (flight["departure"], flight["arrival"]))
+    start = min(rated[0]["departure"] for rated in flights.values())
+    end = max(flight["arrival"] for rated in flights.values() for flight in rated) + MIN_REST_HOURS * 3600
+    pilots = {rating: {} for rating in flights}
+    for row in run_statement("assignment_pilots.sql"):
+        if row["aircraft_rating"] not in pilots:
+            continue
+        state = {"location":row["base_id"], "arrival":None, "sectors":0, "upcoming":deque(),
+            "medical_until":time_to_epoch(row["last_medical_date"]) + MEDICAL_VALID_DAYS * 86400}
+        for sector in reversed(run_statement("pilot_recent_flights.sql", params={"pilot_id":row["pilot_id"], "before":start, "limit":MAX_DUTY_SECTORS})):
+            fly_sector(state, sector["departure_epoch"], sector["arrival_epoch"], sector["arrival_id"])
+        pilots[row["aircraft_rating"]][row["pilot_id"]] = state
+    scheduled = {rating: [] for rating in flights} # each rating's flights already in the schedule, in departure order
+    rating_of = {pilot_id: rating for rating, rated in pilots.items() for pilot_id in rated}
+    for row in stream_statement("assignment_flights.sql", params={"start":start, "end":end}):
+        if row["pilot_id"] in rating_of:
+            scheduled[rating_of[row["pilot_id"]]].append(row)
+            pilots[rating_of[row["pilot_id"]]][row["pilot_id"]]["upcoming"].append(row)
+    for rating, rated in flights.items():
+        if not pilots[rating]:
+            for flight in rated:
+                flight["result"]["Problem"] = f"No pilot holds the {rating} rating."
+            continue
+        upcoming = iter(scheduled[rating])
+        following = next(upcoming, None)
+        for wave in assignment_waves(rated):
+            # flies the scheduled flights leaving before the wave, so each pilot is where they will be when it starts
+            while following is not None and following["departure_epoch"] < wave[0]["departure"]:
+                state = pilots[rating][following["pilot_id"]]
+                fly_sector(state, following["departure_epoch"], following["arrival_epoch"], following["arrival_id"])
+                state["upcoming"].popleft()
+                following = next(upcoming, None)
+            for flight, (pilot_id, cost) in zip(wave, assign_wave(wave, pilots[rating])):
+                if pilot_id is None:
+                    flight["result"]["Problem"] = f"No {rating} pilot is free, rested and medically fit to fly it."
+                    continue
+                flight["result"].update({"Pilot ID":pilot_id, "Repositioning":cost})
+                fly_sector(pilots[rating][pilot_id], flight["departure"], flight["arrival"], flight["arrival_id"])
+    return plan
+
+# Adds the planned flights that have a pilot, in departure order, in one transaction. Returns how many were added
+def save_assignments(plan):
+    columns = [field_label for _column, field_label in IMPORT_TABLES["flight"][1]]
+    params = sorted((tuple(row[field_label] for field_label in columns) for row in plan if row["Pilot ID"] is not None),
+        key=lambda values: (time_to_epoch(values[4]), values[0]))
+    if not params:
+        return 0
+    flush_writes() # so the assigned flights commit on their own
+    if not conn.in_transaction:
+        c.execute("BEGIN") # otherwise releasing the savepoint would commit, even inside a script
+    c.execute("SAVEPOINT assign_flights") # a savepoint, so inside a script a failure only undoes the assignment
+    try:
+        run_statement("add_flight.sql", params=params, fetch=False, many=True)
+    except sqlite3.Error:
+        c.execute("ROLLBACK TO assign_flights")
+        c.execute("RELEASE assign_flights")
+        invalidate_results(set(UNCOMMITTED_TABLES)) # results read since hold the undone rows
+        raise
+    c.execute("RELEASE assign_flights")
+    commit_write()
+    flush_writes() # committed now rather than held for the group commit. A script still commits at its end
+    invalidate_route_network() # rebuilt on the next itinerary search rather than patched flight by flight
+    return len(params)
+
+# Prints how many flights a plan gives a pilot, how many repositionings that takes and how long planning took
+def print_assignment_summary(plan, elapsed, out=None):
+    assigned = [row for row in plan if row["Pilot ID"] is not None]
+    repositioning = sum(row["Repositioning"] for row in assigned)
+    print(f"Assigned {len(assigned)} of {len(plan)} flights in {elapsed:.2f}s, with {repositioning} repositionings.", file=out)
+
+# Prompt selected from the flight menu to assign pilots to a file of flights, review the plan and save it
+def assign_flights_prompt():
+    path = input("Enter path of the CSV or JSONL file of flights: ").strip()
+    started = time.perf_counter()
+    try:
+        plan = plan_assignments(path)
+    except OSError as e:
+        print("Assignment error: ", e)
+        return
+    print_results(plan)
+    print_assignment_summary(plan, time.perf_counter() - started)
+    if all(row["Pilot ID"] is None for row in plan):
+        return
+    while True:
+        print("Press 1 to add the assigned flights to the database")
+        print("Press 2 to cancel")
+        try:
+            menu_option = int(input("Enter choice: "))
+            if menu_option == 1:
+                try:
+                    print(f"Added {save_assignments(plan)} flights.")
+                except sqlite3.Error as e:
+                    print("Input error: ", e)
+                    print("No flights added.")
+                break
+            elif menu_option == 2:
+                print("\n Assignment Cancelled.")
+                break
+            else:
+                print("Invalid input, try again")
+        except ValueError:
+            print("Invalid input, try again.")
+
+# Builds a route's entry in the route network from its flights' departure, arrival and flight ID arrays, sorted by
+# departure. earliest[i] is the position, from i onwards, of the flight that lands first, so the first landing
+# after any time is one bisect away even when a later departure is the quicker flight
+def finish_route_edge(departures, arrivals, flight_ids):
+    earliest = array("q", bytes(8 * len(arrivals)))
+    best = None
+    for i in range(len(arrivals) - 1, -1, -1):
+        if best is None or arrivals[i] < arrivals[best]:
+            best = i
+        earliest[i] = best
+    return departures, arrivals, flight_ids, earliest
+
+# Returns the route network, reading every flight with readable times once, grouped by route in departure order
+def route_network():
+    if "edges" in ROUTE_INDEX:
+        return ROUTE_INDEX["edges"]
+    with ROUTE_LOCK:
+        if "edges" in ROUTE_INDEX: # built by another thread while this one waited
+            return ROUTE_INDEX["edges"]
+        started = time.perf_counter()
+        edges = {}
+        route = None
+        count = 0
+        for flight_id, departure_id, arrival_id, departure_epoch, arrival_epoch in stream_statement("route_network.sql", size=10000):
+            if (departure_id, arrival_id) != route:
+                if route:
+                    edges.setdefault(route[0], {})[route[1]] = finish_route_edge(*arrays)
+                route = (departure_id, arrival_id)
+                arrays = (array("q"), array("q"), array("q"))
+            arrays[0].append(departure_epoch)
+            arrays[1].append(arrival_epoch)
+            arrays[2].append(flight_id)
+            count += 1
+        if route:
+            edges.setdefault(route[0], {})[route[1]] = finish_route_edge(*arrays)
+        ROUTE_INDEX.update({"flights":count, "build_seconds":round(time.perf_counter() - started, 3), "edges":edges})
+    return edges
+
+# Clears the route network. The next itinerary search rebuilds it
+def invalidate_route_network():
+    ROUTE_INDEX.clear()
+
+# Returns a flight's route network row, or None if it does not exist. Read on its own cursor so the caller's
+# lastrowid and rowcount survive
+def route_flight(flight_id):
+    rows = list(stream_statement("route_flight.sql", params=(flight_id,)))
+    return rows[0] if rows else None
+
+# Patches the route network for one changed flight: old is its row before the change and new its row after, either
+# None for an add or a delete. Each route's arrays are rebuilt and swapped in whole, so a search running at the
+# same time in another thread sees the route either before or after the change
+def update_route_network(old, new):
+    edges = ROUTE_INDEX.get("edges")
+    if edges is None:
+        return
+    for row, keep in ((old, False), (new, True)):
+        if row is None or row["departure_epoch"] is None or row["arrival_epoch"] is None:
+            continue
+        origin, destination = row["departure_id"], row["arrival_id"]
+        edge = edges.get(origin, {}).get(destination)
+        flights = [flight for flight in zip(*edge[:3]) if flight[2] != row["flight_id"]] if edge else []
+        if keep:
+            insort(flights, (row["departure_epoch"], row["arrival_epoch"], row["flight_id"]))
+        if flights:
+            edges.setdefault(origin, {})[destination] = finish_route_edge(*(array("q", column) for column in zip(*flights)))
+        else:
+            edges.get(origin, {}).pop(destination, None)
+        ROUTE_INDEX["flights"] += 1 if keep else -1
+
+# Returns the flight on a route that lands first out of those departing at or after ready, as (arrival, flight ID)
+def first_landing(edge, ready):
+    departures, arrivals, flight_ids, earliest = edge
+    i = bisect_left(departures, ready)
+    if i == len(departures):
+        return None
+    best = earliest[i]
+    return arrivals[best], flight_ids[best]
+
+# Earliest arrival search: Dijkstra over airports, where following a route means taking its first flight to land
+# out of those leaving after the traveller is ready. Returns {airport: (previous airport, flight ID)} for the
+# airports reached
+def earliest_arrival_search(origin, destination, depart_after, arrive_by, connection):
+    edges = route_network()
+    arrival = {origin: depart_after}
+    via = {}
+    queue = [(depart_after, origin)]
+    while queue:
+        landed, airport = heapq.heappop(queue)
+        if landed > arrival[airport]:
+            continue # already reached sooner
+        if airport == destination:
+            break
+        ready = landed if airport == origin else landed + connection
+        for next_airport, edge in tuple(edges.get(airport, {}).items()):
+            found = first_landing(edge, ready)
+            if found and (arrive_by is None or found[0] <= arrive_by) and found[0] < arrival.get(next_airport, found[0] + 1):
+                arrival[next_airport] = found[0]
+                via[next_airport] = (airport, found[1])
+                heapq.heappush(queue, (found[0], next_airport))
+    return via
+
+# Fewest legs search: rounds of relaxing every route out of the airports improved in the previous round, so round k
+# holds the earliest arrivals using at most k flights. Labels are kept per round, as RAPTOR does: a later round can
+# reach an airport earlier with more flights, and the path must come from the round that first reached the
+# destination. Stops at that round, and returns its path as the same airport: (previous airport, flight ID) map as
+# earliest_arrival_search()
+def fewest_legs_search(origin, destination, depart_after, arrive_by, connection, max_legs):
+    edges = route_network()
+    arrival = [{origin: depart_after}] # arrival[k][airport]: earliest landing using at most k flights
+    via = [{}] # via[k][airport]: (previous airport, flight ID) for the airports improved in round k
+    improved = {origin}
+    while improved and destination not in via[-1] and len(via) <= max_legs:
+        previous = arrival[-1]
+        arrival.append(dict(previous))
+        via.append({})
+        for airport in improved:
+            ready = previous[airport] if airport == origin else previous[airport] + connection
+            for next_airport, edge in tuple(edges.get(airport, {}).items()):
+                found = first_landing(edge, ready)
+                if found and (arrive_by is None or found[0] <= arrive_by) and found[0] < arrival[-1].get(next_airport, found[0] + 1):
+                    arrival[-1][next_airport] = found[0]
+                    via[-1][next_airport] = (airport, found[1])
+        improved = set(via[-1])
+    path = {}
+    if destination in via[-1]:
+        airport, k = destination, len(via) - 1
+        while airport != origin:
+            while airport not in via[k]: # the round that set the label this leg connected from
+                k -= 1
+            path[airport] = via[k][airport]
+            airport, k = via[k][airport][0], k - 1
+    return path
+
+# Finds a way from one airport to another leaving after a time and, optionally, landing by another. By default the
+# earliest arrival, or with fewest_legs the fewest flights (the earliest arrival among those). Returns a row per
+# flight with the connection time before it, or an empty list if there is no way there
+def find_itinerary(origin, destination, depart_after, *, arrive_by=None, connection_minutes=MIN_CONNECTION_MINUTES, fewest_legs=False, max_legs=MAX_ITINERARY_LEGS):
+    origin = check_field("Departure Airport ID", origin)
+    destination = check_field("Arrival Airport ID", destination)
+    if origin == destination:
+        raise ValueError("The departure and arrival airports must be different.")
+    start = parse_time_bound(depart_after)
+    end = parse_time_bound(arrive_by, end=True) if arrive_by else None
+    if fewest_legs:
+        via = fewest_legs_search(origin, destination, start, end, connection_minutes * 60, max_legs)
+    else:
+        via = earliest_arrival_search(origin, destination, start, end, connection_minutes * 60)
+    if destination not in via:
+        return []
+    flight_ids = []
+    airport = destination
+    while airport != origin:
+        airport, flight_id = via[airport]
+        flight_ids.append(flight_id)
+    legs = []
+    previous_arrival = None
+    for leg, flight_id in enumerate(reversed(flight_ids), start=1):
+        route = route_flight(flight_id)
+        row = {"Leg":leg, **dict(run_statement("flight_id.sql", params=(flight_id,))[0])}
+        row["Connection (min)"] = (route["departure_epoch"] - previous_arrival) // 60 if previous_arrival is not None else None
+        previous_arrival = route["arrival_epoch"]
+        legs.append(row)
+    return legs
+
+# Prompt selected from flight menu to find an itinerary between two airports
+def find_itinerary_prompt():
+    print_results(reference_data()["destinations"])
+    origin = input("From airport ID: ")
+    destination = input("To airport ID: ")
+    depart_after = input("Leaving after (YYYY-MM-DD HH:MM:SS, YYYY-MM-DD, today or tomorrow): ")
+    arrive_by = input("Arriving by (leave blank for any time): ").strip()
+    connection = input(f"Minimum connection in minutes (leave blank for {MIN_CONNECTION_MINUTES}): ").strip()
+    fewest_legs = input("Fewest flights rather than earliest arrival? (Y/N): ").strip().lower() == "y"
+    try:
+        legs = find_itinerary(origin, destination, depart_after, arrive_by=arrive_by or None,
+            connection_minutes=int(connection) if connection else MIN_CONNECTION_MINUTES, fewest_legs=fewest_legs)
+        if not legs:
+            print("No itinerary found.")
+        else:
+            print_results(legs)
+    except ValueError as e:
+        print(e)
+
+# Prompt selected from flight menu for a time range search
+def search_flight_range_prompt():
+    labels = list(FLIGHT_RANGE_FIELDS.keys())
+    for i, label in enumerate(labels, start=1):
+        print(f"{i}. {label}")
+    while True:
+        try:
+            field_label = labels[int(input("Choose time field: "))-1]
+            break
+        except (ValueError, IndexError):
+            print("Invalid choice.")
+    start = input("From (YYYY-MM-DD HH:MM:SS, YYYY-MM-DD, today or tomorrow): ")
+    end = input("To (YYYY-MM-DD HH:MM:SS, YYYY-MM-DD, today or tomorrow): ")
+    departure_id = input("Departure airport ID (leave blank for all airports): ").strip()
+    try:
+        rows = search_flight_range(start, end, field_label=field_label, departure_id=int(departure_id) if departure_id else None)
+        print_results(rows)
+    except ValueError as e:
+        print(e)
+
 def add_flight():
     number = input("Enter flight number: ") # takes input
-    execute_sql("destinations.sql") # prints out a list of destinations
+    print_results(reference_data()["destinations"]) # prints out a list of destinations
     while True:
-        try: # validates number input
-            departure_id = int(input("Enter departure airport ID: "))
+        try: # validates number input and that the airport exists
+            departure_id = check_field("Departure Airport ID", input("Enter departure airport ID: "))
             break
-        except ValueError:
-            print("Departure ID must be a number.")
+        except ValueError as e:
+            print(e)
     while True:
-        try: # validates number input
-            arrival_id = int(input("Enter arrival airport ID: "))
+        try: # validates number input and that the airport exists
+            arrival_id = check_field("Arrival Airport ID", input("Enter arrival airport ID: "))
             break
-        except ValueError:
-            print("Arrival ID must be a number.")
+        except ValueError as e:
+            print(e)
     execute_sql("pilot_roster.sql")
     while True: # validates number input
         try:
@@ -554,18 +2195,22 @@ def add_flight():
     txt = f"Flight Number: {number}\nDeparture Airport: {departure_id}\nArrival Aiport: {arrival_id}\nPilot ID: {pilot_id}\nDeparture time: {departure_date_utc}\nArrival time: {arrival_date_utc}"
     params = (number, departure_id, arrival_id, pilot_id, departure_date_utc, arrival_date_utc)
     print(txt) # displays input for review
+    if not schedule_allows(pilot_id, departure_date_utc, arrival_date_utc): # checks the pilot is free
+        print("Flight not added.")
+        return
     while True:
         print("Press 1 to add the new flight to the database")
         print("Press 2 to cancel the database entry")
         try:
             menu_option = int(input("Enter choice: "))
             if menu_option == 1:
-                execute_alter_sql("add_flight.sql", params)
-                flight_menu()
+                try:
+                    execute_alter_sql("add_flight.sql", params)
+                except sqlite3.IntegrityError: # e.g. an airport or pilot that does not exist
+                    print("Flight not added.")
                 break
             elif menu_option == 2:
                 print("\n Transaction Cancelled.")
-                flight_menu()
                 break
             else:
                 print("Invalid input, try again")
@@ -588,74 +2233,35 @@ def delete_flight():
         try:
             menu_option = int(input("Enter choice: "))
             if menu_option == 1:
-                execute_alter_sql("delete_flight.sql", (delete_id,))
-                print("flight deleted")
-                flight_menu()
+                try:
+                    execute_alter_sql("delete_flight.sql", (delete_id,))
+                    print("flight deleted")
+                except sqlite3.IntegrityError:
+                    print("Flight not deleted.")
                 break
             elif menu_option == 2:
                 print("\n Transaction Cancelled.")
-                flight_menu()
                 break
             else:
                 print("Invalid input, try again")
         except ValueError:
             print("Invalid input, try again.")
 
-# Prints the destination menu    
-def destination_menu():
-    print("\n Destination Menu")
-    print(" 1. View Destinations")
-    print(" 2. Search for a Destination")
-    print(" 3. Add a Destination")
-    print(" 4. Remove a Destination")
-    print(" 5. Update a Destination")
-    print(" 0. Return to Main Menu")
-    
-    while True:
-        try:
-            menu_option = int(input("\nEnter menu option: "))
-            break
-        except ValueError: # input validation
-            print("Invalid Input")
-    while True:
-        if menu_option == 1:
-            execute_sql("destinations.sql")
-            destination_menu()
-            break
-        elif menu_option == 2:
-            search_destination_prompt()
-            break
-        elif menu_option == 3:
-            add_destination()
-            break
-        elif menu_option == 4:
-            delete_destination()
-            break 
-        elif menu_option == 5:
-            update_destination_prompt()
-            break
-        elif menu_option == 0:
-            main_menu()
-            break
-        else:
-            print("\n Invalid Input")
-
 # Updates the destination record            
 def update_destination(destination_id, field_label, new_value):
     mapping = DESTINATION_UPDATE_FIELDS.get(field_label)
     if not mapping:
         raise ValueError(f"Unsupported field: {field_label}")
-    column, _kind = mapping # unpacks the column name from the tuple held in the dictionary
-    validated = validate_fields(field_label, new_value) # values for validation
-    
-    sql_text = load_sql(ALTERS_DIR, "update_destination.sql") # loads the file
-    set_clause = f"{column} = :value" # uses column to select the table column for update
-    where_clause = "WHERE destination.destination_id = :destination_id" # uses destination id to select the record for update
-    sql = Template(sql_text).substitute(set_clause=set_clause, where_clause=where_clause) # passes field and value into the sql file
+    try:
+        validated = check_field(field_label, new_value) # values for validation
+    except ValueError as e:
+        print(e)
+        return False
     
     try:
-        c.execute(sql, {"value": validated, "destination_id": destination_id}) # executes the update
-        c.connection.commit() # saves the update
+        run_statement("update_destination.sql", field_label, params={"value": validated, "destination_id": destination_id}, fetch=False) # pre-expanded set and where clauses for the field
+        commit_write() # saves the update
+        invalidate_reference_data()
         if c.rowcount == 0: # reports on a failed update
             print("No destination updated, destination ID not found")
             return False
@@ -692,27 +2298,28 @@ def update_destination_prompt():
     ok = update_destination(destination_id, field_label, new_value) # executes the update
     
     if ok: # prints the result
-        rows = execute_param_sql("destination_id.sql", (destination_id,))
-        print_results(rows)
-        flight_menu()
+        execute_param_sql("destination_id.sql", (destination_id,))
+    else:
+        print("Returning to main menu...")
+        return "main"
 
 # Searches for a destination
 def search_destination(field_label: str, value: str, *, partial: bool = False):
     column = DESTINATION_SEARCH_FIELDS.get(field_label) # gets the field from the dictionary
     if not column:
         raise ValueError(f"Unsupported search field {field_label}") # raises an error if the value is not found
-    if partial:
-        where_clause = f"WHERE {column} LIKE ?" # passed into the sql query for partial matches
-        params = (f"%{value}%",)
+    match = fts_prefix_query(DESTINATION_FTS_FIELDS[field_label], value) if partial and field_label in DESTINATION_FTS_FIELDS else None
+    if match:
+        statement = ("destination_fts_search.sql",) # full-text prefix search, best matches first
+        params = (match,)
     else:
-        where_clause = f"WHERE {column} = ?" # passes into the sql file for exact matches
-        params = (value,)
-    
-    sql_text = load_sql(QUERIES_DIR, "destination_search.sql")
-    sql = Template(sql_text).substitute(where_clause=where_clause) # passes the values in to search by
+        if partial:
+            params = (f"%{value}%",) # allows for partial matches when searching
+        else:
+            params = (value,) # exact value
+        statement = ("destination_search.sql", field_label, partial) # pre-expanded where clause for the field
     try:
-        c.execute(sql, params) # executes the search
-        return c.fetchall()
+        return run_statement(*statement, params=params) # executes the search
     except sqlite3.Error as e:
         print("Query error: ", e)
         return[]
@@ -730,21 +2337,30 @@ def search_destination_prompt():
             print("Menu selection must be a number. ")
     field_label = list(DESTINATION_SEARCH_FIELDS.keys())[choice-1]
     value = input(f"Enter value for {field_label}: ").strip()
+    if input("Add another criterion? (Y/N): ").strip().lower() == "y": # searches on several fields at once
+        compound_search_prompt("destination", DESTINATION_SEARCH_FIELDS, (field_label, "=", value))
+        return
     partial = False 
     if field_label not in {"Destination ID"}:
         use_partial = input("Partial match? (Y/N): ").lower() # determines if a partial match is allowed
         partial = (use_partial == "y")
-        rows = search_destination(field_label, value, partial=partial) # runs the search_destination()
-        print_results(rows) # prints the results
-        destination_menu()
+        if partial and field_label in DESTINATION_FTS_FIELDS:
+            print_results(search_destination(field_label, value, partial=True)) # ranked full-text matches
+        else:
+            browse_pages("destination_page.sql", field_label, value, partial=partial) # pages through the matching destinations
 
 # Adds a new destination to the database
 def add_destination():
     name = input("Enter airport name: ") # takes input
     city = input("Enter airport city: ")
     country = input("Enter airport country: ")
-    execute_sql("timezone.sql") # prints the timezones
-    timezone = input("Enter airport timezone from the above list: ")
+    print_results(reference_data()["timezones"]) # prints the timezones
+    while True: # checks the timezone code exists
+        try:
+            timezone = check_field("Timezone", input("Enter airport timezone code from the above list: "))
+            break
+        except ValueError as e:
+            print(e)
     
     print("\n Please review your input below.")
     txt = f"Name: {name}\nCity: {city}\nCountry: {country}\nTimezone: {timezone}"
@@ -756,12 +2372,13 @@ def add_destination():
         try: # handles data validation
             menu_option = int(input("Enter choice: "))
             if menu_option == 1:
-                execute_alter_sql("add_destination.sql", params)
-                destination_menu()
+                try:
+                    execute_alter_sql("add_destination.sql", params)
+                except sqlite3.IntegrityError:
+                    print("Destination not added.")
                 break
             elif menu_option == 2:
                 print("\nTransaction Cancelled.")
-                destination_menu()
                 break
             else:
                 print("Invalid input, try again.")
@@ -784,54 +2401,35 @@ def delete_destination():
         try: # menu selection 
             menu_option = int(input("Enter choice: "))
             if menu_option == 1:
-                execute_alter_sql("delete_destination.sql", (delete_id,))
-                print("Destination deleted")
-                destination_menu()
+                try:
+                    execute_alter_sql("delete_destination.sql", (delete_id,))
+                    print("Destination deleted")
+                except sqlite3.IntegrityError: # foreign keys stop an airport used by pilots or flights being deleted
+                    print("Destination not deleted, it is still used by pilots or flights.")
                 break
             elif menu_option == 2:
                 print("\n Transaction Cancelled.")
-                destination_menu()
                 break
             else:
                 print("Invalid input, try again")
         except ValueError:
             print("Invalid input, try again.")
     
-# prints the main menu
-def main_menu():
-    print("\n Welcome to the Flight Management Database")
-    print(" -----------------------------------------")
-    print(" Please select one of the following options")
-    print("\n1. Flights Menu")
-    print("2. Pilot Menu")
-    print("3. Destination Menu")
-    print("0. Exit")
-    
-    while True:
-        try:
-            menu_option = int(input("\nEnter menu option: "))
-            break
-        except ValueError:
-            print("Invalid Input")
-    while True:
-        if menu_option == 1:
-            flight_menu()
-            break
-        elif menu_option == 2:
-            pilot_menu()
-            break
-        elif menu_option == 3:
-            destination_menu()
-            break  
-        elif menu_option == 0:
-            conn.close()
-            print("\nDatabase Connection Closed")
-            print("Logging Off...")
-            print("Goodbye\n")
-            exit(0)
-        else:
-            print("\n Invalid Input")
-            main_menu()
+# Ends the interactive session, chosen from the main menu: waits for a running backup, commits and closes the
+# database and prints the session's statement totals. Returns None, which stops run_menus()
+def end_session():
+    if backup_running():
+        print("Waiting for the backup to finish...")
+        BACKUP_STATE["thread"].join()
+    flush_writes()
+    conn.close()
+    print(f"\nStatement cache: {STATEMENT_STATS['hits']} hits, {STATEMENT_STATS['misses']} misses")
+    results = result_cache_report()
+    print(f"Result cache: {results['hits']} hits, {results['misses']} misses, hit ratio {results['hit_ratio']}")
+    print_results(statement_report()) # time spent in each statement this session
+    print("Database Connection Closed")
+    print("Logging Off...")
+    print("Goodbye\n")
 
 # Used to populate an empty database by running each SQL command in the database.sql file
 def populate_database():
@@ -844,23 +2442,1067 @@ def populate_database():
     except sqlite3.Error as e:
         print("Population Error: ", e)
 
-try:
+# Returns the number of the newest migration file, which is the user_version of a database that is up to date
+def latest_migration():
+    return max((int(path.name.split("_", 1)[0]) for path in MIGRATIONS_DIR.glob("*.sql")), default=0)
+
+# Brings the database forward through every numbered migration file newer than PRAGMA user_version
+def migrate_database(verbose=True):
+    version = c.execute("PRAGMA user_version").fetchone()[0]
+    for path in sorted(MIGRATIONS_DIR.glob("*.sql")):
+        number = int(path.name.split("_", 1)[0]) # files are named NNNN_description.sql
+        if number <= version:
+            continue
+        sql = load_sql(MIGRATIONS_DIR, path.name)
+        # runs the migration and the version bump in one transaction so a failure leaves the database untouched
+        try:
+            c.executescript(f"BEGIN;\n{sql}\nPRAGMA user_version = {number};\nCOMMIT;")
+        except sqlite3.Error as e:
+            conn.rollback()
+            print(f"Migration error in {path.name}: ", e)
+            raise
+        if verbose:
+            print(f" Applied migration {path.name}")
+        version = number
+
+# Opens the database, populating an empty one, and brings the schema and statement registry up to date
+def connect(verbose=True, profile=None):
+    global conn, c
+    # Loads every query and alter once, before connecting, so the statement cache can be sized to fit them
+    load_statements()
+    invalidate_results() # results and statement tables from a database opened before
     # Connects to the database
-    conn = sqlite3.connect('CM500292--Databases-Coursework\database.db') # connects to the database
-    print("\n Connecting to Database...")
+    conn = sqlite3.connect(DB_PATH, cached_statements=max(128, len(STATEMENTS))) # connects to the database
+    if verbose:
+        print("\n Connecting to Database...")
+    # applies the connection profile. PRAGMA values cannot be bound as parameters, so they come only from CONNECTION_PROFILES
+    for pragma, value in CONNECTION_PROFILES[profile or DEFAULT_PROFILE].items():
+        conn.execute(f"PRAGMA {pragma} = {value}")
     conn.row_factory = sqlite3.Row # allows accessing of columns by name of index
+    instrument_connection(conn)
     c = conn.cursor() # initialises the cursor
-    # Checks whether the database is populated
-    c.execute("SELECT name FROM sqlite_master WHERE type='table';")
-    tables = c.fetchall()
-    # populates an empty database
-    if not tables:
-        print("Populating database")
-        populate_database()
-        print("Connected")
-        main_menu()
-    else:
+    # A database already at the newest migration is neither checked for tables nor migrated. user_version is read from
+    # the file header
+    if c.execute("PRAGMA user_version").fetchone()[0] < latest_migration():
+        # Checks whether the database is populated
+        c.execute("SELECT name FROM sqlite_master WHERE type='table';")
+        tables = c.fetchall()
+        # populates an empty database
+        if not tables:
+            if verbose:
+                print("Populating database")
+            populate_database()
+        migrate_database(verbose)
+    attach_partitions()
+    # Checks the statements only when they or the schema have changed since the last check
+    fingerprint = statement_fingerprint()
+    checked = run_statement("statement_check.sql")
+    if not checked or checked[0]["fingerprint"] != fingerprint:
+        validate_statements(conn)
+        run_statement("record_statement_check.sql", params=(fingerprint,), fetch=False)
+        conn.commit()
+    if verbose:
         print(" Connected")
-        main_menu()
-except sqlite3.DatabaseError:
-    print("Database error detected")
\ No newline at end of file
+
+# Tables as named on the command line: the table, its search and update functions, and their field dictionaries
+COMMAND_TABLES = {
+    "flights":("flight", search_flight, update_flight, FLIGHT_SEARCH_FIELDS, FLIGHT_UPDATE_FIELDS),
+    "pilots":("pilot", search_pilot, update_pilot, PILOT_SEARCH_FIELDS, PILOT_UPDATE_FIELDS),
+    "destinations":("destination", search_destination, update_destination, DESTINATION_SEARCH_FIELDS, DESTINATION_UPDATE_FIELDS),
+}
+
+# Every command on the command line. main() builds only the options of the one being run
+COMMAND_NAMES = {*COMMAND_TABLES, "import", "export", "changes", "backup", "partitions", "run"}
+
+# Output formats of the commands that print rows. table is the grid
+OUTPUT_FORMATS = ["table", *TABLE_FORMATS, "json", "csv"]
+
+# Writes rows as a text table, a JSON array or CSV, as they are read
+def write_rows(rows, fmt):
+    if fmt == "table" or fmt in TABLE_FORMATS:
+        print_results(rows, "grid" if fmt == "table" else fmt)
+        return
+    writer = None
+    first = True
+    for row in rows:
+        row = dict(row)
+        if fmt == "json":
+            sys.stdout.write(("[" if first else ",\n") + json.dumps(row))
+        else:
+            if writer is None:
+                writer = csv.DictWriter(sys.stdout, fieldnames=list(row.keys()), lineterminator="\n")
+                writer.writeheader()
+            writer.writerow(row)
+        first = False
+    if fmt == "json":
+        sys.stdout.write("[]\n" if first else "]\n")
+
+# Adds a row given as {column: value}, validated as an import row is. Returns the new ID, or None if a flight would
+# double-book its pilot. Raises ValueError for a bad value and sqlite3.IntegrityError if the database refuses it
+def add_record(table, row):
+    filename, columns = IMPORT_TABLES[table]
+    params = validate_import_row(columns, row)
+    if table == "flight" and not schedule_allows(params[3], params[4], params[5]): # pilot_id, departure and arrival
+        return None
+    execute_alter_sql(filename, params)
+    return c.lastrowid
+
+# Deletes a row by ID. Returns whether there was one. Raises sqlite3.IntegrityError if it is still referenced
+def delete_record(table, record_id):
+    execute_alter_sql(f"delete_{table}.sql", (record_id,))
+    return c.rowcount > 0
+
+# Writes streamed rows to a CSV file with a header line. Returns the number of rows
+def write_csv_file(rows, path, chunk):
+    count = 0
+    with path.open("w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        for row in rows:
+            if count == 0:
+                writer.writerow(row.keys())
+            writer.writerow(row)
+            count += 1
+    return count
+
+# Writes streamed rows to a JSONL file, one object per line. Returns the number of rows
+def write_jsonl_file(rows, path, chunk):
+    count = 0
+    with path.open("w", encoding="utf-8") as f:
+        for row in rows:
+            f.write(json.dumps(dict(row), ensure_ascii=False) + "\n")
+            count += 1
+    return count
+
+# Writes streamed rows to a Parquet file, one row group per chunk rows. The column types come from the first chunk,
+# with columns that are empty there written as text. pyarrow is only needed for this format
+def write_parquet_file(rows, path, chunk):
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise ValueError("Parquet export needs pyarrow (pip install pyarrow).") from None
+    writer = schema = None
+    count = 0
+    batch = []
+    def write_batch():
+        nonlocal writer, schema
+        if schema is None:
+            inferred = pa.Table.from_pylist(batch).schema
+            schema = pa.schema([field.with_type(pa.string()) if pa.types.is_null(field.type) else field for field in inferred])
+            writer = pq.ParquetWriter(path, schema)
+        writer.write_table(pa.Table.from_pylist(batch, schema=schema), row_group_size=chunk)
+        batch.clear()
+    try:
+        for row in rows:
+            batch.append(dict(row))
+            count += 1
+            if len(batch) >= chunk:
+                write_batch()
+        if batch:
+            write_batch()
+        if writer is None: # nothing to export: an empty file with no columns
+            pq.write_table(pa.table({}), path)
+    finally:
+        if writer is not None:
+            writer.close()
+    return count
+
+# File writers for each export format
+EXPORT_WRITERS = {
+    "csv":write_csv_file,
+    "jsonl":write_jsonl_file,
+    "parquet":write_parquet_file,
+}
+
+# Exports a source to a CSV, JSONL or Parquet file. The cursor is read chunk rows at a time, never with fetchall, so
+# memory stays flat however many rows there are. With incremental only the rows changed since the consumer's last
+# export are written (a consumer with no earlier export gets every row). Deleted rows are not exported.
+# The file is written under a .partial name and renamed when complete, and only then is the consumer's position saved
+def export_rows(source, fmt, out, *, incremental=False, consumer="default", chunk=EXPORT_CHUNK_SIZE):
+    filename, _column = EXPORT_SOURCES[source]
+    until = run_statement("change_seq.sql")[0]["seq"] # read first, so a row changed during the export goes in the next one
+    since = None
+    if incremental:
+        rows = run_statement("export_state.sql", params=(source, consumer))
+        since = rows[0]["seq"] if rows else None
+    if since is None:
+        rows = stream_statement(filename, size=chunk)
+    else:
+        rows = stream_statement(filename, True, params={"since":since, "until":until}, size=chunk)
+    path = Path(out)
+    partial_path = path.with_name(path.name + ".partial")
+    try:
+        count = EXPORT_WRITERS[fmt](rows, partial_path, chunk)
+    except BaseException:
+        partial_path.unlink(missing_ok=True)
+        raise
+    os.replace(partial_path, path)
+    exported_at = (EPOCH + timedelta(seconds=time.time())).strftime("%Y-%m-%dT%H:%M:%SZ")
+    run_statement("record_export.sql", params=(source, consumer, until, exported_at), fetch=False)
+    commit_write()
+    return {"rows":count, "since":since, "until":until}
+
+# Returns up to limit changes after seq, oldest first, with row_data decoded. Raises ValueError if compaction has deleted
+# changes after seq, as a consumer reading from there would miss them and has to re-read the tables instead
+def read_changes(after, limit=CHANGES_BATCH_SIZE):
+    position = run_statement("changelog_position.sql")[0]
+    if after < position["trimmed"]:
+        raise ValueError(f"Changes up to {position['trimmed']} have been compacted. Re-read the tables, then read the changes after {position['latest']}.")
+    return [{**dict(row), "row_data":json.loads(row["row_data"]) if row["row_data"] else None}
+        for row in run_statement("changes.sql", params=(after, limit))]
+
+# Returns the seq of the last change a consumer acknowledged, or 0 for a new consumer
+def change_position(consumer):
+    rows = run_statement("export_state.sql", params=(CHANGES_SOURCE, consumer))
+    return rows[0]["seq"] if rows else 0
+
+# Records that a consumer has handled every change up to and including seq
+def acknowledge_changes(consumer, seq):
+    acknowledged_at = (EPOCH + timedelta(seconds=time.time())).strftime("%Y-%m-%dT%H:%M:%SZ")
+    run_statement("record_export.sql", params=(CHANGES_SOURCE, consumer, seq, acknowledged_at), fetch=False)
+    commit_write()
+
+# Yields a consumer's unread changes a batch at a time. Each batch is acknowledged when the next one is asked for, so a
+# consumer that stops part way through a batch is sent that batch again next time
+def consume_changes(consumer, batch=CHANGES_BATCH_SIZE):
+    after = change_position(consumer)
+    while True:
+        changes = read_changes(after, batch)
+        if not changes:
+            return
+        yield changes
+        after = changes[-1]["seq"]
+        acknowledge_changes(consumer, after)
+
+# Stops tracking a consumer, so it no longer holds back compaction
+def forget_change_consumer(consumer):
+    run_statement("forget_change_consumer.sql", params=(consumer,), fetch=False)
+    commit_write()
+    return statement_cursor().rowcount > 0
+
+# Deletes the changes every consumer has acknowledged. With no consumers nothing is deleted. With older_than_days, the
+# changes older than that are deleted too, read or not, and a consumer still behind them has to re-read the tables.
+# Returns the seq compacted up to and the number of changes deleted
+def compact_changes(older_than_days=None):
+    position = run_statement("changelog_position.sql")[0]
+    upto = min([row["Position"] for row in run_statement("change_consumers.sql")], default=position["trimmed"])
+    if older_than_days is not None:
+        newer = run_statement("changes_after_time.sql", params=(int(time.time()) - older_than_days * 86400,))
+        upto = max(upto, newer[0]["seq"] - 1 if newer else position["latest"])
+    if upto <= position["trimmed"]:
+        return position["trimmed"], 0
+    run_statement("compact_changes.sql", params=(upto,), fetch=False)
+    deleted = statement_cursor().rowcount
+    run_statement("record_changes_trimmed.sql", params=(upto,), fetch=False) # same transaction as the delete
+    commit_write()
+    return upto, deleted
+
+# Raised from the backup progress callback to stop a stepped backup that keeps starting again
+class BackupRestarted(Exception):
+    pass
+
+# Copies the database to target with sqlite's backup API. The copy runs pages at a time, pausing after each step so
+# other connections are held off for one step at most. It reads on its own connection, so it can run on any thread.
+# When another connection writes, sqlite starts the copy again. After BACKUP_RESTARTS restarts the rest is copied in
+# one step, which in WAL mode does not block writers either. Only committed writes are copied.
+# The copy is written as target.partial and renamed once complete. Returns the pages copied
+def backup_database(target, *, pages=BACKUP_PAGES, pause_ms=BACKUP_PAUSE_MS):
+    target = Path(target)
+    partial_path = target.with_name(target.name + ".partial")
+    source = sqlite3.connect(f"{Path(DB_PATH).resolve().as_uri()}?mode=ro", uri=True)
+    destination = sqlite3.connect(partial_path)
+    BACKUP_STATE.update({"copied":0, "total":0, "restarts":0})
+    def progress(_status, remaining, total):
+        if total - remaining < BACKUP_STATE["copied"]: # fewer pages done than last step, so sqlite started again
+            BACKUP_STATE["restarts"] += 1
+            if pages > 0 and BACKUP_STATE["restarts"] > BACKUP_RESTARTS:
+                raise BackupRestarted
+        BACKUP_STATE.update({"copied":total - remaining, "total":total})
+    try:
+        try:
+            source.backup(destination, pages=pages, progress=progress, sleep=pause_ms / 1000)
+        except BackupRestarted:
+            pages = -1
+            source.backup(destination, pages=-1, progress=progress)
+    except BaseException:
+        destination.close()
+        partial_path.unlink(missing_ok=True)
+        raise
+    finally:
+        source.close()
+    destination.close()
+    os.replace(partial_path, target)
+    return BACKUP_STATE["total"]
+
+# Returns the snapshots in BACKUP_DIR, newest first. Names sort by the time they were taken
+def snapshot_paths():
+    return sorted(BACKUP_DIR.glob("database-*.db"), reverse=True)
+
+# Deletes the oldest snapshots beyond the newest keep
+def rotate_snapshots(keep=SNAPSHOT_KEEP):
+    for path in snapshot_paths()[keep:]:
+        path.unlink()
+
+# Takes a snapshot: a backup into BACKUP_DIR named after the UTC time, after which only the newest keep are kept.
+# keep None keeps every snapshot. Returns the snapshot's path
+def snapshot_database(keep=SNAPSHOT_KEEP, **backup_options):
+    BACKUP_DIR.mkdir(parents=True, exist_ok=True)
+    taken = (EPOCH + timedelta(seconds=time.time())).strftime("%Y%m%dT%H%M%S%fZ")
+    path = BACKUP_DIR / f"database-{taken}.db"
+    backup_database(path, **backup_options)
+    if keep is not None:
+        rotate_snapshots(keep)
+    return path
+
+# Returns a row for each snapshot, newest first
+def list_snapshots():
+    rows = []
+    for path in snapshot_paths():
+        taken = datetime.strptime(path.stem.split("-", 1)[1], "%Y%m%dT%H%M%S%fZ")
+        rows.append({"Snapshot":path.name, "Taken (UTC)":taken.strftime("%Y-%m-%d %H:%M:%S"), "Size (MB)":round(path.stat().st_size / 1048576, 1)})
+    return rows
+
+# Replaces the database's contents with a snapshot's, through the open connection, so other connections see the
+# restored data on their next read. A snapshot of the current data is taken first, so a restore can be undone.
+# An older snapshot's schema is migrated forward. Returns the path of the snapshot taken first
+def restore_snapshot(name):
+    path = BACKUP_DIR / name
+    if path not in snapshot_paths():
+        raise ValueError(f"No snapshot named {name}.")
+    if backup_running():
+        raise ValueError("Wait for the running backup to finish first.")
+    if WRITE_STATE["batch"]:
+        raise ValueError("A snapshot cannot be restored while a script is running.")
+    flush_writes()
+    before = snapshot_database(keep=None) # not rotated yet, so the snapshot being restored is still there
+    snapshot = sqlite3.connect(f"{path.resolve().as_uri()}?mode=ro", uri=True)
+    try:
+        snapshot.backup(conn) # one step, so readers never see a half restored database
+    finally:
+        snapshot.close()
+    rotate_snapshots()
+    run_statement("drop_partition_view.sql", fetch=False) # so the migrations see the flight table, not the view
+    migrate_database(verbose=False)
+    attach_partitions() # the snapshot's partitions, which may not be the ones there were
+    invalidate_results()
+    invalidate_reference_data()
+    invalidate_route_network()
+    INDEX_STATS.clear()
+    return before
+
+# Whether the backup started from the menu is still running
+def backup_running():
+    return BACKUP_STATE["thread"] is not None and BACKUP_STATE["thread"].is_alive()
+
+# Starts a backup on its own thread and returns straight away. With target None it takes a snapshot instead.
+# Pending writes are committed first, so the backup includes them
+def start_backup(target=None):
+    if backup_running():
+        raise ValueError("A backup is already running.")
+    flush_writes()
+    def run():
+        try:
+            if target is None:
+                BACKUP_STATE["target"] = str(snapshot_database()) # named once it is taken
+            else:
+                backup_database(target)
+        except (sqlite3.Error, OSError) as e:
+            BACKUP_STATE["error"] = str(e)
+    BACKUP_STATE.update({"target":target or "a new snapshot", "error":None})
+    BACKUP_STATE["thread"] = threading.Thread(target=run, name="backup", daemon=True)
+    BACKUP_STATE["thread"].start()
+
+# Returns a line describing the backup started from the menu, or None if none has been started
+def backup_status():
+    if BACKUP_STATE["thread"] is None:
+        return None
+    if BACKUP_STATE["error"]:
+        return f"Backup failed: {BACKUP_STATE['error']}"
+    done = f"{BACKUP_STATE['copied']} of {BACKUP_STATE['total']} pages"
+    if backup_running():
+        return f"Backing up to {BACKUP_STATE['target']}: {done}, restarted {BACKUP_STATE['restarts']} times"
+    return f"Backed up to {BACKUP_STATE['target']}: {done}"
+
+# Backup menu option to take a snapshot in the background
+def snapshot_prompt():
+    start_backup()
+    print("Snapshot started. Its progress is shown at the top of this menu.")
+
+# Backup menu option to copy the database to a file in the background
+def backup_file_prompt():
+    start_backup(input("Enter path of the backup file: ").strip())
+    print("Backup started. Its progress is shown at the top of this menu.")
+
+# Backup menu option to restore a snapshot over the database
+def restore_snapshot_prompt():
+    print_results(list_snapshots())
+    name = input("Enter the snapshot to restore: ").strip()
+    if input(f"Replace every row in the database with {name}? (Y/N): ").strip().lower() == "y":
+        before = restore_snapshot(name)
+        print(f"Restored {name}. The data before the restore is in {before.name}.")
+
+# The interactive menus: the lines printed above each menu's options, and its options by number as the label, the
+# function run when it is chosen and the menu shown next. A function can return another menu to go to instead, as the
+# update prompts return "main" when an update fails. A next menu of None ends the session
+MENUS = {
+    "main":(["\n Welcome to the Flight Management Database", " -----------------------------------------", " Please select one of the following options\n"], {
+        1:("Flights Menu", None, "flight"),
+        2:("Pilot Menu", None, "pilot"),
+        3:("Destination Menu", None, "destination"),
+        4:("Import Data", import_prompt, "main"),
+        5:("Backups", None, "backup"),
+        0:("Exit", end_session, None),
+    }),
+    "flight":(["\n Flight Menu"], {
+        1:("View Upcoming Flights", lambda: browse_pages("flight_page.sql"), "flight"),
+        2:("Add a New Flight", add_flight, "flight"),
+        3:("Search for Flights", search_flight_prompt, "flight"),
+        4:("Remove a Flight", delete_flight, "flight"),
+        5:("Update a Flight", update_flight_prompt, "flight"),
+        6:("Search Flights by Time Range", search_flight_range_prompt, "flight"),
+        7:("Audit Pilot Schedules", audit_schedule_prompt, "flight"),
+        8:("Find an Itinerary", find_itinerary_prompt, "flight"),
+        9:("Assign Pilots to a File of Flights", assign_flights_prompt, "flight"),
+        0:("Return to Main Menu", None, "main"),
+    }),
+    "pilot":(["\n Pilot Menu"], {
+        1:("View Pilot Roster", lambda: browse_pages("pilot_page.sql"), "pilot"),
+        2:("Search for a Pilot", search_pilot_prompt, "pilot"),
+        3:("Add a pilot", add_pilot, "pilot"),
+        4:("Remove a pilot", delete_pilot, "pilot"),
+        5:("Amend a pilot", update_pilot_prompt, "pilot"),
+        6:("Flight Hours Report", pilot_duty_prompt, "pilot"),
+        0:("Return to Main Menu", None, "main"),
+    }),
+    "destination":(["\n Destination Menu"], {
+        1:("View Destinations", lambda: browse_pages("destination_page.sql"), "destination"),
+        2:("Search for a Destination", search_destination_prompt, "destination"),
+        3:("Add a Destination", add_destination, "destination"),
+        4:("Remove a Destination", delete_destination, "destination"),
+        5:("Update a Destination", update_destination_prompt, "destination"),
+        0:("Return to Main Menu", None, "main"),
+    }),
+    "backup":(["\n Backup Menu"], {
+        1:("Take a Snapshot", snapshot_prompt, "backup"),
+        2:("Back Up to a File", backup_file_prompt, "backup"),
+        3:("List Snapshots", lambda: print_results(list_snapshots()), "backup"),
+        4:("Restore a Snapshot", restore_snapshot_prompt, "backup"),
+        0:("Return to Main Menu", None, "main"),
+    }),
+}
+
+# Functions returning a status line shown under a menu's title, or None for no line
+MENU_STATUS = {
+    "backup":backup_status,
+}
+
+# Shows a menu, runs the option chosen and returns the menu to show next. An error from the option is printed and the
+# same menu shown again, so bad input never ends the session
+def show_menu(menu):
+    heading, options = MENUS[menu]
+    for line in heading:
+        print(line)
+    status = MENU_STATUS[menu]() if menu in MENU_STATUS else None
+    if status:
+        print(f" {status}")
+    for number, (label, _action, _next_menu) in options.items():
+        print(f" {number}. {label}")
+    try:
+        _label, action, next_menu = options[int(input("\nEnter menu option: "))]
+    except (ValueError, KeyError):
+        print("\n Invalid Input")
+        return menu
+    try:
+        return (action() if action else None) or next_menu
+    except (ValueError, IndexError, sqlite3.Error, OSError) as e:
+        print(e)
+        return menu
+
+# Runs the interactive menus from the main menu until Exit is chosen or input ends. Every option returns here before
+# the next menu is shown, so a session of any length runs at the same stack depth
+def run_menus(menu="main"):
+    while menu is not None:
+        try:
+            menu = show_menu(menu)
+        except EOFError: # input closed, as with Ctrl+D
+            menu = end_session()
+
+# Checks a month is YYYY-MM. Returns it or raises ValueError
+def check_month(value):
+    try:
+        return datetime.strptime(value.strip(), "%Y-%m").strftime("%Y-%m")
+    except ValueError:
+        raise ValueError("Months must be YYYY-MM.") from None
+
+# Returns the start of a month and the start of the next one in epoch seconds
+def month_bounds(month):
+    start = datetime.strptime(month, "%Y-%m")
+    end = (start + timedelta(days=32)).replace(day=1)
+    return int((start - EPOCH).total_seconds()), int((end - EPOCH).total_seconds())
+
+# Returns a month's partition schema name, its database file and the file it is archived to
+def partition_files(month):
+    path = Path(DB_PATH)
+    data = path.with_name(f"{path.stem}.{month}.db")
+    return f"flight_{month.replace('-', '_')}", data, data.with_name(data.name + ".xz")
+
+# Returns the union of flight's columns across schemas, in the order given
+def flight_union(schemas):
+    columns = ", ".join(PARTITIONS["columns"])
+    return "\nUNION ALL\n".join(f"SELECT {columns} FROM {schema}.flight" for schema in schemas)
+
+# Returns the key of a PARTITION_TEMPLATES file expanded for one partition schema, or for a tuple of schemas for the
+# view, registering it on first use
+def partition_statement(filename, schema):
+    key = (filename, schema)
+    if key not in STATEMENTS:
+        if isinstance(schema, tuple):
+            values = {"arms":flight_union(schema)}
+        else:
+            values = {"schema":schema, "columns":", ".join(PARTITIONS["stored"])}
+        register_statement(key, Template(TEMPLATE_TEXT[filename]).substitute(values))
+    return key
+
+# Returns the key of flight_range.sql over main.flight and only the attached partitions whose bounds overlap the
+# window, registering it on first use. Months the window cannot match are not read at all
+def partition_range_statement(field_label, by_departure_airport, start, end):
+    low, high = FLIGHT_RANGE_BOUNDS[field_label]
+    schemas = ("main", *(partition_files(month)[0] for month, row in sorted(PARTITIONS["attached"].items())
+        if row[low] is not None and row[low] < end and row[high] >= start))
+    key = ("flight_range.sql", field_label, by_departure_airport, schemas)
+    if key not in STATEMENTS:
+        column = FLIGHT_RANGE_FIELDS[field_label]
+        flight_source = "main.flight AS flight" if len(schemas) == 1 else f"({flight_union(schemas)}) AS flight"
+        register_statement(key, Template(TEMPLATE_TEXT["flight_range.sql"]).substitute(where_clause=range_where_clause(column, by_departure_airport),
+            order_by=f"{column}, flight.flight_id", flight_source=flight_source))
+    return key
+
+# Attaches every partition that is not archived, detaches any that should no longer be attached, and rebuilds the
+# temporary flight view over main.flight and them. With none attached flight is the table itself. read_only attaches
+# them read-only, for server.py's pooled connections. Must run outside a transaction, as ATTACH cannot
+def attach_partitions(read_only=False):
+    wanted = {row["month"]: row for row in run_statement("flight_partitions.sql") if row["state"] == "attached"}
+    columns = run_statement("flight_columns.sql")
+    run_statement("drop_partition_view.sql", fetch=False)
+    attached = {row["name"] for row in run_statement("attached_databases.sql") if PARTITION_SCHEMA.fullmatch(row["name"])}
+    for schema in attached - {partition_files(month)[0] for month in wanted}:
+        run_statement("detach_partition.sql", params=(schema,), fetch=False)
+    for month in sorted(wanted):
+        schema, path, _archive = partition_files(month)
+        if schema in attached:
+            continue
+        if not path.exists():
+            print(f"Partition file {path} is missing, so the {month} flights are left out.")
+            del wanted[month]
+            continue
+        run_statement("attach_partition.sql", params=(f"{path.resolve().as_uri()}?mode=ro" if read_only else str(path), schema), fetch=False)
+    for key in [key for key in STATEMENTS if key[0] in PARTITION_TEMPLATES or (key[0] == "flight_range.sql" and len(key) == 4)]:
+        del STATEMENTS[key] # built for the partitions and columns there were before
+    PARTITIONS.update({
+        "attached":wanted,
+        "columns":[row["name"] for row in columns if row["hidden"] != 1],
+        "stored":[row["name"] for row in columns if row["hidden"] == 0], # generated columns are worked out again in the partition
+    })
+    if wanted:
+        run_statement(*partition_statement("partition_view.sql", ("main", *(partition_files(month)[0] for month in sorted(wanted)))), fetch=False)
+
+# Returns how many databases may be attached at once, which caps the partitions attached
+def partition_limit():
+    return conn.getlimit(sqlite3.SQLITE_LIMIT_ATTACHED)
+
+# Returns every partition by month, as flight_partitions.sql returns them
+def known_partitions():
+    return {row["month"]: dict(row) for row in run_statement("flight_partitions.sql")}
+
+# Refuses a partition change while a script is running, then commits any pending writes, as ATTACH and DETACH cannot
+# run in a transaction
+def start_partition_change():
+    if WRITE_STATE["batch"]:
+        raise ValueError("Partitions cannot be changed while a script is running.")
+    flush_writes()
+    if conn.in_transaction:
+        conn.commit()
+        end_write_transaction()
+
+# Moves every flight departing before the month `before` (YYYY-MM) out of flight into its month's partition,
+# creating and attaching the partitions that do not exist yet. Each month is moved in its own transaction, with the
+# triggers that keep the duty totals, change_seq and the changelog turned off, as the flights have not changed.
+# Returns each month moved with its flight count. Raises ValueError for a month that is archived, or when the
+# partitions would not fit in the attach limit
+def split_partitions(before):
+    start, _end = month_bounds(check_month(before))
+    start_partition_change()
+    months = run_statement("flight_months.sql", params=(start,))
+    known = known_partitions()
+    archived = [row["month"] for row in months if known.get(row["month"], {}).get("state") == "archived"]
+    if archived:
+        raise ValueError(f"Restore {', '.join(archived)} before moving more flights into it.")
+    attached = sum(1 for row in known.values() if row["state"] == "attached") + sum(1 for row in months if row["month"] not in known)
+    if attached > partition_limit():
+        raise ValueError(f"{attached} partitions would be attached, but only {partition_limit()} databases can be. Archive some first.")
+    moved = []
+    try:
+        for row in months:
+            month = row["month"]
+            schema, path, _archive = partition_files(month)
+            if month not in known:
+                with sqlite3.connect(path) as partition: # creates the file with the same flight table and indexes
+                    partition.executescript(load_sql(BASE_DIR, "flight_partition.sql"))
+                partition.close()
+                run_statement("attach_partition.sql", params=(str(path), schema), fetch=False)
+            month_start, month_end = month_bounds(month)
+            run_statement("flight_move.sql", params=(1,), fetch=False)
+            run_statement(*partition_statement("partition_copy.sql", schema), params={"start":month_start, "end":month_end}, fetch=False)
+            run_statement("partition_delete.sql", params={"start":month_start, "end":month_end}, fetch=False)
+            run_statement("flight_move.sql", params=(0,), fetch=False)
+            bounds = run_statement(*partition_statement("partition_bounds.sql", schema))[0]
+            run_statement("record_partition.sql", params={"month":month, **dict(bounds)}, fetch=False)
+            conn.commit()
+            known[month] = {"state":"attached"}
+            moved.append({"Month":month, "Flights":row["flights"]})
+    except sqlite3.Error:
+        conn.rollback()
+        raise
+    finally:
+        attach_partitions()
+    return moved
+
+# Copies a partition file through lzma, compressing or decompressing it, into a .partial file that replaces target
+# once it is complete. The source file is deleted afterwards
+def convert_partition_file(source, target, compress):
+    import lzma, shutil # only partitions need them, so they are left out of startup
+    partial = target.with_name(target.name + ".partial")
+    reader = open(source, "rb") if compress else lzma.open(source, "rb")
+    writer = lzma.open(partial, "wb", preset=ARCHIVE_PRESET) if compress else open(partial, "wb")
+    with reader, writer:
+        shutil.copyfileobj(reader, writer, 1 << 20)
+    os.replace(partial, target)
+    source.unlink()
+
+# Detaches every attached partition before the month `before` (YYYY-MM) and compresses its file, which takes its
+# flights out of the flight view until it is restored. Returns the months archived
+def archive_partitions(before):
+    cutoff = check_month(before)
+    start_partition_change()
+    months = [month for month, row in known_partitions().items() if row["state"] == "attached" and month < cutoff]
+    for month in months:
+        run_statement("set_partition_state.sql", params=("archived", month), fetch=False)
+    conn.commit()
+    attach_partitions() # detaches them
+    for month in months:
+        _schema, path, archive = partition_files(month)
+        if path.exists(): # already compressed if an earlier archive stopped part way
+            convert_partition_file(path, archive, compress=True)
+    if months:
+        invalidate_route_network()
+    return months
+
+# Decompresses an archived partition and attaches it again. Raises ValueError if it is not archived, its archive is
+# missing, or another partition would not fit in the attach limit
+def restore_partition(month):
+    month = check_month(month)
+    known = known_partitions()
+    if known.get(month, {}).get("state") != "archived":
+        raise ValueError(f"{month} is not an archived partition.")
+    if sum(1 for row in known.values() if row["state"] == "attached") + 1 > partition_limit():
+        raise ValueError(f"Only {partition_limit()} databases can be attached. Archive another month first.")
+    start_partition_change()
+    _schema, path, archive = partition_files(month)
+    if not path.exists():
+        if not archive.exists():
+            raise ValueError(f"The archive {archive} is missing.")
+        convert_partition_file(archive, path, compress=False)
+    run_statement("set_partition_state.sql", params=("attached", month), fetch=False)
+    conn.commit()
+    attach_partitions()
+    invalidate_route_network()
+
+# Moves a partition's flights back into flight and deletes its file, restoring it first if it is archived.
+# Returns the number of flights moved
+def merge_partition(month):
+    month = check_month(month)
+    known = known_partitions()
+    if month not in known:
+        raise ValueError(f"No partition for {month}.")
+    if known[month]["state"] == "archived":
+        restore_partition(month)
+    start_partition_change()
+    schema, path, _archive = partition_files(month)
+    try:
+        run_statement("flight_move.sql", params=(1,), fetch=False)
+        run_statement(*partition_statement("partition_merge.sql", schema), fetch=False)
+        run_statement("flight_move.sql", params=(0,), fetch=False)
+        run_statement("delete_partition.sql", params=(month,), fetch=False)
+        conn.commit()
+    except sqlite3.Error:
+        conn.rollback()
+        raise
+    finally:
+        attach_partitions() # detaches it once it is no longer listed
+    path.unlink()
+    return known[month]["flights"]
+
+# Returns a row for each partition, with its first and last departure and the file its flights are in
+def list_partitions():
+    rows = []
+    for month, row in known_partitions().items():
+        _schema, path, archive = partition_files(month)
+        rows.append({
+            "Month":month,
+            "Flights":row["flights"],
+            "First Departure":(EPOCH + timedelta(seconds=row["departure_min"])).strftime("%Y-%m-%d %H:%M:%S") if row["departure_min"] is not None else None,
+            "Last Departure":(EPOCH + timedelta(seconds=row["departure_max"])).strftime("%Y-%m-%d %H:%M:%S") if row["departure_max"] is not None else None,
+            "State":row["state"],
+            "File":(path if row["state"] == "attached" else archive).name,
+        })
+    return rows
+
+# Yields every row of a paged listing, one page at a time
+def iter_pages(filename, field_label=None, value=None, *, partial=False):
+    after = 0
+    while True:
+        rows, more = fetch_page(filename, after, field_label, value, partial=partial)
+        yield from rows
+        if not more:
+            return
+        after = page_key(rows[-1])
+
+# Builds the parser for the command line. Used for both the process arguments and each line of a script.
+# With command set, only that command's options are built. The others are listed in the help but take no options
+def build_parser(command=None):
+    parser = argparse.ArgumentParser(prog="cli.py", description="Flight Management Database. Runs the interactive menu when no command is given.")
+    parser.add_argument("--db", default=DB_PATH, help="database file (default FLIGHTDB_PATH, or database.db next to cli.py)")
+    parser.add_argument("--profile", choices=list(CONNECTION_PROFILES), default=DEFAULT_PROFILE, help="connection settings to open the database with")
+    parser.add_argument("--group-commit", type=int, metavar="N", help="commit after N writes instead of after every write")
+    parser.add_argument("--group-commit-ms", type=int, metavar="T", help="also commit once the oldest pending write is T ms old")
+    parser.add_argument("--slow-ms", type=float, metavar="MS", help=f"log statements taking at least MS ms (default {INSTRUMENTATION['slow_ms']:g})")
+    parser.add_argument("--slow-log", metavar="PATH", help="slow-query log file, or an empty string for no log")
+    parser.add_argument("--trace", action="store_true", help="print every statement sqlite runs to stderr")
+    parser.add_argument("--progress-steps", type=int, metavar="N", help="count virtual machine steps per statement, every N steps")
+    parser.add_argument("--cache-entries", type=int, metavar="N", help=f"results the result cache holds, 0 for none (default {RESULT_CACHE['entries']})")
+    parser.add_argument("--cache-ttl", type=float, metavar="S", help=f"seconds a cached result is used for (default {RESULT_CACHE['ttl']:g})")
+    parser.add_argument("--stats", action="store_true", help="print the time spent in each statement and the result cache totals to stderr on exit")
+    commands = parser.add_subparsers(dest="command")
+    for name, (table, _search, _update, search_fields, update_fields) in COMMAND_TABLES.items():
+        table_parser = commands.add_parser(name, help=f"search and change {name}")
+        if command not in (None, name):
+            continue
+        actions = table_parser.add_subparsers(dest="action", required=True)
+        list_parser = actions.add_parser("list", help=f"list every {table}")
+        list_parser.add_argument("--format", choices=OUTPUT_FORMATS, default="table")
+        search_parser = actions.add_parser("search", help=f"search {name} on one field, or on several with --where")
+        search_parser.add_argument("--field", choices=list(search_fields))
+        search_parser.add_argument("--value")
+        search_parser.add_argument("--partial", action="store_true", help="match anywhere in the field")
+        search_parser.add_argument("--where", nargs=3, action="append", metavar=("FIELD", "OPERATOR", "VALUE"),
+            help=f"a criterion, repeatable. OPERATOR is one of {', '.join(SEARCH_OPERATORS)}. between takes low,high and in a comma separated list")
+        search_parser.add_argument("--any", action="store_true", help="match any --where criterion instead of all of them")
+        search_parser.add_argument("--format", choices=OUTPUT_FORMATS, default="table")
+        if table == "pilot":
+            hours_parser = actions.add_parser("hours", help="rolling 7, 28 and 365 day block minutes and sectors")
+            hours_parser.add_argument("--id", type=int, help="one pilot instead of all of them")
+            hours_parser.add_argument("--as-of", help="last day of the windows, YYYY-MM-DD (default today)")
+            hours_parser.add_argument("--format", choices=OUTPUT_FORMATS, default="table")
+        if table == "flight":
+            range_parser = actions.add_parser("range", help="flights departing or arriving in a time window")
+            range_parser.add_argument("--field", choices=list(FLIGHT_RANGE_FIELDS), default="Departure Date/Time")
+            range_parser.add_argument("--from", dest="start", required=True, help="YYYY-MM-DD HH:MM:SS, YYYY-MM-DD, today or tomorrow")
+            range_parser.add_argument("--to", dest="end", required=True, help="end of the window. A date on its own includes that whole day")
+            range_parser.add_argument("--departure-id", type=int, help="only flights leaving this airport")
+            range_parser.add_argument("--format", choices=OUTPUT_FORMATS, default="table")
+            route_parser = actions.add_parser("route", help="earliest arrival or fewest flights between two airports")
+            route_parser.add_argument("--from-id", type=int, required=True, help="departure airport ID")
+            route_parser.add_argument("--to-id", type=int, required=True, help="arrival airport ID")
+            route_parser.add_argument("--after", required=True, help="leave at or after, YYYY-MM-DD HH:MM:SS, YYYY-MM-DD, today or tomorrow")
+            route_parser.add_argument("--by", help="land by. A date on its own includes that whole day")
+            route_parser.add_argument("--connection", type=int, default=MIN_CONNECTION_MINUTES, help="minimum minutes between flights")
+            route_parser.add_argument("--fewest-legs", action="store_true", help="fewest flights instead of earliest arrival")
+            route_parser.add_argument("--max-legs", type=int, default=MAX_ITINERARY_LEGS)
+            route_parser.add_argument("--format", choices=OUTPUT_FORMATS, default="table")
+            audit_parser = actions.add_parser("audit", help="find every pilot double-booking in the schedule")
+            audit_parser.add_argument("--turnaround", type=int, default=MIN_TURNAROUND_MINUTES, help="minimum minutes between flights")
+            audit_parser.add_argument("--format", choices=OUTPUT_FORMATS, default="table")
+            assign_parser = actions.add_parser("assign", help="pick pilots for a CSV or JSONL file of flights and add them")
+            assign_parser.add_argument("path", help=f"flights with the columns {', '.join(column for column, _field_label in ASSIGN_COLUMNS)}")
+            assign_parser.add_argument("--dry-run", action="store_true", help="show the assignments without adding the flights")
+            assign_parser.add_argument("--format", choices=OUTPUT_FORMATS, default="table")
+        show_parser = actions.add_parser("show", help=f"show one {table}")
+        show_parser.add_argument("--id", type=int, required=True)
+        show_parser.add_argument("--format", choices=OUTPUT_FORMATS, default="table")
+        add_parser = actions.add_parser("add", help=f"add a {table}")
+        add_parser.add_argument("values", nargs="+", metavar="COLUMN=VALUE")
+        update_parser = actions.add_parser("update", help=f"change one field of a {table}")
+        update_parser.add_argument("--id", type=int, required=True)
+        update_parser.add_argument("--field", required=True, choices=list(update_fields))
+        update_parser.add_argument("--value", required=True)
+        delete_parser = actions.add_parser("delete", help=f"delete a {table}")
+        delete_parser.add_argument("--id", type=int, required=True)
+    import_parser = commands.add_parser("import", help="bulk import a CSV or JSONL file")
+    if command in (None, "import"):
+        import_parser.add_argument("table", choices=list(IMPORT_TABLES))
+        import_parser.add_argument("path")
+    export_parser = commands.add_parser("export", help="write the flight schedule or pilot roster to a file")
+    if command in (None, "export"):
+        export_parser.add_argument("source", choices=list(EXPORT_SOURCES))
+        export_parser.add_argument("--format", choices=list(EXPORT_WRITERS), default="csv")
+        export_parser.add_argument("--out", required=True, help="file to write. Replaced only once the export is complete")
+        export_parser.add_argument("--incremental", action="store_true", help="only rows added or changed since this consumer's last export")
+        export_parser.add_argument("--consumer", default="default", help="name the last export position is kept under")
+        export_parser.add_argument("--chunk", type=int, default=EXPORT_CHUNK_SIZE, help="rows read, and rows per Parquet row group, at a time")
+    changes_parser = commands.add_parser("changes", help="read the log of flight, pilot and destination changes")
+    if command in (None, "changes"):
+        changes_actions = changes_parser.add_subparsers(dest="action", required=True)
+        read_parser = changes_actions.add_parser("read", help="changes after --after, or a consumer's unread changes, oldest first")
+        read_from = read_parser.add_mutually_exclusive_group(required=True)
+        read_from.add_argument("--after", type=int, help="sequence number to read after")
+        read_from.add_argument("--consumer", help="read from, and move on, this consumer's position")
+        read_parser.add_argument("--limit", type=int, default=CHANGES_BATCH_SIZE, help="most changes to read")
+        read_parser.add_argument("--peek", action="store_true", help="leave the consumer's position where it is")
+        read_parser.add_argument("--format", choices=OUTPUT_FORMATS, default="json")
+        changes_actions.add_parser("status", help="the latest and compacted sequence numbers, and each consumer's position")
+        compact_parser = changes_actions.add_parser("compact", help="delete the changes every consumer has read")
+        compact_parser.add_argument("--older-than-days", type=int, help="also delete changes older than this, read or not")
+        forget_parser = changes_actions.add_parser("forget", help="stop tracking a consumer")
+        forget_parser.add_argument("consumer")
+    backup_parser = commands.add_parser("backup", help="copy the database while it is in use, or take and restore snapshots")
+    if command in (None, "backup"):
+        backup_actions = backup_parser.add_subparsers(dest="action", required=True)
+        copy_parser = backup_actions.add_parser("copy", help="copy the database to a file")
+        copy_parser.add_argument("--out", required=True, help="file to write. Replaced only once the copy is complete")
+        snapshot_parser = backup_actions.add_parser("snapshot", help=f"copy the database into {BACKUP_DIR.name}/, keeping the newest --keep")
+        snapshot_parser.add_argument("--keep", type=int, default=SNAPSHOT_KEEP)
+        for step_parser in (copy_parser, snapshot_parser):
+            step_parser.add_argument("--pages", type=int, default=BACKUP_PAGES, help="pages copied per step, or -1 for all in one step")
+            step_parser.add_argument("--pause-ms", type=int, default=BACKUP_PAUSE_MS, help="pause after each step, when other connections can write")
+        backup_actions.add_parser("list", help="list the snapshots, newest first")
+        restore_parser = backup_actions.add_parser("restore", help="replace the database's contents with a snapshot's")
+        restore_parser.add_argument("name", help="snapshot file name, as listed")
+    partitions_parser = commands.add_parser("partitions", help="move older months of flights into their own database files")
+    if command in (None, "partitions"):
+        partitions_actions = partitions_parser.add_subparsers(dest="action", required=True)
+        split_parser = partitions_actions.add_parser("split", help="move every flight departing before --before into its month's partition")
+        split_parser.add_argument("--before", required=True, help="first month left in the database, YYYY-MM")
+        archive_parser = partitions_actions.add_parser("archive", help="detach and compress every partition before --before")
+        archive_parser.add_argument("--before", required=True, help="first month left attached, YYYY-MM")
+        partitions_restore_parser = partitions_actions.add_parser("restore", help="decompress an archived month and attach it again")
+        partitions_restore_parser.add_argument("month", help="YYYY-MM")
+        merge_parser = partitions_actions.add_parser("merge", help="move a month's flights back into the database and delete its partition")
+        merge_parser.add_argument("month", help="YYYY-MM")
+        partitions_actions.add_parser("list", help="list the partitions")
+    run_parser = commands.add_parser("run", help="run a file of commands, one per line, in a single transaction")
+    if command in (None, "run"):
+        run_parser.add_argument("script")
+    return parser
+
+# Runs one parsed command. Returns False if it did not succeed
+def run_command(args):
+    if args.command == "import":
+        counts = import_file(args.table, args.path)
+        return counts["rejected"] == 0
+    if args.command == "export":
+        counts = export_rows(args.source, args.format, args.out, incremental=args.incremental, consumer=args.consumer, chunk=args.chunk)
+        changed = f" changed since {counts['since']}" if counts["since"] is not None else ""
+        print(f"Exported {counts['rows']} {args.source}{changed} to {args.out}")
+        return True
+    if args.command == "changes":
+        if args.action == "read":
+            after = args.after if args.consumer is None else change_position(args.consumer)
+            changes = read_changes(after, args.limit)
+            write_rows(changes, args.format)
+            if args.consumer is not None and changes and not args.peek:
+                acknowledge_changes(args.consumer, changes[-1]["seq"])
+        elif args.action == "status":
+            position = run_statement("changelog_position.sql")[0]
+            print(f"Latest change {position['latest']}, compacted up to {position['trimmed']}")
+            print_results([{**dict(row), "Behind":position["latest"] - row["Position"]} for row in run_statement("change_consumers.sql")])
+        elif args.action == "compact":
+            upto, deleted = compact_changes(args.older_than_days)
+            print(f"Deleted {deleted} changes. Compacted up to {upto}")
+        else:
+            if not forget_change_consumer(args.consumer):
+                raise ValueError(f"No consumer named {args.consumer}.")
+        return True
+    if args.command == "backup":
+        flush_writes()
+        if args.action == "copy":
+            pages = backup_database(args.out, pages=args.pages, pause_ms=args.pause_ms)
+            print(f"Copied {pages} pages to {args.out}")
+        elif args.action == "snapshot":
+            path = snapshot_database(args.keep, pages=args.pages, pause_ms=args.pause_ms)
+            print(f"Took snapshot {path.name}")
+        elif args.action == "list":
+            print_results(list_snapshots())
+        else:
+            before = restore_snapshot(args.name)
+            print(f"Restored {args.name}. The data before the restore is in {before.name}")
+        return True
+    if args.command == "partitions":
+        if args.action == "split":
+            moved = split_partitions(args.before)
+            print_results(moved)
+            print(f"Moved {sum(row['Flights'] for row in moved)} flights into {len(moved)} partitions.")
+        elif args.action == "archive":
+            months = archive_partitions(args.before)
+            print(f"Archived {', '.join(months) if months else 'no partitions'}.")
+        elif args.action == "restore":
+            restore_partition(args.month)
+            print(f"Restored {args.month}.")
+        elif args.action == "merge":
+            flights = merge_partition(args.month)
+            print(f"Moved {flights} flights from {args.month} back into the database.")
+        else:
+            print_results(list_partitions())
+        return True
+    table, search, update, _search_fields, _update_fields = COMMAND_TABLES[args.command]
+    if args.action == "list":
+        write_rows(iter_pages(f"{table}_page.sql"), args.format)
+        return True
+    if args.action == "search" and args.where:
+        criteria = [(field_label, operator.lower(), split_criterion_value(operator.lower(), value)) for field_label, operator, value in args.where]
+        write_rows(compound_search(table, criteria, match="any" if args.any else "all"), args.format)
+        return True
+    if args.action == "search":
+        if args.field is None or args.value is None:
+            raise ValueError("search needs --field and --value, or one or more --where.")
+        write_rows(search(args.field, args.value, partial=args.partial), args.format)
+        return True
+    if args.action == "range":
+        write_rows(search_flight_range(args.start, args.end, field_label=args.field, departure_id=args.departure_id), args.format)
+        return True
+    if args.action == "route":
+        legs = find_itinerary(args.from_id, args.to_id, args.after, arrive_by=args.by, connection_minutes=args.connection,
+            fewest_legs=args.fewest_legs, max_legs=args.max_legs)
+        write_rows(legs, args.format)
+        return bool(legs)
+    if args.action == "audit":
+        conflicts = audit_schedule(args.turnaround)
+        write_rows(conflicts, args.format)
+        return not conflicts
+    if args.action == "hours":
+        write_rows(pilot_duty_totals(args.id, args.as_of), args.format)
+        return True
+    if args.action == "assign":
+        started = time.perf_counter()
+        plan = plan_assignments(args.path)
+        write_rows(plan, args.format)
+        print_assignment_summary(plan, time.perf_counter() - started, sys.stderr)
+        if not args.dry_run:
+            print(f"Added {save_assignments(plan)} flights.", file=sys.stderr)
+        return all(row["Pilot ID"] is not None for row in plan)
+    if args.action == "show":
+        write_rows(run_statement(f"{table}_id.sql", params=(args.id,)), args.format)
+        return True
+    if args.action == "add":
+        row = dict(value.split("=", 1) for value in args.values if "=" in value)
+        try:
+            record_id = add_record(table, row)
+        except ValueError as e:
+            print(e)
+            return False
+        except sqlite3.IntegrityError: # already reported by execute_alter_sql
+            return False
+        if record_id is None:
+            return False
+        print(f"Added {table} {record_id}.")
+        return True
+    if args.action == "update":
+        return update(args.id, args.field, args.value)
+    if args.action == "delete":
+        try:
+            deleted = delete_record(table, args.id)
+        except sqlite3.IntegrityError: # still referenced by another table
+            return False
+        if not deleted:
+            print(f"No {table} deleted, {table} ID not found")
+            return False
+        print(f"Deleted {table} {args.id}.")
+        return True
+    return False
+
+# Runs every command in a script file on one connection in one transaction. Any failure rolls the whole script back
+def run_script(path):
+    parser = build_parser()
+    WRITE_STATE["batch"] = True
+    try:
+        with open(path, encoding="utf-8") as f:
+            for line_number, line in enumerate(f, start=1):
+                line = line.strip()
+                if not line or line.startswith("#"):
+                    continue
+                try:
+                    args = parser.parse_args(shlex.split(line))
+                    if args.command in (None, "run"):
+                        raise ValueError("expected a table or import command")
+                    ok = run_command(args)
+                except SystemExit: # argparse exits on a bad line
+                    ok = False
+                except (ValueError, sqlite3.Error) as e:
+                    print(e)
+                    ok = False
+                if not ok:
+                    conn.rollback()
+                    end_write_transaction()
+                    invalidate_reference_data() # may hold rows the rollback has just undone
+                    invalidate_route_network()
+                    print(f"Script failed at line {line_number}: {line}")
+                    print("No changes were saved.")
+                    return False
+        conn.commit()
+        end_write_transaction()
+        return True
+    finally:
+        WRITE_STATE["batch"] = False
+
+# Entry point. Runs the interactive menu when no command is given
+def main(argv=None):
+    global DB_PATH
+    arguments = sys.argv[1:] if argv is None else argv
+    parser = build_parser(next((argument for argument in arguments if argument in COMMAND_NAMES), None))
+    args = parser.parse_args(arguments)
+    DB_PATH = args.db
+    if args.group_commit:
+        GROUP_COMMIT["writes"] = args.group_commit
+    if args.group_commit_ms:
+        GROUP_COMMIT["ms"] = args.group_commit_ms
+    if args.slow_ms is not None:
+        INSTRUMENTATION["slow_ms"] = args.slow_ms
+    if args.slow_log is not None:
+        INSTRUMENTATION["log"] = args.slow_log
+    if args.trace:
+        INSTRUMENTATION["trace"] = True
+    if args.progress_steps:
+        INSTRUMENTATION["progress_steps"] = args.progress_steps
+    if args.cache_entries is not None:
+        RESULT_CACHE["entries"] = args.cache_entries
+    if args.cache_ttl is not None:
+        RESULT_CACHE["ttl"] = args.cache_ttl
+    if args.command is None:
+        connect(profile=args.profile)
+        try:
+            run_menus()
+        finally:
+            flush_writes()
+        return
+    connect(verbose=False, profile=args.profile)
+    try:
+        if args.command == "run":
+            ok = run_script(args.script)
+        else:
+            try:
+                ok = run_command(args)
+            except ValueError as e:
+                print(e)
+                ok = False
+            flush_writes()
+    finally:
+        conn.close()
+        if args.stats:
+            print_results(statement_report(), "plain", out=sys.stderr)
+            print(f"Result cache: {json.dumps(result_cache_report())}", file=sys.stderr)
+    sys.exit(0 if ok else 1)
+
+if __name__ == "__main__":
+    try:
+        main()
+    except sqlite3.DatabaseError:
+        print("Database error detected")
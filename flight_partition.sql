@@ -0,0 +1,51 @@
+CREATE TABLE IF NOT EXISTS flight (
+    flight_id INTEGER PRIMARY KEY,
+    flight_number TEXT NOT NULL,
+    departure_id INTEGER NOT NULL,
+    arrival_id INTEGER NOT NULL,
+    pilot_id INTEGER NOT NULL,
+    departure_time_utc TEXT NOT NULL,   -- ISO 8601
+    arrival_time_utc TEXT NOT NULL,     -- ISO 8601
+    flight_duration_minutes INTEGER
+        GENERATED ALWAYS AS(
+            CAST((julianday(arrival_time_utc) - julianday(departure_time_utc)) * 1440 AS INTEGER)
+        ) STORED,
+    departure_epoch INTEGER
+        GENERATED ALWAYS AS (CAST(strftime('%s', departure_time_utc) AS INTEGER)) VIRTUAL,
+    arrival_epoch INTEGER
+        GENERATED ALWAYS AS (CAST(strftime('%s', arrival_time_utc) AS INTEGER)) VIRTUAL,
+    change_seq INTEGER NOT NULL DEFAULT 0
+);
+
+CREATE INDEX IF NOT EXISTS idx_flight_departure
+    ON flight (departure_id, departure_time_utc);
+
+CREATE INDEX IF NOT EXISTS idx_flight_arrival
+    ON flight (arrival_id, arrival_time_utc);
+
+CREATE INDEX IF NOT EXISTS idx_flight_pilot
+    ON flight (pilot_id, departure_time_utc, arrival_time_utc);
+
+CREATE INDEX IF NOT EXISTS idx_flight_departure_time
+    ON flight (departure_time_utc);
+
+CREATE INDEX IF NOT EXISTS idx_flight_arrival_time
+    ON flight (arrival_time_utc);
+
+CREATE INDEX IF NOT EXISTS idx_flight_number
+    ON flight (flight_number);
+
+CREATE INDEX IF NOT EXISTS idx_flight_departure_epoch
+    ON flight (departure_epoch);
+
+CREATE INDEX IF NOT EXISTS idx_flight_arrival_epoch
+    ON flight (arrival_epoch);
+
+CREATE INDEX IF NOT EXISTS idx_flight_departure_id_epoch
+    ON flight (departure_id, departure_epoch);
+
+CREATE INDEX IF NOT EXISTS idx_flight_pilot_epoch
+    ON flight (pilot_id, departure_epoch, arrival_epoch);
+
+CREATE INDEX IF NOT EXISTS idx_flight_change_seq
+    ON flight (change_seq);
@@ -0,0 +1,121 @@
+import argparse
+import http.client
+import json
+import random
+import threading
+import time
+from urllib.parse import urlencode, urlsplit
+
+# Requests each simulated client picks from, with their relative weights. Each is a function of the sampled IDs
+# that returns the method, path and body
+READ_MIX = [
+    ("flight page", 4, lambda s, rng: ("GET", "/flights", None)),
+    ("pilot page", 2, lambda s, rng: ("GET", "/pilots", None)),
+    ("show flight", 6, lambda s, rng: ("GET", f"/flights/{rng.choice(s['flights'])}", None)),
+    ("show pilot", 6, lambda s, rng: ("GET", f"/pilots/{rng.choice(s['pilots'])}", None)),
+    ("search pilot by partial name", 3, lambda s, rng: ("GET", "/pilots?" + urlencode({"field":"Name", "value":rng.choice(s["names"]), "partial":1}), None)),
+    ("search flights by pilot", 3, lambda s, rng: ("GET", "/flights?" + urlencode({"field":"Pilot ID", "value":rng.choice(s["pilots"])}), None)),
+    ("flight range one day", 3, lambda s, rng: ("GET", "/flights/range?" + urlencode({"from":s["day"], "to":s["day"]}), None)),
+    ("pilot hours", 2, lambda s, rng: ("GET", "/pilots/hours?" + urlencode({"id":rng.choice(s["pilots"]), "as_of":s["day"]}), None)),
+]
+
+# Sends one request on a kept-alive connection and returns the status and decoded body
+def send(connection, method, path, body=None):
+    data = json.dumps(body).encode("utf-8") if body is not None else None
+    headers = {"Content-Type":"application/json"} if data else {}
+    connection.request(method, path, body=data, headers=headers)
+    response = connection.getresponse()
+    payload = response.read()
+    return response.status, json.loads(payload) if payload else None
+
+# Collects IDs, name prefixes and a busy day from the first page of each listing to build requests from
+def sample_ids(host, port):
+    connection = http.client.HTTPConnection(host, port, timeout=30)
+    _status, flights = send(connection, "GET", "/flights")
+    _status, pilots = send(connection, "GET", "/pilots")
+    connection.close()
+    if not flights["rows"] or not pilots["rows"]:
+        raise SystemExit("The database needs at least one flight and one pilot to load test.")
+    return {
+        "flights":[row["Flight ID"] for row in flights["rows"]],
+        "pilots":[row["Pilot ID"] for row in pilots["rows"]],
+        "names":sorted({row["Name"].split()[0][:3] for row in pilots["rows"]}),
+        "day":str(flights["rows"][0]["Departure Time UTC"])[:10],
+    }
+
+# One simulated client: sends requests back to back on its own connection until the deadline.
+# With write_ratio above 0 that share of requests add a destination and delete it again
+def client(host, port, samples, deadline, write_ratio, seed, results, lock):
+    rng = random.Random(seed)
+    names = [name for name, _weight, _build in READ_MIX]
+    weights = [weight for _name, weight, _build in READ_MIX]
+    builds = {name: build for name, _weight, build in READ_MIX}
+    connection = http.client.HTTPConnection(host, port, timeout=60)
+    timings = {}
+    statuses = {}
+    while time.monotonic() < deadline:
+        write = rng.random() < write_ratio
+        name = "add and delete destination" if write else rng.choices(names, weights)[0]
+        started = time.perf_counter()
+        try:
+            if write:
+                status, body = send(connection, "POST", "/destinations", {"name":"Load Test Airport", "city":"Load Test", "country":"Nowhere", "timezone":"Z"})
+                if status == 201:
+                    status, _body = send(connection, "DELETE", f"/destinations/{body['id']}")
+            else:
+                status, _body = send(connection, *builds[name](samples, rng))
+        except (OSError, http.client.HTTPException):
+            connection.close()
+            connection = http.client.HTTPConnection(host, port, timeout=60)
+            status = "connection error"
+        timings.setdefault(name, []).append(time.perf_counter() - started)
+        statuses[status] = statuses.get(status, 0) + 1
+    connection.close()
+    with lock:
+        for name, durations in timings.items():
+            results["timings"].setdefault(name, []).extend(durations)
+        for status, count in statuses.items():
+            results["statuses"][str(status)] = results["statuses"].get(str(status), 0) + count
+
+# Returns the latency percentiles of a list of durations in ms
+def percentiles(durations):
+    ordered = sorted(durations)
+    pick = lambda fraction: round(ordered[min(len(ordered) - 1, int(len(ordered) * fraction))] * 1000, 2)
+    return {"requests":len(ordered), "p50_ms":pick(0.5), "p95_ms":pick(0.95), "p99_ms":pick(0.99), "max_ms":round(ordered[-1] * 1000, 2)}
+
+# Entry point. Prints a JSON summary: throughput, status counts and latency by request type
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="loadtest.py", description="Load test for server.py")
+    parser.add_argument("--url", default="http://127.0.0.1:8000")
+    parser.add_argument("--clients", type=int, default=100, help="concurrent clients, each on its own connection")
+    parser.add_argument("--seconds", type=float, default=10)
+    parser.add_argument("--write-ratio", type=float, default=0.0, help="share of requests that add and delete a destination")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args(argv)
+
+    url = urlsplit(args.url)
+    samples = sample_ids(url.hostname, url.port or 80)
+    results = {"timings":{}, "statuses":{}}
+    lock = threading.Lock()
+    deadline = time.monotonic() + args.seconds
+    threads = [threading.Thread(target=client, args=(url.hostname, url.port or 80, samples, deadline, args.write_ratio, args.seed + i, results, lock))
+        for i in range(args.clients)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+    total = sum(len(durations) for durations in results["timings"].values())
+    print(json.dumps({
+        "clients":args.clients,
+        "seconds":round(elapsed, 2),
+        "requests":total,
+        "requests_per_second":round(total / elapsed),
+        "statuses":results["statuses"],
+        "all":percentiles([d for durations in results["timings"].values() for d in durations]) if total else None,
+        "by_request":{name: percentiles(durations) for name, durations in sorted(results["timings"].items())},
+    }, indent=2))
+
+if __name__ == "__main__":
+    main()
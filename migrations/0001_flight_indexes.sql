@@ -0,0 +1,20 @@
+-- Indexes for the flight joins and the search_flight filters
+-- Each one leads with the filtered column and carries the departure or arrival time,
+-- so a search by airport or pilot comes back in schedule order without a sort.
+CREATE INDEX IF NOT EXISTS idx_flight_departure
+    ON flight (departure_id, departure_time_utc);
+
+CREATE INDEX IF NOT EXISTS idx_flight_arrival
+    ON flight (arrival_id, arrival_time_utc);
+
+CREATE INDEX IF NOT EXISTS idx_flight_pilot
+    ON flight (pilot_id, departure_time_utc, arrival_time_utc);
+
+CREATE INDEX IF NOT EXISTS idx_flight_departure_time
+    ON flight (departure_time_utc);
+
+CREATE INDEX IF NOT EXISTS idx_flight_arrival_time
+    ON flight (arrival_time_utc);
+
+CREATE INDEX IF NOT EXISTS idx_flight_number
+    ON flight (flight_number);
@@ -0,0 +1,26 @@
+-- Indexes for the pilot and destination search filters and foreign keys
+-- pilot.base_id and destination.timezone are also the child side of foreign keys,
+-- so these stop a delete from destination or timezone scanning the whole child table.
+CREATE INDEX IF NOT EXISTS idx_pilot_base
+    ON pilot (base_id);
+
+CREATE INDEX IF NOT EXISTS idx_pilot_rating
+    ON pilot (aircraft_rating);
+
+CREATE INDEX IF NOT EXISTS idx_pilot_name
+    ON pilot (name);
+
+CREATE INDEX IF NOT EXISTS idx_pilot_medical
+    ON pilot (last_medical_date);
+
+CREATE INDEX IF NOT EXISTS idx_destination_timezone
+    ON destination (timezone);
+
+CREATE INDEX IF NOT EXISTS idx_destination_country
+    ON destination (country, city);
+
+CREATE INDEX IF NOT EXISTS idx_destination_city
+    ON destination (city);
+
+CREATE INDEX IF NOT EXISTS idx_destination_name
+    ON destination (name);
@@ -0,0 +1,55 @@
+-- Full-text indexes for partial-match pilot and destination searches
+-- External content tables: the text lives only in pilot and destination, the index is kept in step by the triggers below.
+-- unicode61 with remove_diacritics 2 folds "Kraków" to "krakow" on both sides of the match,
+-- and splits on punctuation such as the dash in "Barcelona–El Prat".
+-- prefix='2 3' keeps extra index entries so short prefix queries do not scan the whole term list.
+CREATE VIRTUAL TABLE IF NOT EXISTS pilot_fts USING fts5(
+    name,
+    content='pilot',
+    content_rowid='pilot_id',
+    tokenize="unicode61 remove_diacritics 2",
+    prefix='2 3'
+);
+
+CREATE VIRTUAL TABLE IF NOT EXISTS destination_fts USING fts5(
+    name,
+    city,
+    country,
+    content='destination',
+    content_rowid='destination_id',
+    tokenize="unicode61 remove_diacritics 2",
+    prefix='2 3'
+);
+
+INSERT INTO pilot_fts (pilot_fts) VALUES ('rebuild');
+INSERT INTO destination_fts (destination_fts) VALUES ('rebuild');
+
+CREATE TRIGGER IF NOT EXISTS pilot_fts_insert AFTER INSERT ON pilot BEGIN
+    INSERT INTO pilot_fts (rowid, name) VALUES (new.pilot_id, new.name);
+END;
+
+CREATE TRIGGER IF NOT EXISTS pilot_fts_delete AFTER DELETE ON pilot BEGIN
+    INSERT INTO pilot_fts (pilot_fts, rowid, name) VALUES ('delete', old.pilot_id, old.name);
+END;
+
+CREATE TRIGGER IF NOT EXISTS pilot_fts_update AFTER UPDATE OF name ON pilot BEGIN
+    INSERT INTO pilot_fts (pilot_fts, rowid, name) VALUES ('delete', old.pilot_id, old.name);
+    INSERT INTO pilot_fts (rowid, name) VALUES (new.pilot_id, new.name);
+END;
+
+CREATE TRIGGER IF NOT EXISTS destination_fts_insert AFTER INSERT ON destination BEGIN
+    INSERT INTO destination_fts (rowid, name, city, country)
+    VALUES (new.destination_id, new.name, new.city, new.country);
+END;
+
+CREATE TRIGGER IF NOT EXISTS destination_fts_delete AFTER DELETE ON destination BEGIN
+    INSERT INTO destination_fts (destination_fts, rowid, name, city, country)
+    VALUES ('delete', old.destination_id, old.name, old.city, old.country);
+END;
+
+CREATE TRIGGER IF NOT EXISTS destination_fts_update AFTER UPDATE OF name, city, country ON destination BEGIN
+    INSERT INTO destination_fts (destination_fts, rowid, name, city, country)
+    VALUES ('delete', old.destination_id, old.name, old.city, old.country);
+    INSERT INTO destination_fts (rowid, name, city, country)
+    VALUES (new.destination_id, new.name, new.city, new.country);
+END;
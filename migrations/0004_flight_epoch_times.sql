@@ -0,0 +1,18 @@
+-- Integer epoch (seconds since 1970-01-01 UTC) forms of the departure and arrival times, for range searches
+-- Virtual generated columns: computed from the existing text columns, so every insert and update keeps them in step,
+-- and the indexes store the computed values so a time window is an index range scan.
+ALTER TABLE flight ADD COLUMN departure_epoch INTEGER
+    GENERATED ALWAYS AS (CAST(strftime('%s', departure_time_utc) AS INTEGER)) VIRTUAL;
+
+ALTER TABLE flight ADD COLUMN arrival_epoch INTEGER
+    GENERATED ALWAYS AS (CAST(strftime('%s', arrival_time_utc) AS INTEGER)) VIRTUAL;
+
+CREATE INDEX IF NOT EXISTS idx_flight_departure_epoch
+    ON flight (departure_epoch);
+
+CREATE INDEX IF NOT EXISTS idx_flight_arrival_epoch
+    ON flight (arrival_epoch);
+
+-- "all flights from destination X in a window"
+CREATE INDEX IF NOT EXISTS idx_flight_departure_id_epoch
+    ON flight (departure_id, departure_epoch);
@@ -0,0 +1,5 @@
+-- Per-pilot interval index for double-booking checks
+-- Ordered by departure within each pilot and carrying the arrival, so the flights either side of a new one
+-- are found with one index seek each, and the schedule audit reads every pilot's flights in order without sorting.
+CREATE INDEX IF NOT EXISTS idx_flight_pilot_epoch
+    ON flight (pilot_id, departure_epoch, arrival_epoch);
@@ -0,0 +1,55 @@
+-- Per-pilot, per-day block minutes and sector counts, kept current by triggers on flight
+-- Rolling 7, 28 and 365 day totals read at most 365 rows per pilot from here instead of scanning flight.
+-- A flight counts towards the UTC day it departs on.
+CREATE TABLE IF NOT EXISTS pilot_duty_day (
+    pilot_id INTEGER NOT NULL,
+    day TEXT NOT NULL,                  -- ISO 8601 date
+    minutes INTEGER NOT NULL DEFAULT 0,
+    sectors INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (pilot_id, day)
+) WITHOUT ROWID;
+
+INSERT INTO pilot_duty_day (pilot_id, day, minutes, sectors)
+SELECT pilot_id, date(departure_time_utc), SUM(COALESCE(flight_duration_minutes, 0)), COUNT(*)
+FROM flight
+WHERE date(departure_time_utc) IS NOT NULL
+GROUP BY pilot_id, date(departure_time_utc);
+
+CREATE TRIGGER IF NOT EXISTS pilot_duty_insert AFTER INSERT ON flight
+WHEN date(new.departure_time_utc) IS NOT NULL
+BEGIN
+    INSERT INTO pilot_duty_day (pilot_id, day, minutes, sectors)
+    VALUES (new.pilot_id, date(new.departure_time_utc), COALESCE(new.flight_duration_minutes, 0), 1)
+    ON CONFLICT (pilot_id, day) DO UPDATE
+    SET minutes = minutes + excluded.minutes, sectors = sectors + 1;
+END;
+
+CREATE TRIGGER IF NOT EXISTS pilot_duty_delete AFTER DELETE ON flight
+WHEN date(old.departure_time_utc) IS NOT NULL
+BEGIN
+    UPDATE pilot_duty_day
+    SET minutes = minutes - COALESCE(old.flight_duration_minutes, 0), sectors = sectors - 1
+    WHERE pilot_id = old.pilot_id AND day = date(old.departure_time_utc);
+    DELETE FROM pilot_duty_day
+    WHERE pilot_id = old.pilot_id AND day = date(old.departure_time_utc) AND sectors <= 0;
+END;
+
+-- An update is the old flight taken out and the new one put in. Split in two so each half keeps its own WHEN
+CREATE TRIGGER IF NOT EXISTS pilot_duty_update_old AFTER UPDATE OF pilot_id, departure_time_utc, arrival_time_utc ON flight
+WHEN date(old.departure_time_utc) IS NOT NULL
+BEGIN
+    UPDATE pilot_duty_day
+    SET minutes = minutes - COALESCE(old.flight_duration_minutes, 0), sectors = sectors - 1
+    WHERE pilot_id = old.pilot_id AND day = date(old.departure_time_utc);
+    DELETE FROM pilot_duty_day
+    WHERE pilot_id = old.pilot_id AND day = date(old.departure_time_utc) AND sectors <= 0;
+END;
+
+CREATE TRIGGER IF NOT EXISTS pilot_duty_update_new AFTER UPDATE OF pilot_id, departure_time_utc, arrival_time_utc ON flight
+WHEN date(new.departure_time_utc) IS NOT NULL
+BEGIN
+    INSERT INTO pilot_duty_day (pilot_id, day, minutes, sectors)
+    VALUES (new.pilot_id, date(new.departure_time_utc), COALESCE(new.flight_duration_minutes, 0), 1)
+    ON CONFLICT (pilot_id, day) DO UPDATE
+    SET minutes = minutes + excluded.minutes, sectors = sectors + 1;
+END;
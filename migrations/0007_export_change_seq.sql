@@ -0,0 +1,55 @@
+-- Change sequence numbers for incremental export
+-- change_counter holds the last number handed out. Triggers stamp each inserted or changed flight and pilot with
+-- the next one, so an export can ask for the rows changed after the number it saw last time.
+-- Rows that existed before this migration start at 0, so the first export of each source is a full one.
+CREATE TABLE IF NOT EXISTS change_counter (
+    id INTEGER PRIMARY KEY CHECK (id = 1),
+    seq INTEGER NOT NULL
+);
+
+INSERT OR IGNORE INTO change_counter (id, seq) VALUES (1, 0);
+
+-- The last change number each consumer of each export source has been sent
+CREATE TABLE IF NOT EXISTS export_state (
+    source TEXT NOT NULL,
+    consumer TEXT NOT NULL,
+    seq INTEGER NOT NULL,
+    exported_at TEXT NOT NULL,          -- ISO 8601
+    PRIMARY KEY (source, consumer)
+) WITHOUT ROWID;
+
+ALTER TABLE flight ADD COLUMN change_seq INTEGER NOT NULL DEFAULT 0;
+ALTER TABLE pilot ADD COLUMN change_seq INTEGER NOT NULL DEFAULT 0;
+
+CREATE INDEX IF NOT EXISTS idx_flight_change_seq
+    ON flight (change_seq);
+
+CREATE INDEX IF NOT EXISTS idx_pilot_change_seq
+    ON pilot (change_seq);
+
+-- The update triggers list every column except change_seq, so stamping a row does not fire them again
+CREATE TRIGGER IF NOT EXISTS flight_change_seq_insert AFTER INSERT ON flight
+BEGIN
+    UPDATE change_counter SET seq = seq + 1 WHERE id = 1;
+    UPDATE flight SET change_seq = (SELECT seq FROM change_counter WHERE id = 1) WHERE flight_id = new.flight_id;
+END;
+
+CREATE TRIGGER IF NOT EXISTS flight_change_seq_update
+AFTER UPDATE OF flight_number, departure_id, arrival_id, pilot_id, departure_time_utc, arrival_time_utc ON flight
+BEGIN
+    UPDATE change_counter SET seq = seq + 1 WHERE id = 1;
+    UPDATE flight SET change_seq = (SELECT seq FROM change_counter WHERE id = 1) WHERE flight_id = new.flight_id;
+END;
+
+CREATE TRIGGER IF NOT EXISTS pilot_change_seq_insert AFTER INSERT ON pilot
+BEGIN
+    UPDATE change_counter SET seq = seq + 1 WHERE id = 1;
+    UPDATE pilot SET change_seq = (SELECT seq FROM change_counter WHERE id = 1) WHERE pilot_id = new.pilot_id;
+END;
+
+CREATE TRIGGER IF NOT EXISTS pilot_change_seq_update
+AFTER UPDATE OF name, licence_number, aircraft_rating, base_id, last_medical_date ON pilot
+BEGIN
+    UPDATE change_counter SET seq = seq + 1 WHERE id = 1;
+    UPDATE pilot SET change_seq = (SELECT seq FROM change_counter WHERE id = 1) WHERE pilot_id = new.pilot_id;
+END;
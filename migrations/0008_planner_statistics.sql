@@ -0,0 +1,4 @@
+-- Gathers the planner statistics in sqlite_stat1: the rows in each table and the rows per value of each index.
+-- The query planner uses them to choose between indexes, and compound_search() to choose the criterion that drives it.
+-- Run ANALYZE again after a large import to bring them up to date.
+ANALYZE;
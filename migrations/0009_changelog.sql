@@ -0,0 +1,88 @@
+-- Change-data-capture log for flight, pilot and destination
+-- Triggers append one row for every insert, update and delete. seq is AUTOINCREMENT, so it keeps increasing even after
+-- compaction has deleted every row. row_data is the row's columns after the change as a JSON object, NULL for a delete.
+-- Consumers keep their position in export_state under the source "changes".
+CREATE TABLE IF NOT EXISTS changelog (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    table_name TEXT NOT NULL,
+    row_id INTEGER NOT NULL,
+    operation TEXT NOT NULL CHECK (operation IN ('insert', 'update', 'delete')),
+    changed_at INTEGER NOT NULL,        -- epoch seconds
+    row_data TEXT
+);
+
+-- The highest seq compaction has deleted up to. Reading from before it would miss changes
+CREATE TABLE IF NOT EXISTS changelog_trimmed (
+    id INTEGER PRIMARY KEY CHECK (id = 1),
+    seq INTEGER NOT NULL
+);
+
+INSERT OR IGNORE INTO changelog_trimmed (id, seq) VALUES (1, 0);
+
+-- The update triggers list every column except change_seq, so stamping a row's change_seq is not logged
+CREATE TRIGGER IF NOT EXISTS flight_changelog_insert AFTER INSERT ON flight
+BEGIN
+    INSERT INTO changelog (table_name, row_id, operation, changed_at, row_data)
+    VALUES ('flight', new.flight_id, 'insert', CAST(strftime('%s', 'now') AS INTEGER), json_object(
+        'flight_number', new.flight_number, 'departure_id', new.departure_id, 'arrival_id', new.arrival_id,
+        'pilot_id', new.pilot_id, 'departure_time_utc', new.departure_time_utc, 'arrival_time_utc', new.arrival_time_utc));
+END;
+
+CREATE TRIGGER IF NOT EXISTS flight_changelog_update
+AFTER UPDATE OF flight_number, departure_id, arrival_id, pilot_id, departure_time_utc, arrival_time_utc ON flight
+BEGIN
+    INSERT INTO changelog (table_name, row_id, operation, changed_at, row_data)
+    VALUES ('flight', new.flight_id, 'update', CAST(strftime('%s', 'now') AS INTEGER), json_object(
+        'flight_number', new.flight_number, 'departure_id', new.departure_id, 'arrival_id', new.arrival_id,
+        'pilot_id', new.pilot_id, 'departure_time_utc', new.departure_time_utc, 'arrival_time_utc', new.arrival_time_utc));
+END;
+
+CREATE TRIGGER IF NOT EXISTS flight_changelog_delete AFTER DELETE ON flight
+BEGIN
+    INSERT INTO changelog (table_name, row_id, operation, changed_at, row_data)
+    VALUES ('flight', old.flight_id, 'delete', CAST(strftime('%s', 'now') AS INTEGER), NULL);
+END;
+
+CREATE TRIGGER IF NOT EXISTS pilot_changelog_insert AFTER INSERT ON pilot
+BEGIN
+    INSERT INTO changelog (table_name, row_id, operation, changed_at, row_data)
+    VALUES ('pilot', new.pilot_id, 'insert', CAST(strftime('%s', 'now') AS INTEGER), json_object(
+        'name', new.name, 'licence_number', new.licence_number, 'aircraft_rating', new.aircraft_rating,
+        'base_id', new.base_id, 'last_medical_date', new.last_medical_date));
+END;
+
+CREATE TRIGGER IF NOT EXISTS pilot_changelog_update
+AFTER UPDATE OF name, licence_number, aircraft_rating, base_id, last_medical_date ON pilot
+BEGIN
+    INSERT INTO changelog (table_name, row_id, operation, changed_at, row_data)
+    VALUES ('pilot', new.pilot_id, 'update', CAST(strftime('%s', 'now') AS INTEGER), json_object(
+        'name', new.name, 'licence_number', new.licence_number, 'aircraft_rating', new.aircraft_rating,
+        'base_id', new.base_id, 'last_medical_date', new.last_medical_date));
+END;
+
+CREATE TRIGGER IF NOT EXISTS pilot_changelog_delete AFTER DELETE ON pilot
+BEGIN
+    INSERT INTO changelog (table_name, row_id, operation, changed_at, row_data)
+    VALUES ('pilot', old.pilot_id, 'delete', CAST(strftime('%s', 'now') AS INTEGER), NULL);
+END;
+
+CREATE TRIGGER IF NOT EXISTS destination_changelog_insert AFTER INSERT ON destination
+BEGIN
+    INSERT INTO changelog (table_name, row_id, operation, changed_at, row_data)
+    VALUES ('destination', new.destination_id, 'insert', CAST(strftime('%s', 'now') AS INTEGER), json_object(
+        'name', new.name, 'city', new.city, 'country', new.country, 'timezone', new.timezone));
+END;
+
+CREATE TRIGGER IF NOT EXISTS destination_changelog_update
+AFTER UPDATE OF name, city, country, timezone ON destination
+BEGIN
+    INSERT INTO changelog (table_name, row_id, operation, changed_at, row_data)
+    VALUES ('destination', new.destination_id, 'update', CAST(strftime('%s', 'now') AS INTEGER), json_object(
+        'name', new.name, 'city', new.city, 'country', new.country, 'timezone', new.timezone));
+END;
+
+CREATE TRIGGER IF NOT EXISTS destination_changelog_delete AFTER DELETE ON destination
+BEGIN
+    INSERT INTO changelog (table_name, row_id, operation, changed_at, row_data)
+    VALUES ('destination', old.destination_id, 'delete', CAST(strftime('%s', 'now') AS INTEGER), NULL);
+END;
@@ -0,0 +1,72 @@
+-- Monthly flight partitions: older months moved out of flight into their own database files, attached as flight_YYYY_MM
+-- and read through a temporary UNION ALL view named flight (see attach_partitions() in cli.py). The departure and
+-- arrival bounds let a time range search skip the months it cannot match.
+-- An archived month is detached and compressed, and is not in the view until it is restored.
+CREATE TABLE IF NOT EXISTS flight_partition (
+    month TEXT PRIMARY KEY,             -- YYYY-MM, UTC month of departure
+    flights INTEGER NOT NULL,
+    departure_min INTEGER,              -- epoch seconds
+    departure_max INTEGER,
+    arrival_min INTEGER,
+    arrival_max INTEGER,
+    state TEXT NOT NULL CHECK (state IN ('attached', 'archived'))
+) WITHOUT ROWID;
+
+-- Set to 1 while flights are moved between flight and a partition. The flight triggers skip moved rows, so a move
+-- leaves the duty totals, change_seq and the changelog as they were
+CREATE TABLE IF NOT EXISTS flight_move (
+    id INTEGER PRIMARY KEY CHECK (id = 1),
+    active INTEGER NOT NULL
+);
+
+INSERT OR IGNORE INTO flight_move (id, active) VALUES (1, 0);
+
+DROP TRIGGER IF EXISTS pilot_duty_insert;
+DROP TRIGGER IF EXISTS pilot_duty_delete;
+DROP TRIGGER IF EXISTS flight_change_seq_insert;
+DROP TRIGGER IF EXISTS flight_changelog_insert;
+DROP TRIGGER IF EXISTS flight_changelog_delete;
+
+CREATE TRIGGER IF NOT EXISTS pilot_duty_insert AFTER INSERT ON flight
+WHEN date(new.departure_time_utc) IS NOT NULL
+AND (SELECT active FROM flight_move WHERE id = 1) = 0
+BEGIN
+    INSERT INTO pilot_duty_day (pilot_id, day, minutes, sectors)
+    VALUES (new.pilot_id, date(new.departure_time_utc), COALESCE(new.flight_duration_minutes, 0), 1)
+    ON CONFLICT (pilot_id, day) DO UPDATE
+    SET minutes = minutes + excluded.minutes, sectors = sectors + 1;
+END;
+
+CREATE TRIGGER IF NOT EXISTS pilot_duty_delete AFTER DELETE ON flight
+WHEN date(old.departure_time_utc) IS NOT NULL
+AND (SELECT active FROM flight_move WHERE id = 1) = 0
+BEGIN
+    UPDATE pilot_duty_day
+    SET minutes = minutes - COALESCE(old.flight_duration_minutes, 0), sectors = sectors - 1
+    WHERE pilot_id = old.pilot_id AND day = date(old.departure_time_utc);
+    DELETE FROM pilot_duty_day
+    WHERE pilot_id = old.pilot_id AND day = date(old.departure_time_utc) AND sectors <= 0;
+END;
+
+CREATE TRIGGER IF NOT EXISTS flight_change_seq_insert AFTER INSERT ON flight
+WHEN (SELECT active FROM flight_move WHERE id = 1) = 0
+BEGIN
+    UPDATE change_counter SET seq = seq + 1 WHERE id = 1;
+    UPDATE flight SET change_seq = (SELECT seq FROM change_counter WHERE id = 1) WHERE flight_id = new.flight_id;
+END;
+
+CREATE TRIGGER IF NOT EXISTS flight_changelog_insert AFTER INSERT ON flight
+WHEN (SELECT active FROM flight_move WHERE id = 1) = 0
+BEGIN
+    INSERT INTO changelog (table_name, row_id, operation, changed_at, row_data)
+    VALUES ('flight', new.flight_id, 'insert', CAST(strftime('%s', 'now') AS INTEGER), json_object(
+        'flight_number', new.flight_number, 'departure_id', new.departure_id, 'arrival_id', new.arrival_id,
+        'pilot_id', new.pilot_id, 'departure_time_utc', new.departure_time_utc, 'arrival_time_utc', new.arrival_time_utc));
+END;
+
+CREATE TRIGGER IF NOT EXISTS flight_changelog_delete AFTER DELETE ON flight
+WHEN (SELECT active FROM flight_move WHERE id = 1) = 0
+BEGIN
+    INSERT INTO changelog (table_name, row_id, operation, changed_at, row_data)
+    VALUES ('flight', old.flight_id, 'delete', CAST(strftime('%s', 'now') AS INTEGER), NULL);
+END;
@@ -0,0 +1,6 @@
+-- The fingerprint of the statements last checked against this database by connect() in cli.py. They are only
+-- checked again when a statement file, the schema, the attached partitions or the sqlite version change
+CREATE TABLE IF NOT EXISTS statement_check (
+    id INTEGER PRIMARY KEY CHECK (id = 1),
+    fingerprint TEXT NOT NULL
+);
@@ -0,0 +1,24 @@
+-- The longest sector in the schedule, in seconds. An earlier flight can only still be in the air, or turning round,
+-- at a departure if it left less than this (plus the turnaround) before, so the double-booking check reads the
+-- pilot's flights in that window with one index range on idx_flight_pilot_epoch rather than every earlier flight.
+-- It only ever grows, so it stays an upper bound after deletes and changes.
+-- Months already moved into partitions when this runs are not counted, as they are not attached yet
+CREATE TABLE IF NOT EXISTS flight_longest (
+    id INTEGER PRIMARY KEY CHECK (id = 1),
+    seconds INTEGER NOT NULL
+);
+
+INSERT OR IGNORE INTO flight_longest (id, seconds)
+SELECT 1, COALESCE(MAX(arrival_epoch - departure_epoch), 0) FROM main.flight;
+
+CREATE TRIGGER IF NOT EXISTS flight_longest_insert AFTER INSERT ON flight
+WHEN new.arrival_epoch - new.departure_epoch > (SELECT seconds FROM flight_longest WHERE id = 1)
+BEGIN
+    UPDATE flight_longest SET seconds = new.arrival_epoch - new.departure_epoch WHERE id = 1;
+END;
+
+CREATE TRIGGER IF NOT EXISTS flight_longest_update AFTER UPDATE OF departure_time_utc, arrival_time_utc ON flight
+WHEN new.arrival_epoch - new.departure_epoch > (SELECT seconds FROM flight_longest WHERE id = 1)
+BEGIN
+    UPDATE flight_longest SET seconds = new.arrival_epoch - new.departure_epoch WHERE id = 1;
+END;
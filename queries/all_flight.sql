@@ -8,4 +8,5 @@ printf('%d:%02d', flight.flight_duration_minutes / 60, flight.flight_duration_mi
 FROM flight
 JOIN destination AS dep ON flight.departure_id = dep.destination_id
 JOIN destination AS arr ON flight.arrival_id = arr.destination_id
+$where_clause
 ORDER BY flight.flight_id ASC;
@@ -0,0 +1,4 @@
+SELECT pilot_id, departure_id, arrival_id, departure_epoch, arrival_epoch
+FROM flight
+WHERE departure_epoch BETWEEN :start AND :end
+ORDER BY departure_epoch;
@@ -0,0 +1,4 @@
+SELECT pilot_id, aircraft_rating, base_id, last_medical_date
+FROM pilot
+WHERE aircraft_rating IS NOT NULL
+ORDER BY pilot_id;
@@ -0,0 +1,2 @@
+SELECT name
+FROM pragma_database_list;
@@ -0,0 +1,6 @@
+SELECT consumer AS "Consumer",
+seq AS "Position",
+exported_at AS "Acknowledged At"
+FROM export_state
+WHERE source = 'changes'
+ORDER BY consumer;
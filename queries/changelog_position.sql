@@ -0,0 +1,2 @@
+SELECT (SELECT seq FROM changelog_trimmed WHERE id = 1) AS trimmed,
+COALESCE((SELECT seq FROM sqlite_sequence WHERE name = 'changelog'), 0) AS latest;
@@ -0,0 +1,5 @@
+SELECT seq, table_name, row_id, operation, changed_at, row_data
+FROM changelog
+WHERE seq > ?
+ORDER BY seq
+LIMIT ?;
@@ -0,0 +1,5 @@
+SELECT seq
+FROM changelog
+WHERE changed_at >= ?
+ORDER BY seq
+LIMIT 1;
@@ -0,0 +1,10 @@
+SELECT destination.destination_id AS "Destination ID", 
+destination.name AS "Airport Name",
+destination.city AS "City",
+destination.country AS "Country",
+timezone.acronym AS "Timezone"
+FROM destination_fts
+JOIN destination ON destination.destination_id = destination_fts.rowid
+JOIN timezone ON destination.timezone = timezone.code
+WHERE destination_fts MATCH ?
+ORDER BY bm25(destination_fts), destination.destination_id;
@@ -0,0 +1 @@
+SELECT seq FROM export_state WHERE source = ? AND consumer = ?;
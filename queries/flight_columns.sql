@@ -0,0 +1,3 @@
+SELECT name, hidden
+FROM pragma_table_xinfo('flight', 'main')
+ORDER BY cid;
@@ -0,0 +1,6 @@
+SELECT strftime('%Y-%m', departure_epoch, 'unixepoch') AS month,
+COUNT(*) AS flights
+FROM main.flight
+WHERE departure_epoch < ?
+GROUP BY month
+ORDER BY month;
@@ -0,0 +1,11 @@
+SELECT flight.flight_id AS "Flight ID",
+flight.flight_number AS "Flight Number", 
+flight.departure_id AS "Departure Airport", 
+flight.arrival_id AS "Arrival Airport", 
+flight.departure_time_utc AS "Departure Time UTC", 
+flight.arrival_time_utc AS "Arrival Time UTC", 
+printf('%d:%02d', flight.flight_duration_minutes / 60, flight.flight_duration_minutes % 60) AS "Flight Duration"
+FROM flight
+$where_clause
+ORDER BY flight.flight_id ASC
+LIMIT :limit;
@@ -0,0 +1,3 @@
+SELECT month, flights, departure_min, departure_max, arrival_min, arrival_max, state
+FROM flight_partition
+ORDER BY month;
@@ -0,0 +1,3 @@
+SELECT pilot_id, departure_time_utc, arrival_time_utc
+FROM flight
+WHERE flight_id = ?;
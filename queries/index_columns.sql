@@ -0,0 +1,11 @@
+SELECT index_list.name AS index_name,
+index_list."unique" AS is_unique,
+index_info.name AS column_name
+FROM pragma_index_list(:table, 'main') AS index_list
+JOIN pragma_index_info(index_list.name, 'main') AS index_info
+WHERE index_info.seqno = 0
+UNION ALL
+SELECT NULL, 1, table_info.name
+FROM pragma_table_info(:table, 'main') AS table_info
+WHERE table_info.pk = 1
+AND table_info.type = 'INTEGER';
@@ -0,0 +1,3 @@
+SELECT idx, stat
+FROM sqlite_stat1
+WHERE tbl = ?;
@@ -0,0 +1,6 @@
+SELECT COUNT(*) AS flights,
+MIN(departure_epoch) AS departure_min,
+MAX(departure_epoch) AS departure_max,
+MIN(arrival_epoch) AS arrival_min,
+MAX(arrival_epoch) AS arrival_max
+FROM $schema.flight;
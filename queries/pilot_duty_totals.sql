@@ -0,0 +1,16 @@
+SELECT pilot.pilot_id AS "Pilot ID",
+pilot.name AS "Name",
+COALESCE(SUM(CASE WHEN duty.day > date(:as_of, '-7 days') THEN duty.minutes END), 0) AS "Minutes 7d",
+COALESCE(SUM(CASE WHEN duty.day > date(:as_of, '-7 days') THEN duty.sectors END), 0) AS "Sectors 7d",
+COALESCE(SUM(CASE WHEN duty.day > date(:as_of, '-28 days') THEN duty.minutes END), 0) AS "Minutes 28d",
+COALESCE(SUM(CASE WHEN duty.day > date(:as_of, '-28 days') THEN duty.sectors END), 0) AS "Sectors 28d",
+COALESCE(SUM(duty.minutes), 0) AS "Minutes 365d",
+COALESCE(SUM(duty.sectors), 0) AS "Sectors 365d"
+FROM pilot
+LEFT JOIN pilot_duty_day AS duty
+    ON duty.pilot_id = pilot.pilot_id
+    AND duty.day > date(:as_of, '-365 days')
+    AND duty.day <= :as_of
+$where_clause
+GROUP BY pilot.pilot_id
+ORDER BY pilot.pilot_id ASC;
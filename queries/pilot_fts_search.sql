@@ -0,0 +1,12 @@
+SELECT pilot.pilot_id AS "Pilot ID",
+pilot.name AS "Name",
+pilot.licence_number AS "Licence Number",
+destination.name AS "Base Airport",
+rating.rating_name AS "Aircraft Rating",
+pilot.last_medical_date AS "Last Medical"
+FROM pilot_fts
+JOIN pilot ON pilot.pilot_id = pilot_fts.rowid
+JOIN destination ON pilot.base_id = destination.destination_id
+JOIN rating ON pilot.aircraft_rating = rating.rating_code
+WHERE pilot_fts MATCH ?
+ORDER BY bm25(pilot_fts), pilot.pilot_id;
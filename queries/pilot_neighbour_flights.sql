@@ -0,0 +1,18 @@
+SELECT * FROM (
+    SELECT flight_id, flight_number, departure_epoch, arrival_epoch
+    FROM flight
+    WHERE pilot_id = :pilot_id
+    AND flight_id != :flight_id
+    AND departure_epoch <= :departure
+    AND departure_epoch >= :departure - (SELECT seconds FROM flight_longest WHERE id = 1) - :turnaround
+    ORDER BY arrival_epoch DESC
+    LIMIT 1)
+UNION ALL
+SELECT * FROM (
+    SELECT flight_id, flight_number, departure_epoch, arrival_epoch
+    FROM flight
+    WHERE pilot_id = :pilot_id
+    AND flight_id != :flight_id
+    AND departure_epoch > :departure
+    ORDER BY departure_epoch ASC
+    LIMIT 1);
@@ -0,0 +1,6 @@
+SELECT departure_id, arrival_id, departure_epoch, arrival_epoch
+FROM flight
+WHERE pilot_id = :pilot_id
+AND departure_epoch < :before
+ORDER BY departure_epoch DESC
+LIMIT :limit;
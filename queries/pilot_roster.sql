@@ -7,4 +7,5 @@ last_medical_date AS "Last Medical"
 FROM pilot
 JOIN destination ON pilot.base_id = destination.destination_id
 JOIN rating ON pilot.aircraft_rating = rating.rating_code
+$where_clause
 ORDER BY pilot.pilot_id ASC;
\ No newline at end of file
@@ -0,0 +1,4 @@
+SELECT pilot_id, flight_id, departure_epoch, arrival_epoch
+FROM $flight_source
+WHERE pilot_id IS NOT NULL
+ORDER BY pilot_id, departure_epoch, arrival_epoch;
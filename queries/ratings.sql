@@ -0,0 +1,5 @@
+SELECT rating_code AS "Rating Code",
+rating_name AS "Rating",
+aircraft AS "Aircraft"
+FROM rating
+ORDER BY rating_code ASC;
@@ -0,0 +1,3 @@
+SELECT flight_id, departure_id, arrival_id, departure_epoch, arrival_epoch
+FROM flight
+WHERE flight_id = ?;
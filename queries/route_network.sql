@@ -0,0 +1,5 @@
+SELECT flight_id, departure_id, arrival_id, departure_epoch, arrival_epoch
+FROM flight
+WHERE departure_epoch IS NOT NULL
+AND arrival_epoch IS NOT NULL
+ORDER BY departure_id, arrival_id, departure_epoch;
@@ -0,0 +1 @@
+PRAGMA schema_version;
@@ -0,0 +1,3 @@
+SELECT fingerprint
+FROM statement_check
+WHERE id = 1;
@@ -0,0 +1,250 @@
+import argparse
+import io
+import json
+import queue
+import signal
+import sqlite3
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager, redirect_stdout
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import parse_qs, urlsplit
+
+import cli
+
+# Settings for the pooled read-only connections. query_only is a second guard on top of opening them read-only
+READER_PRAGMAS = {
+    "query_only":"ON",
+    "busy_timeout":5000, # waits out a checkpoint instead of failing
+    "cache_size":-16384, # 16 MiB page cache each (negative values are KiB)
+    "mmap_size":268435456,
+    "temp_store":"MEMORY",
+}
+
+# Seconds a request waits for a pooled connection before the service answers 503
+READER_TIMEOUT = 10
+
+# Read-only connections, each lent to one request at a time by reading(). Filled by open_readers()
+READERS = queue.Queue()
+
+# The one thread that owns cli.py's read-write connection. Every write is queued to it, so writes never overlap
+WRITER = ThreadPoolExecutor(max_workers=1, thread_name_prefix="writer")
+
+# Opens cli.py's read-write connection. Run on the writer thread, which then owns it
+def open_writer(path, profile):
+    cli.DB_PATH = str(path)
+    cli.connect(verbose=False, profile=profile)
+
+# Opens the pool of read-only connections, each with the partitions attached. The writer must have opened the database
+# first, so the schema is current. Partitions split or archived later are seen after a restart
+def open_readers(path, size):
+    uri = f"{Path(path).resolve().as_uri()}?mode=ro"
+    for _ in range(size):
+        conn = sqlite3.connect(uri, uri=True, check_same_thread=False) # used by one thread at a time, handed over through READERS
+        conn.row_factory = sqlite3.Row
+        cli.THREAD_STATE.cursor = conn.cursor()
+        cli.attach_partitions(read_only=True) # the writer's flight view, made before query_only stops it being created
+        cli.THREAD_STATE.cursor = None
+        for pragma, value in READER_PRAGMAS.items():
+            conn.execute(f"PRAGMA {pragma} = {value}")
+        cli.instrument_connection(conn)
+        READERS.put(conn)
+
+# Closes every pooled connection, then the writer's connection on its own thread
+def close_database():
+    while not READERS.empty():
+        READERS.get_nowait().close()
+    WRITER.submit(cli.flush_writes).result()
+    WRITER.submit(cli.conn.close).result()
+
+# Lends the calling thread a pooled connection. cli.py's queries run on it until the block ends.
+# Raises queue.Empty if none comes free within READER_TIMEOUT
+@contextmanager
+def reading():
+    conn = READERS.get(timeout=READER_TIMEOUT)
+    cli.THREAD_STATE.cursor = conn.cursor()
+    try:
+        yield
+    finally:
+        cli.THREAD_STATE.cursor = None
+        READERS.put(conn)
+
+# Runs a cli.py function on the writer thread and waits for it. Returns its result and what it printed, which is
+# how the update functions report why a change was refused. stdout is process wide, so a reader's error print
+# made at the same moment can end up in the message too
+def write(call, *args):
+    def run():
+        with redirect_stdout(io.StringIO()) as out:
+            result = call(*args)
+        return result, out.getvalue().strip()
+    return WRITER.submit(run).result()
+
+# Runs a cli.py read on a pooled connection and returns its rows as dicts
+def read_rows(call, *args, **kwargs):
+    with reading():
+        return [dict(row) for row in call(*args, **kwargs)]
+
+# Returns one query string value, or default when it is missing
+def query_value(query, name, default=None):
+    return query.get(name, [default])[0]
+
+# Returns an integer query string or body value. Raises ValueError with the name if it is not a number
+def int_value(value, name):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"{name} must be a number.") from None
+
+# Handles a GET. Listings come a page at a time: pass the "next" key of one page as after= to get the next.
+# where=FIELD:OPERATOR:VALUE, repeated, runs a compound search, with match=any to need only one of them
+def handle_get(table, search, record_id, query):
+    if record_id == "range" and table == "flight":
+        departure_id = query_value(query, "departure_id")
+        return 200, read_rows(cli.search_flight_range, query_value(query, "from", ""), query_value(query, "to", ""),
+            field_label=query_value(query, "field", "Departure Date/Time"),
+            departure_id=int_value(departure_id, "departure_id") if departure_id else None)
+    if record_id == "audit" and table == "flight":
+        turnaround = int_value(query_value(query, "turnaround", cli.MIN_TURNAROUND_MINUTES), "turnaround")
+        return 200, read_rows(cli.audit_schedule, turnaround)
+    if record_id == "route" and table == "flight":
+        arrive_by = query_value(query, "by")
+        with reading():
+            return 200, cli.find_itinerary(int_value(query_value(query, "from_id"), "from_id"), int_value(query_value(query, "to_id"), "to_id"),
+                query_value(query, "after", ""), arrive_by=arrive_by,
+                connection_minutes=int_value(query_value(query, "connection", cli.MIN_CONNECTION_MINUTES), "connection"),
+                fewest_legs=query_value(query, "fewest_legs") in ("1", "true", "yes"),
+                max_legs=int_value(query_value(query, "max_legs", cli.MAX_ITINERARY_LEGS), "max_legs"))
+    if record_id == "hours" and table == "pilot":
+        pilot_id = query_value(query, "id")
+        return 200, read_rows(cli.pilot_duty_totals, int_value(pilot_id, "id") if pilot_id else None, query_value(query, "as_of"))
+    if record_id is not None:
+        rows = read_rows(cli.run_statement, f"{table}_id.sql", params=(int_value(record_id, "ID"),))
+        return (200, rows[0]) if rows else (404, {"error":f"No {table} with ID {record_id}."})
+    if "where" in query:
+        criteria = []
+        for criterion in query["where"]:
+            field_label, _, rest = criterion.partition(":")
+            operator, _, value = rest.partition(":")
+            criteria.append((field_label, operator.lower(), cli.split_criterion_value(operator.lower(), value)))
+        return 200, read_rows(cli.compound_search, table, criteria, match="any" if query_value(query, "match") == "any" else "all")
+    if "field" in query:
+        return 200, read_rows(search, query_value(query, "field"), query_value(query, "value", ""), partial=query_value(query, "partial") in ("1", "true", "yes"))
+    with reading():
+        rows, more = cli.fetch_page(f"{table}_page.sql", int_value(query_value(query, "after", 0), "after"))
+        rows = [dict(row) for row in rows]
+    return 200, {"rows":rows, "next":cli.page_key(rows[-1]) if more else None}
+
+# Handles a POST (add), PATCH (update one field) or DELETE on the writer thread
+def handle_write(method, table, update, record_id, body):
+    if method == "POST" and record_id is None:
+        if not isinstance(body, dict):
+            raise ValueError("Expected a JSON object of column values.")
+        new_id, message = write(cli.add_record, table, body)
+        if new_id is None:
+            return 409, {"error":message or f"{table} not added."} # the pilot would be double-booked
+        return 201, {"id":new_id}
+    if record_id is None:
+        return 405, {"error":f"{method} needs a {table} ID."}
+    record_id = int_value(record_id, "ID")
+    if method == "PATCH":
+        if not isinstance(body, dict) or "field" not in body or "value" not in body:
+            raise ValueError('Expected {"field": ..., "value": ...}.')
+        updated, message = write(update, record_id, body["field"], body["value"])
+        return (200, {"message":message}) if updated else (409, {"error":message})
+    if method == "DELETE":
+        deleted, _message = write(cli.delete_record, table, record_id)
+        return (200, {"id":record_id}) if deleted else (404, {"error":f"No {table} with ID {record_id}."})
+    return 405, {"error":f"{method} is not supported."}
+
+# Routes a request to the handlers: /<table>[/<id>], where table is a cli.py command table name. Returns the status and
+# the JSON body. /stats returns the query instrumentation and result cache totals, and how many pooled connections
+# are free.
+# /changes?after=N returns a batch of the changelog after N, with the seq to pass as after= for the next batch
+def handle_request(method, path, query, body):
+    parts = [part for part in path.split("/") if part]
+    if method == "GET" and parts == ["stats"]:
+        return 200, {"readers_free":READERS.qsize(), "result_cache":cli.result_cache_report(), "statements":cli.statement_report()}
+    if method == "GET" and parts == ["changes"]:
+        with reading():
+            changes = cli.read_changes(int_value(query_value(query, "after", 0), "after"),
+                min(int_value(query_value(query, "limit", cli.CHANGES_BATCH_SIZE), "limit"), cli.CHANGES_BATCH_SIZE))
+        return 200, {"changes":changes, "next":changes[-1]["seq"] if changes else None}
+    if not parts or len(parts) > 2 or parts[0] not in cli.COMMAND_TABLES:
+        return 404, {"error":f"Unknown path {path}. Use /{{{'|'.join(cli.COMMAND_TABLES)}}}[/id]."}
+    table, search, update, _search_fields, _update_fields = cli.COMMAND_TABLES[parts[0]]
+    record_id = parts[1] if len(parts) == 2 else None
+    if method == "GET":
+        return handle_get(table, search, record_id, query)
+    return handle_write(method, table, update, record_id, body)
+
+class RequestHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1" # keeps connections open between requests
+    quiet = True
+
+    # Reads the request, runs it and writes the JSON response. Errors are mapped to status codes
+    def dispatch(self):
+        url = urlsplit(self.path)
+        try:
+            length = int(self.headers.get("Content-Length") or 0)
+            body = json.loads(self.rfile.read(length)) if length else None
+            status, payload = handle_request(self.command, url.path, parse_qs(url.query), body)
+        except json.JSONDecodeError as e:
+            status, payload = 400, {"error":f"Request body is not JSON: {e}"}
+        except ValueError as e:
+            status, payload = 400, {"error":str(e)}
+        except sqlite3.IntegrityError as e:
+            status, payload = 409, {"error":str(e)}
+        except queue.Empty:
+            status, payload = 503, {"error":"Every database connection is busy, try again."}
+        except sqlite3.Error as e:
+            status, payload = 500, {"error":str(e)}
+        data = json.dumps(payload, default=str).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    do_GET = do_POST = do_PATCH = do_DELETE = dispatch
+
+    def log_message(self, format, *args):
+        if not self.quiet:
+            super().log_message(format, *args)
+
+class FlightServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 512 # connections the OS holds while every thread is busy
+
+    # Clients that hang up mid-request are routine under load, so only other errors are printed
+    def handle_error(self, request, client_address):
+        if not isinstance(sys.exc_info()[1], (ConnectionResetError, BrokenPipeError)):
+            super().handle_error(request, client_address)
+
+# Entry point. Serves until interrupted, then commits any pending writes
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="server.py", description="HTTP/JSON service for the flight management database")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--readers", type=int, default=8, help="pooled read-only connections")
+    parser.add_argument("--db", default=cli.DB_PATH, help="database file")
+    parser.add_argument("--profile", choices=list(cli.CONNECTION_PROFILES), default="tuned", help="connection settings for the writer. tuned (WAL) lets readers run during writes")
+    parser.add_argument("--log", action="store_true", help="log every request to stderr")
+    args = parser.parse_args(argv)
+
+    WRITER.submit(open_writer, args.db, args.profile).result()
+    open_readers(args.db, args.readers)
+    RequestHandler.quiet = not args.log
+    server = FlightServer((args.host, args.port), RequestHandler)
+    signal.signal(signal.SIGTERM, lambda _signum, _frame: sys.exit(0)) # stops cleanly when killed, as on Ctrl+C
+    print(f"Serving {args.db} on http://{args.host}:{server.server_port} with {args.readers} readers", file=sys.stderr)
+    try:
+        server.serve_forever()
+    except (KeyboardInterrupt, SystemExit):
+        pass
+    finally:
+        server.server_close()
+        close_database()
+
+if __name__ == "__main__":
+    main()
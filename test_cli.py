@@ -0,0 +1,133 @@
+import io
+import sqlite3
+import tempfile
+import threading
+import unittest
+from contextlib import redirect_stdout
+from pathlib import Path
+from unittest import mock
+
+import cli
+
+# Opens a fresh copy of the seeded database in a temporary directory for each test, through cli.connect() as cli.py does
+class DatabaseTestCase(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.saved = (cli.DB_PATH, cli.INSTRUMENTATION["log"], cli.CONFLICT_MODE)
+        cli.DB_PATH = str(Path(self.tmp.name) / "test.db")
+        cli.INSTRUMENTATION["log"] = "" # no slow-query log
+        cli.connect(verbose=False)
+        cli.invalidate_reference_data()
+        cli.invalidate_route_network()
+
+    def tearDown(self):
+        cli.flush_writes()
+        cli.conn.close()
+        cli.DB_PATH, cli.INSTRUMENTATION["log"], cli.CONFLICT_MODE = self.saved
+        self.tmp.cleanup()
+
+    # Adds a flight through add_record, as the add command does. Returns its ID, or None if it was refused
+    def add_flight(self, number, departure_id, arrival_id, pilot_id, departure, arrival):
+        return cli.add_record("flight", {"flight_number":number, "departure_id":departure_id, "arrival_id":arrival_id,
+            "pilot_id":pilot_id, "departure_time_utc":departure, "arrival_time_utc":arrival})
+
+class PilotConflictTest(DatabaseTestCase):
+    # A long sector saved with a shorter one inside it in flag mode. A third flight after the short one but still
+    # inside the long one must be reported against the long one
+    def test_nested_overlap_is_found(self):
+        cli.CONFLICT_MODE = "flag"
+        long_id = self.add_flight("NL1", 1, 2, 1, "2031-01-01 08:00:00", "2031-01-01 14:00:00")
+        self.assertIsNotNone(self.add_flight("NL2", 1, 2, 1, "2031-01-01 09:00:00", "2031-01-01 10:00:00"))
+        conflicts = cli.find_pilot_conflicts(1, "2031-01-01 12:00:00", "2031-01-01 13:00:00")
+        self.assertIn(long_id, [conflict["Flight ID"] for conflict in conflicts])
+        cli.CONFLICT_MODE = "reject"
+        self.assertIsNone(self.add_flight("NL3", 1, 2, 1, "2031-01-01 12:00:00", "2031-01-01 13:00:00"))
+
+    # A flight booked by another process after a conflict check has run must be seen by the next check, not hidden
+    # behind a cached result
+    def test_check_sees_other_process_writes(self):
+        self.assertEqual(cli.find_pilot_conflicts(1, "2031-02-01 09:00:00", "2031-02-01 10:00:00"), [])
+        other = sqlite3.connect(cli.DB_PATH)
+        with other:
+            other.execute("INSERT INTO flight (flight_number, departure_id, arrival_id, pilot_id, departure_time_utc, arrival_time_utc) "
+                "VALUES ('OP1', 1, 2, 1, '2031-02-01 08:30:00', '2031-02-01 09:30:00')")
+        other.close()
+        self.assertNotEqual(cli.find_pilot_conflicts(1, "2031-02-01 09:00:00", "2031-02-01 10:00:00"), [])
+
+class MenuTest(DatabaseTestCase):
+    # A successful update through the pilot menu prints the updated pilot and stays in the menu
+    def test_update_pilot_prompt_succeeds(self):
+        out = io.StringIO()
+        with mock.patch("builtins.input", side_effect=["1", "1", "New Name"]), redirect_stdout(out):
+            self.assertIsNone(cli.update_pilot_prompt())
+        self.assertIn("New Name", out.getvalue())
+        self.assertEqual(cli.conn.execute("SELECT name FROM pilot WHERE pilot_id = 1").fetchone()[0], "New Name")
+
+    # Nothing to print, as from a write, is reported as no results
+    def test_print_results_without_rows(self):
+        out = io.StringIO()
+        cli.print_results(None, out=out)
+        self.assertEqual(out.getvalue(), "No results.\n")
+
+class ScriptTest(DatabaseTestCase):
+    # Rows imported by a script line are undone with the rest of the script when a later line fails
+    def test_import_rolled_back_when_later_line_fails(self):
+        directory = Path(self.tmp.name)
+        (directory / "destinations.csv").write_text("name,city,country,timezone\nScript Field,Scriptville,Nowhere,A\n", encoding="utf-8")
+        script = directory / "ops.txt"
+        script.write_text(f"import destination {directory / 'destinations.csv'}\n"
+            "pilots update --id 99999 --field Name --value Nobody\n", encoding="utf-8")
+        with redirect_stdout(io.StringIO()):
+            self.assertFalse(cli.run_script(str(script)))
+        self.assertEqual(cli.conn.execute("SELECT COUNT(*) FROM destination WHERE name = 'Script Field'").fetchone()[0], 0)
+
+class StatementReportTest(DatabaseTestCase):
+    # The report is read while other threads record new statements, as /stats is in server.py
+    def test_report_while_statements_are_recorded(self):
+        def record():
+            for count in range(2000):
+                cli.record_statement(("report_test.sql", count), "SELECT 1", (), 0.001, 1, 0)
+        recorder = threading.Thread(target=record)
+        recorder.start()
+        try:
+            while recorder.is_alive():
+                cli.statement_report()
+        finally:
+            recorder.join()
+        self.assertEqual(sum(row["Statement"].startswith("report_test.sql") for row in cli.statement_report()), 2000)
+        for label in [label for label in cli.STATEMENT_METRICS if label.startswith("report_test.sql")]:
+            del cli.STATEMENT_METRICS[label]
+
+class ItineraryTest(DatabaseTestCase):
+    # O→B→A lands at A before the direct O→A, so a later round improves A. The fewest legs answer must still be
+    # O→A→D, from the round that first reached D, not O→B→A→D through A's improved label
+    def test_fewest_legs_keeps_first_round_labels(self):
+        o_a = self.add_flight("FL1", 1, 2, 1, "2031-01-01 08:00:00", "2031-01-01 12:00:00")
+        self.add_flight("FL2", 1, 3, 2, "2031-01-01 08:00:00", "2031-01-01 09:00:00")
+        self.add_flight("FL3", 3, 2, 3, "2031-01-01 10:00:00", "2031-01-01 11:00:00")
+        a_d = self.add_flight("FL4", 2, 4, 4, "2031-01-01 13:00:00", "2031-01-01 15:00:00")
+        cli.flush_writes()
+        cli.invalidate_route_network()
+        legs = cli.find_itinerary(1, 4, "2031-01-01 07:00:00", fewest_legs=True)
+        self.assertEqual([leg["Flight ID"] for leg in legs], [o_a, a_d])
+
+class ReferenceCacheTest(DatabaseTestCase):
+    # A load that was reading when the cache was invalidated, as a server reader can be during the writer's commit,
+    # must not be kept
+    def test_load_during_invalidation_is_dropped(self):
+        run_statement = cli.run_statement
+        def invalidating_run_statement(filename, *args, **kwargs):
+            if filename == "ratings.sql":
+                cli.invalidate_reference_data()
+            return run_statement(filename, *args, **kwargs)
+        cli.run_statement = invalidating_run_statement
+        try:
+            cli.reference_data()
+        finally:
+            cli.run_statement = run_statement
+        self.assertIsNone(cli.REFERENCE_CACHE["data"])
+        self.assertIsNotNone(cli.reference_data())
+        self.assertIsNotNone(cli.REFERENCE_CACHE["data"])
+
+if __name__ == "__main__":
+    unittest.main()